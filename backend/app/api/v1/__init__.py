@@ -2,11 +2,12 @@
 
 from fastapi import APIRouter
 
-from . import agent, health, rag
+from . import agent, health, metrics, rag
 
 router = APIRouter()
 router.include_router(health.router, prefix="/health", tags=["health"])
 router.include_router(agent.router)
 router.include_router(rag.router)
+router.include_router(metrics.router)
 
 __all__ = ["router"]
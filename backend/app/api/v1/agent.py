@@ -4,10 +4,9 @@ from fastapi import APIRouter
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
-from ...services.agent_service import (
-    run_agent_query as execute_agent_query,
-    stream_agent_events,
-)
+# ``agent_service`` pulls in LangChain's agent runtime and the tool registry;
+# it is imported on first use (or by the post-startup warm-up) so the API
+# process binds its port without paying for it.
 
 router = APIRouter(prefix="/agent", tags=["agent"])
 
@@ -26,6 +25,8 @@ class AgentQueryResponse(BaseModel):
 async def run_agent_query(payload: AgentQueryRequest) -> AgentQueryResponse:
     """Agent sync-style endpoint."""
 
+    from ...services.agent_service import run_agent_query as execute_agent_query
+
     message = await execute_agent_query(
         query=payload.query,
         provider=payload.model_provider,
@@ -38,6 +39,8 @@ async def run_agent_query(payload: AgentQueryRequest) -> AgentQueryResponse:
 async def stream_agent_response(payload: AgentQueryRequest) -> StreamingResponse:
     """Agent streaming endpoint."""
 
+    from ...services.agent_service import stream_agent_events
+
     event_stream = stream_agent_events(
         query=payload.query,
         provider=payload.model_provider,
@@ -0,0 +1,42 @@
+"""Runtime metrics endpoints."""
+
+from typing import Any
+
+from fastapi import APIRouter
+
+from ...core.pools import get_pool_stats
+from ...services import (
+    agent_budget,
+    calculator_service,
+    email_service,
+    http_cache,
+    rag_service,
+    search_service,
+    shared_cache,
+    sql_service,
+)
+from ...services.context_packing import get_packing_stats
+from ...services.embeddings import get_embedding_stats
+from ...services.http_service import get_http_stats
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("", summary="In-process performance metrics")
+async def get_metrics() -> dict[str, Any]:
+    """Expose in-process performance counters for dashboards and debugging."""
+
+    return {
+        "embeddings": get_embedding_stats(),
+        "rag_cache": rag_service.get_cache_stats(),
+        "shared_cache": shared_cache.get_backend_stats(),
+        "context_packing": get_packing_stats(),
+        "db_pools": get_pool_stats(),
+        "sql_cache": sql_service.get_cache_stats(),
+        "http": get_http_stats(),
+        "http_cache": http_cache.get_cache_stats(),
+        "calculator_cache": calculator_service.get_cache_stats(),
+        "search": search_service.get_search_stats(),
+        "email": email_service.get_email_stats(),
+        "agent": agent_budget.get_agent_stats(),
+    }
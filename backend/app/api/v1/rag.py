@@ -1,44 +1,216 @@
 """RAG management endpoints (upload + search)."""
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+import json
+from datetime import datetime
+from typing import Any, Literal
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
 from pydantic import BaseModel, Field
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ...deps import db_session_dependency
-from ...services import rag_service
+from ...config import get_settings
+from ...deps import db_session_dependency, read_session_dependency
+from ...services import ingestion_jobs, rag_service
+from ...services.ingestion import IngestionTimeoutError
 
 
 router = APIRouter(prefix="/rag", tags=["rag"])
 
 
+class RagSearchFilters(BaseModel):
+    collection: str | None = None
+    content_type: str | None = None
+    created_after: datetime | None = None
+    created_before: datetime | None = None
+    # Matched with JSONB containment against the document metadata.
+    metadata: dict[str, Any] | None = None
+
+    def to_service(self) -> rag_service.SearchFilters:
+        return rag_service.SearchFilters(**self.model_dump())
+
+
 class RagSearchRequest(BaseModel):
     query: str = Field(..., min_length=1)
     top_k: int = Field(default=5, ge=1, le=20)
+    # Defaults to Settings.rag_search_mode when omitted.
+    mode: Literal["vector", "lexical", "hybrid"] | None = None
+    vector_weight: float = Field(default=1.0, ge=0)
+    lexical_weight: float = Field(default=1.0, ge=0)
+    filters: RagSearchFilters | None = None
+    # HNSW search width for this request; defaults to Settings.rag_hnsw_ef_search.
+    ef_search: int | None = Field(default=None, ge=1, le=1000)
+
+
+class RagBatchSearchRequest(BaseModel):
+    queries: list[str] = Field(..., min_length=1, max_length=100)
+    top_k: int = Field(default=5, ge=1, le=20)
+    mode: Literal["vector", "lexical", "hybrid"] | None = None
+    vector_weight: float = Field(default=1.0, ge=0)
+    lexical_weight: float = Field(default=1.0, ge=0)
+    filters: RagSearchFilters | None = None
+    ef_search: int | None = Field(default=None, ge=1, le=1000)
+
+
+def _parse_metadata(raw: str | None) -> dict[str, Any] | None:
+    """Parse the optional JSON-object ``metadata`` form field."""
+
+    if raw is None or not raw.strip():
+        return None
+    try:
+        parsed = json.loads(raw)
+    except json.JSONDecodeError as exc:
+        raise HTTPException(status_code=400, detail="metadata must be JSON") from exc
+    if not isinstance(parsed, dict):
+        raise HTTPException(status_code=400, detail="metadata must be a JSON object")
+    return parsed
 
 
-@router.post("/documents", summary="Upload and index a document")
+@router.post(
+    "/documents", status_code=202, summary="Queue a document or archive for indexing"
+)
 async def upload_document(
     file: UploadFile = File(...),
+    collection: str | None = Form(default=None),
+    metadata: str | None = Form(default=None),
     session: AsyncSession = Depends(db_session_dependency),
 ) -> dict[str, str | int]:
-    """Upload a document (PDF or text) and index it for retrieval."""
+    """Upload a document (PDF or text) or a zip/tar archive of them.
+
+    Indexing runs in the background; poll ``GET /rag/jobs/{job_id}`` for
+    progress. ``collection`` defaults to the configured default collection
+    and ``metadata`` is an optional JSON object stored with each document.
+    """
 
+    parsed_metadata = _parse_metadata(metadata)
+    limit = get_settings().ingest_max_upload_bytes
+    payload = await file.read(limit + 1)
     try:
-        document_id = await rag_service.index_document(session, file)
+        job = await ingestion_jobs.enqueue(
+            session,
+            filename=file.filename or "upload",
+            content_type=file.content_type,
+            payload=payload,
+            collection=collection,
+            metadata=parsed_metadata,
+        )
+    except ingestion_jobs.UploadTooLargeError as exc:
+        raise HTTPException(status_code=413, detail=str(exc)) from exc
     except ValueError as exc:
-        # Surface validation errors (e.g. empty or non-text content)
-        # as a clear 400 error instead of a generic 500.
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
-    return {"status": "indexed", "document_id": document_id}
+    return {"status": "queued", "job_id": job.id}
+
+
+@router.get("/jobs/{job_id}", summary="Get ingestion job status")
+async def get_ingestion_job(
+    job_id: int,
+    session: AsyncSession = Depends(db_session_dependency),
+) -> dict[str, Any]:
+    """Return the status, progress counters and per-document results of a job."""
+
+    job = await ingestion_jobs.get_job(session, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return ingestion_jobs.job_as_dict(job)
+
+
+@router.put("/documents/{document_id}", summary="Replace a document's content")
+async def replace_document(
+    document_id: int,
+    file: UploadFile = File(...),
+    metadata: str | None = Form(default=None),
+    session: AsyncSession = Depends(db_session_dependency),
+) -> dict[str, str | int]:
+    """Re-index a revised document, embedding only the chunks that changed."""
+
+    try:
+        result = await rag_service.replace_document(
+            session, document_id, file, metadata=_parse_metadata(metadata)
+        )
+    except rag_service.DocumentNotFoundError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except IngestionTimeoutError as exc:
+        raise HTTPException(
+            status_code=504, detail=f"Document processing timed out: {exc}"
+        ) from exc
+
+    return result.as_dict()
+
+
+@router.delete("/documents/{document_id}", summary="Delete a document")
+async def delete_document(
+    document_id: int,
+    session: AsyncSession = Depends(db_session_dependency),
+) -> dict[str, str | int]:
+    """Delete a document and all of its chunks from the RAG store."""
+
+    try:
+        await rag_service.delete_document(session, document_id)
+    except rag_service.DocumentNotFoundError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+
+    return {"status": "deleted", "document_id": document_id}
+
+
+@router.get("/collections", summary="List document collections")
+async def list_collections(
+    session: AsyncSession = Depends(db_session_dependency),
+) -> dict[str, list[dict[str, Any]]]:
+    """List collections with their document counts."""
+
+    return {"collections": await rag_service.list_collections(session)}
 
 
 @router.post("/search", summary="Search indexed documents")
 async def search_documents(
     payload: RagSearchRequest,
-    session: AsyncSession = Depends(db_session_dependency),
+    session: AsyncSession = Depends(read_session_dependency),
 ) -> dict[str, list[dict[str, str]]]:
     """Search the RAG store for relevant chunks."""
 
-    results = await rag_service.query(session, payload.query, payload.top_k)
+    try:
+        results = await rag_service.query(
+            session,
+            payload.query,
+            payload.top_k,
+            mode=payload.mode,
+            vector_weight=payload.vector_weight,
+            lexical_weight=payload.lexical_weight,
+            filters=payload.filters.to_service() if payload.filters else None,
+            ef_search=payload.ef_search,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
     return {"results": results}
+
+
+@router.post("/search/batch", summary="Search indexed documents for many queries")
+async def search_documents_batch(
+    payload: RagBatchSearchRequest,
+    session: AsyncSession = Depends(read_session_dependency),
+) -> dict[str, list[dict[str, Any]]]:
+    """Run several searches with one embedding call and one SQL statement."""
+
+    if any(not query.strip() for query in payload.queries):
+        raise HTTPException(status_code=400, detail="Queries must not be empty")
+    try:
+        results = await rag_service.query_many(
+            session,
+            payload.queries,
+            payload.top_k,
+            mode=payload.mode,
+            vector_weight=payload.vector_weight,
+            lexical_weight=payload.lexical_weight,
+            filters=payload.filters.to_service() if payload.filters else None,
+            ef_search=payload.ef_search,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return {
+        "results": [
+            {"query": query, "results": rows}
+            for query, rows in zip(payload.queries, results)
+        ]
+    }
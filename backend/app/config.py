@@ -1,7 +1,7 @@
 """Application settings and configuration helpers."""
 
 from functools import lru_cache
-from typing import List
+from typing import Dict, List
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -14,11 +14,273 @@ class Settings(BaseSettings):
     cors_origins: List[str] = ["*"]
 
     database_url: str = "postgresql+asyncpg://optimus:optimus@db:5432/optimus"
+    # Optional read replica for the read-only pools (RAG search, sql_fetch).
+    # Replication lag means freshly indexed documents may briefly be missing
+    # from search results. The sql_fetch result cache is disabled with a
+    # replica (its invalidations come from the primary).
+    database_read_url: str | None = None
 
+    # Connection pools, one per role: "api" (request handlers), "ingest"
+    # (background ingestion), "rag" (retrieval reads) and "sql" (the agent's
+    # sql_fetch tool). Overflow, timeouts and pre-ping apply to every pool.
+    # Set db_statement_cache_size to 0 behind PgBouncer in transaction mode.
+    db_pool_size: int = 5
+    db_ingest_pool_size: int = 3
+    db_rag_pool_size: int = 5
+    db_sql_pool_size: int = 2
+    db_max_overflow: int = 5
+    db_pool_timeout_seconds: float = 30.0
+    db_pool_recycle_seconds: float = 1800.0
+    db_pool_pre_ping: bool = True
+    db_statement_cache_size: int = 100
+    db_command_timeout_seconds: float | None = None
+    # Startup never migrates: the lifespan only checks that the schema was
+    # migrated (python -m app.manage migrate) for this build's settings. Once
+    # serving, the agent runtime and configured LLM provider SDKs are
+    # imported in a background thread so the first agent request skips that.
+    startup_warm_imports: bool = True
+
+    # Embedding backend: "openai", "local" (sentence-transformers model from
+    # embedding_local_model_path) or "hashing" (deterministic, for tests).
+    # embedding_dimension overrides the backend's native dimension; changing
+    # it requires re-embedding the store (python -m app.core.reembed). It is
+    # required for "local", whose dimension is otherwise only known after
+    # loading the model.
+    embedding_backend: str = "openai"
     embedding_model_name: str = "text-embedding-3-small"
+    embedding_dimension: int | None = None
+    embedding_local_model_path: str | None = None
+    embedding_local_device: str = "cpu"
+    embedding_local_runtime: str = "torch"
+    # Bulk embedding requests are split into batches bounded by an estimated
+    # token count and item count, and run with limited concurrency. Query
+    # embeddings use their own lane so they never wait behind ingestion.
+    embedding_batch_max_tokens: int = 100_000
+    embedding_batch_max_items: int = 256
+    embedding_max_concurrency: int = 4
+    embedding_query_concurrency: int = 8
+    embedding_max_retries: int = 5
+    embedding_retry_base_delay: float = 0.5
+    embedding_retry_max_delay: float = 20.0
     rag_chunk_size: int = 500
     rag_chunk_overlap: int = 50
 
+    # Retrieval: "vector", "lexical" (full-text only, no embedding call) or
+    # "hybrid" (both, fused with reciprocal rank fusion).
+    rag_search_mode: str = "hybrid"
+    rag_text_search_config: str = "english"
+    rag_rrf_k: int = 60
+    rag_hybrid_candidates: int = 50
+
+    # Collections and filtered search. Each collection gets a partial HNSW
+    # index; filtered vector scans use pgvector iterative scans ("off",
+    # "strict_order" or "relaxed_order") so top-k stays full under filters.
+    rag_default_collection: str = "default"
+    rag_collection_indexes: bool = True
+    rag_iterative_scan: str = "relaxed_order"
+    rag_max_scan_tuples: int = 20_000
+
+    # Vector distance ("cosine", "inner_product" or "l2") and HNSW index
+    # build parameters. Indexes whose definition no longer matches are
+    # rebuilt by ``python -m app.manage migrate``. ef_search is the default per-query search width
+    # and can be overridden per request to trade recall for latency.
+    rag_distance_metric: str = "cosine"
+    rag_hnsw_m: int = 16
+    rag_hnsw_ef_construction: int = 64
+    rag_hnsw_ef_search: int = 40
+
+    # HNSW index representation: "vector" (full precision), "halfvec",
+    # "binary" (binary quantization, Hamming distance) or "truncated" (the
+    # first rag_index_truncate_dimension dims; text-embedding-3-* only).
+    # Compact indexes fetch top_k * rag_rerank_factor candidates and re-rank
+    # them against the full-precision column.
+    rag_vector_index: str = "vector"
+    rag_index_truncate_dimension: int = 512
+    rag_rerank_factor: int = 4
+
+    # Context packing for the rag_lookup tools: adjacent chunks are merged,
+    # near-duplicates (word containment >= threshold) dropped and passages
+    # picked by MMR (lambda = relevance vs. diversity) within the budget.
+    rag_context_token_budget: int = 1500
+    rag_mmr_lambda: float = 0.7
+    rag_near_duplicate_threshold: float = 0.85
+
+    # In-process query caches, bounded in bytes. Query embeddings are keyed by
+    # embedding model + normalized text; the top-k result cache (set its size
+    # to 0 to disable) is invalidated whenever documents are written.
+    rag_query_embedding_cache_bytes: int = 32 * 1024 * 1024
+    rag_query_embedding_cache_ttl_seconds: float = 3600.0
+    rag_result_cache_bytes: int = 8 * 1024 * 1024
+    rag_result_cache_ttl_seconds: float = 300.0
+
+    # Shared cache tier behind the in-process query embedding, RAG result and
+    # SQL plan caches, so uvicorn workers reuse each other's entries:
+    # "memory" (none), "sqlite" (a file shared by the workers on one host,
+    # bounded by cache_sqlite_max_bytes) or "redis" (any RESP server, e.g.
+    # python -m app.services.resp_server). Invalidations reach other workers
+    # within cache_generation_check_seconds; after an error the shared tier
+    # is skipped for cache_retry_after_seconds. RAG results are also dropped
+    # in every worker through the table-change listener, so writes are seen
+    # everywhere even with "memory".
+    cache_backend: str = "memory"
+    cache_sqlite_path: str = "/tmp/optimus-cache.sqlite3"
+    cache_sqlite_max_bytes: int = 256 * 1024 * 1024
+    cache_redis_url: str = "redis://localhost:6379/0"
+    cache_redis_pool_size: int = 8
+    cache_timeout_seconds: float = 0.25
+    cache_retry_after_seconds: float = 5.0
+    cache_generation_check_seconds: float = 0.5
+    cache_key_prefix: str = "optimus"
+
+    # CPU-bound ingestion (PDF extraction, text splitting) runs in a process
+    # pool; set the pool size to 0 to fall back to worker threads.
+    ingest_process_pool_size: int = 2
+    ingest_job_timeout_seconds: float = 120.0
+    ingest_pdf_pages_per_job: int = 25
+
+    # Background ingestion jobs. Uploads are stored in Postgres and processed
+    # by ingest_worker_concurrency workers per API process; a job whose lease
+    # lapses (e.g. the process restarted mid-job) is picked up again. Chunks
+    # of up to ingest_embed_group_chunks from several documents of an archive
+    # are embedded and written together.
+    ingest_worker_concurrency: int = 2
+    ingest_job_poll_seconds: float = 2.0
+    ingest_job_lease_seconds: float = 300.0
+    ingest_job_max_attempts: int = 3
+    ingest_max_upload_bytes: int = 100 * 1024 * 1024
+    ingest_archive_max_files: int = 1_000
+    ingest_archive_max_bytes: int = 512 * 1024 * 1024
+    ingest_embed_group_chunks: int = 2_048
+
+    # sql_fetch runs agent-written SQL in a READ ONLY transaction with these
+    # limits. At most sql_fetch_max_rows rows are streamed back; the response
+    # is flagged as truncated when more were available.
+    sql_fetch_max_rows: int = 200
+    sql_fetch_statement_timeout_ms: int = 5_000
+    sql_fetch_lock_timeout_ms: int = 1_000
+    sql_fetch_work_mem: str = "16MB"
+    # EXPLAIN gate: queries whose estimated total cost or row count exceed
+    # these limits are rejected with the plan hotspot before they run.
+    # Verdicts are cached by normalized query text.
+    sql_fetch_explain_gate: bool = True
+    sql_fetch_max_plan_cost: float = 100_000.0
+    sql_fetch_max_plan_rows: int = 1_000_000
+    sql_plan_cache_bytes: int = 1024 * 1024
+    sql_plan_cache_ttl_seconds: float = 600.0
+
+    # sql_fetch result cache keyed by normalized SQL. Writes to
+    # sql_cache_tables fire statement triggers that NOTIFY a listener, which
+    # bumps per-table versions; entries read at older versions are dropped.
+    # Queries touching any other table are not cached.
+    sql_result_cache_bytes: int = 4 * 1024 * 1024
+    sql_result_cache_ttl_seconds: float = 300.0
+    sql_cache_tables: List[str] = ["customers", "orders"]
+    sql_cache_listener_ping_seconds: float = 30.0
+
+    # http_request tool. "mock" answers tracking lookups in-process; "live"
+    # sends real requests through one shared keep-alive client. Idempotent
+    # methods are retried on connect errors and 429/502/503/504; a host's
+    # circuit opens after http_breaker_failure_threshold consecutive
+    # failures. Bodies beyond http_max_response_bytes are truncated.
+    http_mode: str = "mock"
+    http_allowed_prefixes: List[str] = ["https://webhook.site"]
+    http_http2: bool = False
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry_seconds: float = 30.0
+    http_per_host_concurrency: int = 8
+    http_connect_timeout_seconds: float = 5.0
+    http_read_timeout_seconds: float = 10.0
+    http_pool_timeout_seconds: float = 5.0
+    http_max_retries: int = 2
+    http_retry_base_delay: float = 0.25
+    http_retry_max_delay: float = 4.0
+    http_breaker_failure_threshold: int = 5
+    http_breaker_reset_seconds: float = 30.0
+    http_max_response_bytes: int = 256 * 1024
+    # HTTP cache for GETs and for POSTs to http_cache_post_prefixes, which
+    # must only list idempotent lookup endpoints (e.g. a tracking lookup
+    # path), never a whole allowed host; none are cached by default. Honors
+    # Cache-Control/Expires, revalidates with ETag/Last-Modified and serves
+    # stale-while-revalidate; identical in-flight requests share one
+    # upstream call. Set http_cache_dir to add a byte-bounded on-disk tier
+    # below the in-memory LRU.
+    http_cache_bytes: int = 8 * 1024 * 1024
+    http_cache_post_prefixes: List[str] = []
+    http_cache_dir: str | None = None
+    http_cache_disk_bytes: int = 256 * 1024 * 1024
+
+    # Per-tool encoding of tabular results ("records", "columnar", "csv" or
+    # "markdown"), overriding the defaults in services/tool_registry.py.
+    tool_output_formats: Dict[str, str] = {}
+
+    # Outbound email. send_mail queues messages in the email_outbox table;
+    # a background dispatcher delivers them in batches of email_batch_size
+    # over one reused SMTP connection, at most email_rate_per_second (bursts
+    # of email_rate_burst). Transient failures are retried with backoff up to
+    # email_max_attempts. Identical messages within the dedup window are
+    # sent once. email_mode "log" only logs messages; "smtp" sends them.
+    email_mode: str = "log"
+    email_from: str = "optimus@example.com"
+    email_smtp_host: str = "localhost"
+    email_smtp_port: int = 25
+    email_smtp_username: str | None = None
+    email_smtp_password: str | None = None
+    email_smtp_starttls: bool = False
+    email_smtp_timeout_seconds: float = 10.0
+    email_smtp_idle_seconds: float = 60.0
+    email_batch_size: int = 20
+    email_rate_per_second: float = 5.0
+    email_rate_burst: int = 10
+    email_poll_seconds: float = 2.0
+    email_lease_seconds: float = 120.0
+    email_max_attempts: int = 5
+    email_retry_base_delay: float = 5.0
+    email_retry_max_delay: float = 600.0
+    email_dedup_window_seconds: float = 86_400.0
+
+    # Federated search tool. Every backend in search_backends ("documents",
+    # "wiki", "web") is queried concurrently under its own timeout; a slow
+    # backend can be hedged with a second request after a delay. Whatever has
+    # arrived by search_deadline_seconds is returned. Timeouts and hedge
+    # delays override the defaults in services/search_service.py. The web
+    # backend is answered in-process when search_web_mode is "mock".
+    search_backends: List[str] = ["documents", "wiki", "web"]
+    search_deadline_seconds: float = 2.0
+    search_max_results: int = 8
+    search_backend_timeouts: Dict[str, float] = {}
+    search_hedge_delays: Dict[str, float] = {}
+    search_web_mode: str = "mock"
+    search_web_url: str = "https://search.example.com/v1/search"
+    search_web_api_key: str | None = None
+    search_web_mock_latency_ms: float = 0.0
+    search_wiki_base_url: str = "https://wiki.internal.example/pages"
+
+    # Calculator budgets. Expressions are rejected above the length and
+    # operation-count limits; evaluation fails when an exponent or any
+    # intermediate result exceeds its cap, or when a batch needs more than
+    # calculator_max_steps (operations x rows). Compiled expressions are
+    # cached (calculator_cache_size entries).
+    calculator_max_expression_chars: int = 2000
+    calculator_max_nodes: int = 500
+    calculator_max_exponent: float = 1000.0
+    calculator_max_magnitude: float = 1e100
+    calculator_max_steps: int = 5_000_000
+    calculator_cache_size: int = 1024
+
+    # Per-run agent budgets (0 disables a limit): model turns, calls per tool
+    # (agent_tool_call_limits overrides per tool name), total tokens and wall
+    # clock. When one runs out, or the last agent_max_consecutive_errors tool
+    # results were all errors, the model gets one last turn without tools to
+    # answer from what it has. Identical tool calls within a run return the
+    # earlier result instead of running again.
+    agent_max_model_turns: int = 12
+    agent_max_tool_calls_per_tool: int = 6
+    agent_tool_call_limits: Dict[str, int] = {"send_mail": 2}
+    agent_max_total_tokens: int = 60_000
+    agent_max_run_seconds: float = 120.0
+    agent_max_consecutive_errors: int = 3
+
     openai_api_key: str | None = None
     google_api_key: str | None = None
 
@@ -1,127 +1,128 @@
 """Database configuration helpers."""
 
 from collections.abc import AsyncIterator
+from functools import lru_cache
+from typing import Literal
 
 from sqlalchemy import text
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.orm import DeclarativeBase
 
 from ..config import get_settings
+from .pools import instrumented_pool_class
 
 
 class Base(DeclarativeBase):
     """Base class for all SQLAlchemy models."""
 
 
-_settings = get_settings()
-_engine = create_async_engine(_settings.database_url, echo=False)
-_session_factory = async_sessionmaker(
-    _engine,
-    expire_on_commit=False,
-)
+# Each role gets its own pool so that e.g. a burst of agent SQL queries
+# cannot starve uploads: "api" serves request handlers and startup,
+# "ingest" the background ingestion writers, "rag" retrieval reads and
+# "sql" the agent's sql_fetch tool. Read roles use the replica when
+# database_read_url is set.
+Role = Literal["api", "ingest", "rag", "sql"]
+_READ_ROLES = ("rag", "sql")
 
+_engines: dict[str, AsyncEngine] = {}
 
-async def get_async_session() -> AsyncIterator[AsyncSession]:
-    """Yield an async SQLAlchemy session bound to the primary engine."""
 
-    async with _session_factory() as session:
-        yield session
+def get_engine(role: Role = "api") -> AsyncEngine:
+    """Return the (lazily created) engine for a connection-pool role."""
 
+    if role in _engines:
+        return _engines[role]
 
-async def init_db() -> None:
-    """Initialise database schema and vector extension if needed."""
+    settings = get_settings()
+    pool_sizes = {
+        "api": settings.db_pool_size,
+        "ingest": settings.db_ingest_pool_size,
+        "rag": settings.db_rag_pool_size,
+        "sql": settings.db_sql_pool_size,
+    }
+    if role not in pool_sizes:
+        raise ValueError(f"Unknown database role: {role!r}")
 
-    from . import models  # ensure models are imported for metadata
+    url = settings.database_url
+    if role in _READ_ROLES and settings.database_read_url:
+        url = settings.database_read_url
 
-    async with _engine.begin() as conn:
-        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
-        await conn.run_sync(models.Base.metadata.create_all)
-        await conn.execute(
-            text(
-                """
-                CREATE INDEX IF NOT EXISTS ix_document_chunks_embedding_hnsw
-                ON document_chunks
-                USING hnsw (embedding vector_l2_ops)
-                """
-            )
-        )
+    _engines[role] = create_async_engine(
+        url,
+        echo=False,
+        poolclass=instrumented_pool_class(role),
+        pool_size=pool_sizes[role],
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout_seconds,
+        pool_recycle=settings.db_pool_recycle_seconds,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        connect_args={
+            # asyncpg's per-connection statement cache and SQLAlchemy's
+            # prepared-statement cache; 0 disables both (PgBouncer in
+            # transaction mode).
+            "statement_cache_size": settings.db_statement_cache_size,
+            "prepared_statement_cache_size": settings.db_statement_cache_size,
+            "command_timeout": settings.db_command_timeout_seconds,
+        },
+    )
+    return _engines[role]
 
-        # Seed a minimal demo dataset for the OpsAgent scenario so the SQL tool
-        # has something concrete to query. These inserts are idempotent.
-        await conn.execute(
-            text(
-                """
-                INSERT INTO customers (customer_id, name, email)
-                VALUES (42, 'Maria Rodriguez', 'maria.rodriguez@example.com')
-                ON CONFLICT (customer_id) DO NOTHING
-                """
-            )
-        )
 
-        await conn.execute(
-            text(
-                """
-                INSERT INTO customers (customer_id, name, email)
-                VALUES (101, 'David Kim', 'david.kim@example.com')
-                ON CONFLICT (customer_id) DO NOTHING
-                """
-            )
-        )
+@lru_cache(maxsize=None)
+def get_session_factory(role: Role = "api") -> async_sessionmaker[AsyncSession]:
+    """Return the session factory bound to a role's engine."""
 
-        await conn.execute(
-            text(
-                """
-                INSERT INTO customers (customer_id, name, email)
-                VALUES (102, 'Aisha Patel', 'aisha.patel@example.com')
-                ON CONFLICT (customer_id) DO NOTHING
-                """
-            )
-        )
+    return async_sessionmaker(get_engine(role), expire_on_commit=False)
 
-        await conn.execute(
-            text(
-                """
-                INSERT INTO orders (order_id, customer_id, order_date, status_tracking_id)
-                VALUES (98765, 42, NOW(), 'SHP12345')
-                ON CONFLICT (order_id) DO NOTHING
-                """
-            )
-        )
 
-        await conn.execute(
-            text(
-                """
-                INSERT INTO orders (order_id, customer_id, order_date, status_tracking_id)
-                VALUES (12345, 101, NOW(), 'SHP67890')
-                ON CONFLICT (order_id) DO NOTHING
-                """
-            )
-        )
+_engine = get_engine("api")
+_session_factory = get_session_factory("api")
+
 
-    # Seed a small company policy document into the RAG store if not present,
-    # so rag_lookup has a concrete policy to reference in demos.
-    from ..services import rag_service
+async def get_async_session(role: Role = "api") -> AsyncIterator[AsyncSession]:
+    """Yield an async SQLAlchemy session bound to a role's engine."""
 
-    policy_filename = "company_policies_seed.txt"
-    policy_text = """Company return policy - electronics
+    async with get_session_factory(role)() as session:
+        yield session
 
-- Electronics returns are subject to a 15% restocking fee if the box has been opened.
-- Returns must be initiated within 30 days of delivery.
-- Items must include all accessories and original packaging.
-"""
 
-    async with _session_factory() as session:
-        result = await session.execute(
-            text("SELECT id FROM documents WHERE filename = :filename LIMIT 1"),
-            {"filename": policy_filename},
-        )
-        if result.scalar() is None:
-            await rag_service.index_text(
-                session,
-                text_content=policy_text,
-                filename=policy_filename,
-                content_type="text/plain",
-            )
+async def dispose_engines() -> None:
+    """Close the connections of every engine created so far."""
 
+    for engine in _engines.values():
+        await engine.dispose()
 
-__all__ = ["Base", "get_async_session", "_engine", "init_db"]
+
+async def get_embedding_column_type(conn: AsyncConnection) -> str | None:
+    """Return the SQL type of ``document_chunks.embedding`` (e.g. ``vector(1536)``)."""
+
+    result = await conn.execute(
+        text(
+            """
+            SELECT format_type(atttypid, atttypmod)
+            FROM pg_attribute
+            WHERE attrelid = 'document_chunks'::regclass
+              AND attname = 'embedding'
+              AND NOT attisdropped
+            """
+        )
+    )
+    return result.scalar()
+
+
+__all__ = [
+    "Base",
+    "Role",
+    "dispose_engines",
+    "get_async_session",
+    "get_engine",
+    "get_session_factory",
+    "_engine",
+    "get_embedding_column_type",
+]
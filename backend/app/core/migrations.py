@@ -0,0 +1,349 @@
+"""Schema migrations, demo seed data and the startup schema check.
+
+Schema changes and seeding run out of band, before the API starts::
+
+    python -m app.manage migrate [--seed]
+    python -m app.manage seed
+
+``migrate`` creates or updates tables, columns, indexes and triggers and
+records ``SCHEMA_VERSION`` together with a fingerprint of the settings the
+schema depends on (embedding dimension, vector index, text search config,
+cached tables). Application startup only calls ``verify_schema``, a single
+query that fails fast when the database is behind. Bump ``SCHEMA_VERSION``
+whenever ``migrate`` changes.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from ..config import get_settings
+from .db import get_embedding_column_type, get_engine, get_session_factory
+from .vector_store import (
+    RAG_TABLES,
+    create_all_collection_indexes,
+    create_vector_index,
+    validate_collection_name,
+)
+
+
+SCHEMA_VERSION = 3
+# Serializes concurrent ``migrate`` runs (arbitrary application lock id).
+_MIGRATION_LOCK_ID = 0x6F70746D
+
+
+class SchemaVersionError(RuntimeError):
+    """The database schema is missing or does not match this build."""
+
+
+def schema_fingerprint() -> str:
+    """Hash of the settings that shape the schema and its indexes."""
+
+    settings = get_settings()
+    inputs = {
+        "embedding_backend": settings.embedding_backend,
+        "embedding_model": (
+            settings.embedding_local_model_path
+            if settings.embedding_backend == "local"
+            else settings.embedding_model_name
+        ),
+        "embedding_dimension": settings.embedding_dimension,
+        "text_search_config": settings.rag_text_search_config,
+        "distance_metric": settings.rag_distance_metric,
+        "hnsw": [settings.rag_hnsw_m, settings.rag_hnsw_ef_construction],
+        "vector_index": settings.rag_vector_index,
+        "index_truncate_dimension": settings.rag_index_truncate_dimension,
+        "collection_indexes": settings.rag_collection_indexes,
+        "default_collection": settings.rag_default_collection,
+        "sql_cache_tables": sorted(settings.sql_cache_tables),
+    }
+    encoded = json.dumps(inputs, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+async def _check_embedding_dimension(conn: AsyncConnection) -> None:
+    from ..services.embeddings import get_embedding_dimension
+
+    expected = f"vector({get_embedding_dimension()})"
+    actual = await get_embedding_column_type(conn)
+    if actual != expected:
+        raise RuntimeError(
+            f"document_chunks.embedding is {actual} but the embedding backend "
+            f"produces {expected}; run `python -m app.core.reembed` to migrate"
+        )
+
+
+async def migrate() -> None:
+    """Bring the schema up to ``SCHEMA_VERSION`` for the current settings.
+
+    Idempotent; safe to run from several processes at once.
+    """
+
+    from . import models  # ensure models are imported for metadata
+
+    settings = get_settings()
+    async with get_engine("api").begin() as conn:
+        await conn.execute(
+            text("SELECT pg_advisory_xact_lock(:lock)"), {"lock": _MIGRATION_LOCK_ID}
+        )
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        await conn.run_sync(models.Base.metadata.create_all)
+
+        # create_all does not alter existing tables; add the content-hash
+        # columns used for embedding reuse and backfill chunk hashes so
+        # documents indexed before they existed can be deduplicated too.
+        for table in ("documents", "document_chunks"):
+            await conn.execute(
+                text(
+                    f"ALTER TABLE {table} "
+                    "ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)"
+                )
+            )
+            await conn.execute(
+                text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{table}_content_hash "
+                    f"ON {table} (content_hash)"
+                )
+            )
+        await conn.execute(
+            text(
+                """
+                UPDATE document_chunks
+                SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex')
+                WHERE content_hash IS NULL
+                """
+            )
+        )
+        await conn.execute(
+            text(
+                "ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS content_tsv "
+                f"tsvector GENERATED ALWAYS AS ({models.content_tsv_expression()}) "
+                "STORED"
+            )
+        )
+        await conn.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_document_chunks_content_tsv "
+                "ON document_chunks USING gin (content_tsv)"
+            )
+        )
+
+        # Collections: every document and chunk belongs to one. Chunks carry
+        # a denormalized copy so filtered ANN scans never need a join.
+        await conn.execute(
+            text(
+                "INSERT INTO collections (name) VALUES (:name) "
+                "ON CONFLICT (name) DO NOTHING"
+            ),
+            {"name": settings.rag_default_collection},
+        )
+        for table in ("documents", "document_chunks"):
+            await conn.execute(
+                text(
+                    f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS collection "
+                    f"VARCHAR(64) NOT NULL DEFAULT "
+                    f"'{validate_collection_name(settings.rag_default_collection)}'"
+                )
+            )
+            await conn.execute(
+                text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{table}_collection "
+                    f"ON {table} (collection)"
+                )
+            )
+        await conn.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_document_chunks_metadata "
+                "ON document_chunks USING gin (metadata jsonb_path_ops)"
+            )
+        )
+        await conn.execute(
+            text(
+                "ALTER TABLE ingestion_jobs "
+                "ADD COLUMN IF NOT EXISTS claimed_by VARCHAR(255)"
+            )
+        )
+
+        await _check_embedding_dimension(conn)
+        await create_vector_index(conn)
+        if settings.rag_collection_indexes:
+            await create_all_collection_indexes(conn)
+
+        # Statement-level triggers announce writes to the tables sql_fetch
+        # results are cached for and to the RAG store, whose cached search
+        # results every worker drops on a write (see
+        # services/table_versions.py).
+        await conn.execute(
+            text(
+                """
+                CREATE OR REPLACE FUNCTION notify_table_change() RETURNS trigger
+                LANGUAGE plpgsql AS $$
+                BEGIN
+                    PERFORM pg_notify('table_changes', TG_TABLE_NAME);
+                    RETURN NULL;
+                END
+                $$
+                """
+            )
+        )
+        for table in dict.fromkeys([*settings.sql_cache_tables, *RAG_TABLES]):
+            await conn.execute(
+                text(
+                    f"CREATE OR REPLACE TRIGGER {table}_notify_change "
+                    f"AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} "
+                    "FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change()"
+                )
+            )
+
+        await conn.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    id integer PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+                    version integer NOT NULL,
+                    fingerprint text NOT NULL,
+                    applied_at timestamptz NOT NULL DEFAULT now()
+                )
+                """
+            )
+        )
+        await conn.execute(
+            text(
+                """
+                INSERT INTO schema_version (id, version, fingerprint)
+                VALUES (1, :version, :fingerprint)
+                ON CONFLICT (id) DO UPDATE
+                SET version = excluded.version,
+                    fingerprint = excluded.fingerprint,
+                    applied_at = now()
+                """
+            ),
+            {"version": SCHEMA_VERSION, "fingerprint": schema_fingerprint()},
+        )
+
+
+async def seed() -> None:
+    """Insert the demo customers, orders and policy document (idempotent)."""
+
+    async with get_engine("api").begin() as conn:
+        # A minimal demo dataset for the OpsAgent scenario so the SQL tool has
+        # something concrete to query.
+        await conn.execute(
+            text(
+                """
+                INSERT INTO customers (customer_id, name, email)
+                VALUES (42, 'Maria Rodriguez', 'maria.rodriguez@example.com')
+                ON CONFLICT (customer_id) DO NOTHING
+                """
+            )
+        )
+
+        await conn.execute(
+            text(
+                """
+                INSERT INTO customers (customer_id, name, email)
+                VALUES (101, 'David Kim', 'david.kim@example.com')
+                ON CONFLICT (customer_id) DO NOTHING
+                """
+            )
+        )
+
+        await conn.execute(
+            text(
+                """
+                INSERT INTO customers (customer_id, name, email)
+                VALUES (102, 'Aisha Patel', 'aisha.patel@example.com')
+                ON CONFLICT (customer_id) DO NOTHING
+                """
+            )
+        )
+
+        await conn.execute(
+            text(
+                """
+                INSERT INTO orders (order_id, customer_id, order_date, status_tracking_id)
+                VALUES (98765, 42, NOW(), 'SHP12345')
+                ON CONFLICT (order_id) DO NOTHING
+                """
+            )
+        )
+
+        await conn.execute(
+            text(
+                """
+                INSERT INTO orders (order_id, customer_id, order_date, status_tracking_id)
+                VALUES (12345, 101, NOW(), 'SHP67890')
+                ON CONFLICT (order_id) DO NOTHING
+                """
+            )
+        )
+
+    # A small company policy document in the RAG store, so rag_lookup has a
+    # concrete policy to reference in demos. Indexing it embeds the text.
+    from ..services import rag_service
+
+    policy_filename = "company_policies_seed.txt"
+    policy_text = """Company return policy - electronics
+
+- Electronics returns are subject to a 15% restocking fee if the box has been opened.
+- Returns must be initiated within 30 days of delivery.
+- Items must include all accessories and original packaging.
+"""
+
+    async with get_session_factory("api")() as session:
+        result = await session.execute(
+            text("SELECT id FROM documents WHERE filename = :filename LIMIT 1"),
+            {"filename": policy_filename},
+        )
+        if result.scalar() is None:
+            await rag_service.index_text(
+                session,
+                text_content=policy_text,
+                filename=policy_filename,
+                content_type="text/plain",
+            )
+
+
+async def verify_schema() -> None:
+    """Raise SchemaVersionError unless ``migrate`` has run for this build."""
+
+    hint = "run `python -m app.manage migrate`"
+    async with get_engine("api").connect() as conn:
+        exists = (
+            await conn.execute(text("SELECT to_regclass('schema_version') IS NOT NULL"))
+        ).scalar()
+        row = (
+            (
+                await conn.execute(
+                    text("SELECT version, fingerprint FROM schema_version WHERE id = 1")
+                )
+            ).first()
+            if exists
+            else None
+        )
+    if row is None:
+        raise SchemaVersionError(f"Database schema is not initialised; {hint}")
+    if row.version != SCHEMA_VERSION:
+        raise SchemaVersionError(
+            f"Database schema is at version {row.version}, this build needs "
+            f"{SCHEMA_VERSION}; {hint}"
+        )
+    if row.fingerprint != schema_fingerprint():
+        raise SchemaVersionError(
+            "Schema-affecting settings (embedding, vector index, text search or "
+            f"cached tables) changed since the last migration; {hint}"
+        )
+
+
+__all__ = [
+    "SCHEMA_VERSION",
+    "SchemaVersionError",
+    "migrate",
+    "schema_fingerprint",
+    "seed",
+    "verify_schema",
+]
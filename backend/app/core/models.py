@@ -1,36 +1,165 @@
 """Database models placeholder."""
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import (
+    Column,
+    Computed,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+)
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from pgvector.sqlalchemy import Vector
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 
+from ..config import get_settings
+from ..services.embeddings import get_embedding_dimension
 from .db import Base
 
 
+class Collection(Base):
+    __tablename__ = "collections"
+
+    name = Column(String(64), primary_key=True)
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+
 class Document(Base):
     __tablename__ = "documents"
 
     id = Column(Integer, primary_key=True, index=True)
+    collection = Column(
+        String(64),
+        nullable=False,
+        server_default=get_settings().rag_default_collection,
+        index=True,
+    )
     filename = Column(String(255), nullable=False)
     content_type = Column(String(128), nullable=False)
+    # SHA-256 of the uploaded bytes, used to short-circuit identical uploads.
+    content_hash = Column(String(64), nullable=True, index=True)
     metadata_ = Column("metadata", JSONB, nullable=True)
     created_at = Column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
 
 
+def content_tsv_expression() -> str:
+    """SQL expression backing the generated ``content_tsv`` column."""
+
+    return f"to_tsvector('{get_settings().rag_text_search_config}'::regconfig, content)"
+
+
 class DocumentChunk(Base):
     __tablename__ = "document_chunks"
+    __table_args__ = (
+        Index("ix_document_chunks_content_tsv", "content_tsv", postgresql_using="gin"),
+        Index(
+            "ix_document_chunks_metadata",
+            "metadata",
+            postgresql_using="gin",
+            postgresql_ops={"metadata": "jsonb_path_ops"},
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     document_id = Column(
         Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False
     )
+    # Denormalized from the parent document so filtered vector scans (and the
+    # per-collection partial HNSW indexes) never need a join.
+    collection = Column(
+        String(64),
+        nullable=False,
+        server_default=get_settings().rag_default_collection,
+        index=True,
+    )
     chunk_index = Column(Integer, nullable=False)
     content = Column(Text, nullable=False)
+    # SHA-256 of the chunk text, used to reuse embeddings across documents.
+    content_hash = Column(String(64), nullable=True, index=True)
+    metadata_ = Column("metadata", JSONB, nullable=True)
+    embedding = Column(Vector(get_embedding_dimension()), nullable=True)
+    # Full-text search vector for lexical / hybrid retrieval.
+    content_tsv = Column(TSVECTOR, Computed(content_tsv_expression(), persisted=True))
+
+
+class IngestionJob(Base):
+    """A queued document or archive upload, processed by background workers."""
+
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # queued -> running -> succeeded | failed
+    status = Column(String(16), nullable=False, default="queued", index=True)
+    filename = Column(String(255), nullable=False)
+    content_type = Column(String(128), nullable=False)
+    collection = Column(String(64), nullable=False)
     metadata_ = Column("metadata", JSONB, nullable=True)
-    embedding = Column(Vector(1536), nullable=True)
+    # Raw upload, cleared once the job finishes; deferred so status polling
+    # never loads it.
+    payload = deferred(Column(LargeBinary, nullable=True))
+    payload_bytes = Column(Integer, nullable=False, default=0)
+
+    attempts = Column(Integer, nullable=False, default=0)
+    # A running job whose lease has expired is reclaimed by another worker.
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    # Worker holding the lease; updates from any other worker are ignored.
+    claimed_by = Column(String(255), nullable=True)
+
+    documents_total = Column(Integer, nullable=False, default=0)
+    documents_done = Column(Integer, nullable=False, default=0)
+    pages_total = Column(Integer, nullable=False, default=0)
+    pages_done = Column(Integer, nullable=False, default=0)
+    chunks_total = Column(Integer, nullable=False, default=0)
+    chunks_embedded = Column(Integer, nullable=False, default=0)
+    chunks_written = Column(Integer, nullable=False, default=0)
+    results = Column(JSONB, nullable=True)
+    error = Column(Text, nullable=True)
+
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class OutboxEmail(Base):
+    """An outbound email, delivered by the background mail dispatcher."""
+
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index("ix_email_outbox_due", "status", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Repeated sends with the same key return the original message.
+    idempotency_key = Column(String(128), nullable=False, unique=True)
+    message_id = Column(String(255), nullable=False)
+    # queued -> sending -> sent | failed
+    status = Column(String(16), nullable=False, default="queued")
+    to_address = Column(String(320), nullable=False)
+    subject = Column(Text, nullable=False)
+    body = Column(Text, nullable=False)
+
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    # A message whose lease has expired mid-send is picked up again.
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    sent_at = Column(DateTime(timezone=True), nullable=True)
 
 
 class Customer(Base):
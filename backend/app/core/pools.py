@@ -0,0 +1,98 @@
+"""Connection pool instrumentation (checkout waits and saturation)."""
+
+from __future__ import annotations
+
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool
+
+
+@dataclass
+class PoolStats:
+    """Checkout counters and rolling wait times for one pool."""
+
+    checkouts: int = 0
+    timeouts: int = 0
+    max_wait_seconds: float = 0.0
+    _waits: deque[float] = field(
+        default_factory=lambda: deque(maxlen=1024), init=False, repr=False
+    )
+
+    def record_wait(self, seconds: float) -> None:
+        self.checkouts += 1
+        self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+        self._waits.append(seconds)
+
+    def snapshot(self) -> dict[str, Any]:
+        waits = sorted(self._waits)
+        if waits:
+            p50 = waits[len(waits) // 2]
+            p95 = waits[min(len(waits) - 1, int(len(waits) * 0.95))]
+        else:
+            p50 = p95 = 0.0
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_p50_ms": round(p50 * 1000, 2),
+            "wait_p95_ms": round(p95 * 1000, 2),
+            "wait_max_ms": round(self.max_wait_seconds * 1000, 2),
+        }
+
+
+_pools: dict[str, tuple[Pool, PoolStats]] = {}
+
+
+def instrumented_pool_class(role: str) -> type[AsyncAdaptedQueuePool]:
+    """Return a queue pool class that records checkout waits under ``role``.
+
+    The stats live on the class rather than the instance because SQLAlchemy
+    recreates pool instances (``engine.dispose()``) from their class.
+    """
+
+    stats = PoolStats()
+
+    class InstrumentedPool(AsyncAdaptedQueuePool):
+        def __init__(self, *args: Any, **kwargs: Any) -> None:
+            super().__init__(*args, **kwargs)
+            _pools[role] = (self, stats)
+
+        def _do_get(self) -> Any:
+            # Covers waiting for a free slot and opening new connections.
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            except exc.TimeoutError:
+                stats.timeouts += 1
+                raise
+            finally:
+                stats.record_wait(time.perf_counter() - start)
+
+    InstrumentedPool.__name__ = f"InstrumentedPool[{role}]"
+    return InstrumentedPool
+
+
+def get_pool_stats() -> dict[str, dict[str, Any]]:
+    """Return per-role pool occupancy, saturation and checkout wait times."""
+
+    result: dict[str, dict[str, Any]] = {}
+    for role, (pool, stats) in _pools.items():
+        assert isinstance(pool, AsyncAdaptedQueuePool)
+        capacity = pool.size() + max(0, pool._max_overflow)
+        checked_out = pool.checkedout()
+        result[role] = {
+            "pool_size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_out": checked_out,
+            "idle": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "saturation": round(checked_out / capacity, 3) if capacity else 0.0,
+            **stats.snapshot(),
+        }
+    return result
+
+
+__all__ = ["PoolStats", "get_pool_stats", "instrumented_pool_class"]
@@ -0,0 +1,139 @@
+"""Re-embed the RAG store with the configured embedding backend.
+
+Run after changing ``embedding_backend``, ``embedding_model_name`` or
+``embedding_dimension``::
+
+    python -m app.core.reembed [--batch-size 256]
+
+New vectors are written to a shadow ``embedding_next`` column in batches, so
+the job can be interrupted and resumed while the old index keeps serving
+queries. Once every chunk is re-embedded the columns are swapped and the
+HNSW index is rebuilt in a single transaction, after which ``migrate`` runs
+so the schema version and settings fingerprint checked at startup match the
+new backend. Restart API workers afterwards so their query caches and models
+pick up the new backend.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import Integer, bindparam, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from ..services.embeddings import (
+    EmbeddingProvider,
+    get_embedding_dimension,
+    get_embedding_provider,
+)
+from ..config import get_settings
+from .db import _engine
+from .migrations import migrate
+from .vector_store import (
+    GLOBAL_INDEX_NAME,
+    create_all_collection_indexes,
+    create_vector_index,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+async def reembed_store(batch_size: int = 256) -> int:
+    """Re-embed every chunk into the configured dimension; return chunks updated."""
+
+    provider = get_embedding_provider()
+    dimension = get_embedding_dimension()
+
+    async with _engine.begin() as conn:
+        await conn.execute(
+            text(
+                "ALTER TABLE document_chunks "
+                f"ADD COLUMN IF NOT EXISTS embedding_next vector({dimension})"
+            )
+        )
+
+    updated = 0
+    while True:
+        async with _engine.begin() as conn:
+            count = await _reembed_batch(conn, provider, dimension, batch_size)
+        if count == 0:
+            break
+        updated += count
+        logger.info("Re-embedded %d chunks", updated)
+
+    async with _engine.begin() as conn:
+        # Block writers, catch up on chunks inserted since the last batch and
+        # swap the columns atomically.
+        await conn.execute(
+            text("LOCK TABLE document_chunks IN SHARE ROW EXCLUSIVE MODE")
+        )
+        while count := await _reembed_batch(conn, provider, dimension, batch_size):
+            updated += count
+        # Dropping the column also drops the global and per-collection HNSW
+        # indexes built on it.
+        await conn.execute(text(f"DROP INDEX IF EXISTS {GLOBAL_INDEX_NAME}"))
+        await conn.execute(text("ALTER TABLE document_chunks DROP COLUMN embedding"))
+        await conn.execute(
+            text("ALTER TABLE document_chunks RENAME COLUMN embedding_next TO embedding")
+        )
+        await create_vector_index(conn)
+        if get_settings().rag_collection_indexes:
+            await create_all_collection_indexes(conn)
+
+    # The stored fingerprint still describes the old embedding settings, so
+    # verify_schema would refuse to start the API until this has run.
+    await migrate()
+    return updated
+
+
+async def _reembed_batch(
+    conn: AsyncConnection,
+    provider: EmbeddingProvider,
+    dimension: int,
+    batch_size: int,
+) -> int:
+    rows = (
+        await conn.execute(
+            text(
+                """
+                SELECT id, content
+                FROM document_chunks
+                WHERE embedding_next IS NULL
+                ORDER BY id
+                LIMIT :limit
+                """
+            ).bindparams(bindparam("limit", type_=Integer)),
+            {"limit": batch_size},
+        )
+    ).all()
+    if not rows:
+        return 0
+
+    # Identical chunk texts only need embedding once per batch.
+    distinct = list(dict.fromkeys(row.content for row in rows))
+    vectors = dict(zip(distinct, await provider.embed_texts(distinct)))
+    await conn.execute(
+        text(
+            "UPDATE document_chunks SET embedding_next = :embedding WHERE id = :id"
+        ).bindparams(bindparam("embedding", type_=Vector(dimension))),
+        [{"id": row.id, "embedding": vectors[row.content]} for row in rows],
+    )
+    return len(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    updated = asyncio.run(reembed_store(batch_size=args.batch_size))
+    logger.info("Re-embedding complete: %d chunks", updated)
+
+
+if __name__ == "__main__":
+    main()
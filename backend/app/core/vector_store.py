@@ -0,0 +1,268 @@
+"""pgvector index management for document chunk embeddings."""
+
+from __future__ import annotations
+
+import hashlib
+import re
+from dataclasses import dataclass
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from ..config import get_settings
+
+
+GLOBAL_INDEX_NAME = "ix_document_chunks_embedding_hnsw"
+# Writes to these tables are announced over table_changes so every worker
+# drops its cached search results.
+RAG_TABLES = ("documents", "document_chunks")
+
+
+@dataclass(frozen=True)
+class DistanceMetric:
+    """pgvector operator, HNSW operator class and score for one metric."""
+
+    name: str
+    operator: str
+    opclass: str
+    # SQL expression turning the ``distance`` column into a higher-is-better
+    # similarity score.
+    score_sql: str
+
+
+DISTANCE_METRICS = {
+    # <=> is 1 - cosine similarity, so the score is the cosine similarity.
+    "cosine": DistanceMetric("cosine", "<=>", "vector_cosine_ops", "1 - distance"),
+    # <#> returns the negative inner product.
+    "inner_product": DistanceMetric(
+        "inner_product", "<#>", "vector_ip_ops", "-distance"
+    ),
+    # L2 distances are unbounded; map them into (0, 1].
+    "l2": DistanceMetric("l2", "<->", "vector_l2_ops", "1 / (1 + distance)"),
+}
+
+
+def get_distance_metric() -> DistanceMetric:
+    """Return the configured distance metric, raising ValueError if unknown."""
+
+    name = get_settings().rag_distance_metric
+    try:
+        return DISTANCE_METRICS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown rag_distance_metric {name!r}; "
+            f"expected one of {sorted(DISTANCE_METRICS)}"
+        ) from None
+
+
+VECTOR_INDEX_TYPES = ("vector", "halfvec", "binary", "truncated")
+
+
+@dataclass(frozen=True)
+class VectorIndexSpec:
+    """How the HNSW index represents embeddings and how queries address it.
+
+    The ``embedding`` column always holds full-precision vectors. Compact
+    index types build the HNSW graph over an expression (half precision,
+    binary quantization or a Matryoshka prefix) and are marked ``reranked``:
+    their ANN candidates are re-scored against the full vectors.
+    """
+
+    index_type: str
+    # Templates with a ``{}`` placeholder for the column / query parameter.
+    column_template: str
+    query_template: str
+    opclass: str
+    operator: str
+
+    @property
+    def reranked(self) -> bool:
+        return self.index_type != "vector"
+
+    def column(self, column: str) -> str:
+        return self.column_template.format(column)
+
+    def query(self, param: str) -> str:
+        return self.query_template.format(param)
+
+
+def build_index_spec(
+    index_type: str, metric: DistanceMetric, dimension: int, truncate_dimension: int
+) -> VectorIndexSpec:
+    """Return the index spec for ``index_type`` over ``vector(dimension)``."""
+
+    full = f"CAST({{}} AS vector({dimension}))"
+    if index_type == "vector":
+        return VectorIndexSpec(
+            index_type, "{}", full, metric.opclass, metric.operator
+        )
+    if index_type == "halfvec":
+        half = f"CAST({{}} AS halfvec({dimension}))"
+        return VectorIndexSpec(
+            index_type,
+            half,
+            half.format(full),
+            metric.opclass.replace("vector_", "halfvec_", 1),
+            metric.operator,
+        )
+    if index_type == "binary":
+        # Hamming distance over sign bits, independent of the metric.
+        bits = f"CAST(binary_quantize({{}}) AS bit({dimension}))"
+        return VectorIndexSpec(
+            index_type, bits, bits.format(full), "bit_hamming_ops", "<~>"
+        )
+    if index_type == "truncated":
+        if not 0 < truncate_dimension < dimension:
+            raise ValueError(
+                "rag_index_truncate_dimension must be between 1 and "
+                f"{dimension - 1}, got {truncate_dimension}"
+            )
+        prefix = (
+            f"CAST(subvector({{}}, 1, {truncate_dimension}) "
+            f"AS vector({truncate_dimension}))"
+        )
+        return VectorIndexSpec(
+            index_type,
+            prefix,
+            prefix.format(full),
+            metric.opclass,
+            metric.operator,
+        )
+    raise ValueError(
+        f"Unknown rag_vector_index {index_type!r}; "
+        f"expected one of {list(VECTOR_INDEX_TYPES)}"
+    )
+
+
+def get_index_spec() -> VectorIndexSpec:
+    """Return the index spec for the configured index type and embeddings."""
+
+    from ..services.embeddings import get_embedding_dimension
+
+    settings = get_settings()
+    return build_index_spec(
+        settings.rag_vector_index,
+        get_distance_metric(),
+        get_embedding_dimension(),
+        settings.rag_index_truncate_dimension,
+    )
+
+
+_COLLECTION_NAME_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+
+def validate_collection_name(name: str) -> str:
+    """Return ``name`` if it is a valid collection name, else raise ValueError.
+
+    Names are restricted to lowercase letters, digits, ``_`` and ``-`` so
+    they can be inlined as literals in partial-index predicates and queries.
+    """
+
+    if not _COLLECTION_NAME_PATTERN.match(name):
+        raise ValueError(
+            "Collection names must be 1-64 characters of a-z, 0-9, '_' or '-'"
+        )
+    return name
+
+
+def collection_index_name(collection: str) -> str:
+    """Return the partial HNSW index name for a collection (<= 63 chars)."""
+
+    slug = collection.replace("-", "_")[:32]
+    digest = hashlib.sha1(collection.encode("utf-8")).hexdigest()[:8]
+    return f"ix_document_chunks_hnsw_{slug}_{digest}"
+
+
+async def _ensure_hnsw_index(
+    conn: AsyncConnection, name: str, predicate: str | None = None
+) -> None:
+    """Create an HNSW index, rebuilding it if its definition changed.
+
+    The index comment records the expression, operator class and build
+    parameters it was created with, so changing any of them in Settings
+    triggers a rebuild at the next startup.
+    """
+
+    settings = get_settings()
+    spec = get_index_spec()
+    signature = (
+        f"{spec.column('embedding')} {spec.opclass} "
+        f"m={settings.rag_hnsw_m} ef_construction={settings.rag_hnsw_ef_construction}"
+    )
+
+    current = (
+        await conn.execute(
+            text(
+                "SELECT to_regclass(:name) IS NOT NULL, "
+                "obj_description(to_regclass(:name), 'pg_class')"
+            ),
+            {"name": name},
+        )
+    ).one()
+    if current[0]:
+        if current[1] == signature:
+            return
+        await conn.execute(text(f"DROP INDEX {name}"))
+
+    column = spec.column("embedding")
+    if spec.reranked:
+        column = f"({column})"  # expression indexes need parentheses
+    where = f"WHERE {predicate}" if predicate else ""
+    await conn.execute(
+        text(
+            f"""
+            CREATE INDEX {name}
+            ON document_chunks
+            USING hnsw ({column} {spec.opclass})
+            WITH (m = {settings.rag_hnsw_m},
+                  ef_construction = {settings.rag_hnsw_ef_construction})
+            {where}
+            """
+        )
+    )
+    await conn.execute(text(f"COMMENT ON INDEX {name} IS '{signature}'"))
+
+
+async def create_vector_index(conn: AsyncConnection) -> None:
+    """Ensure the global HNSW index on ``document_chunks.embedding``."""
+
+    await _ensure_hnsw_index(conn, GLOBAL_INDEX_NAME)
+
+
+async def create_collection_index(conn: AsyncConnection, collection: str) -> None:
+    """Create a partial HNSW index covering only one collection's chunks.
+
+    Queries filtered to the collection (with the name inlined as a literal)
+    can then scan a small graph instead of post-filtering the global one.
+    """
+
+    validate_collection_name(collection)
+    await _ensure_hnsw_index(
+        conn, collection_index_name(collection), f"collection = '{collection}'"
+    )
+
+
+async def create_all_collection_indexes(conn: AsyncConnection) -> None:
+    """Ensure every registered collection has its partial HNSW index."""
+
+    result = await conn.execute(text("SELECT name FROM collections"))
+    for collection in result.scalars().all():
+        await create_collection_index(conn, collection)
+
+
+__all__ = [
+    "DISTANCE_METRICS",
+    "DistanceMetric",
+    "GLOBAL_INDEX_NAME",
+    "RAG_TABLES",
+    "VECTOR_INDEX_TYPES",
+    "VectorIndexSpec",
+    "build_index_spec",
+    "collection_index_name",
+    "create_all_collection_indexes",
+    "create_collection_index",
+    "create_vector_index",
+    "get_distance_metric",
+    "get_index_spec",
+    "validate_collection_name",
+]
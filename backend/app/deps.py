@@ -26,3 +26,10 @@ async def db_session_dependency(
     """Expose the DB session as a dependency for request handlers."""
 
     yield session
+
+
+async def read_session_dependency() -> AsyncIterator[AsyncSession]:
+    """Yield a session from the read-only "rag" pool (replica if configured)."""
+
+    async for session in get_async_session("rag"):
+        yield session
@@ -1,5 +1,8 @@
 """FastAPI application entrypoint."""
 
+import importlib
+import logging
+import threading
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
@@ -7,19 +10,73 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from .config import get_settings
 from .api.v1 import router as api_router
-from .core.db import init_db
+from .core.db import dispose_engines
+from .core.migrations import verify_schema
+from .services.email_service import start_dispatcher, stop_dispatcher
+from .services.http_service import close_client, start_client
+from .services.ingestion import shutdown_process_pool
+from .services.ingestion_jobs import start_workers, stop_workers
+from .services.search_service import close_clients as close_search_clients
+from .services.shared_cache import close_shared_cache
+from .services.table_versions import start_listener, stop_listener
+
+
+logger = logging.getLogger(__name__)
+
+
+def _warm_modules() -> list[str]:
+    """Modules the first agent request would otherwise import inline."""
+
+    settings = get_settings()
+    modules = ["app.services.agent_service"]
+    if settings.openai_api_key:
+        modules.append("langchain_openai")
+    if settings.google_api_key:
+        modules.append("langchain_google_genai")
+    if settings.langfuse_public_key and settings.langfuse_secret_key:
+        modules.append("langfuse.langchain")
+    return modules
+
+
+def _warm_imports() -> None:
+    for name in _warm_modules():
+        try:
+            importlib.import_module(name)
+        except Exception:  # pragma: no cover - surfaced on first use instead
+            logger.warning("Warm-up import of %s failed", name, exc_info=True)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):  # pragma: no cover - side-effectful
     """Application lifespan context.
 
-    Ensures the database is initialised (extensions, tables, indexes) before
-    handling any requests.
+    Checks that the database schema was migrated for this build (schema
+    changes run out of band via ``python -m app.manage migrate``) and starts
+    the background ingestion workers, the table-change listener used by the
+    SQL result cache, the shared HTTP client and the email dispatcher; heavy
+    agent imports are warmed in a daemon thread once serving. On shutdown the
+    workers hand their jobs back, the process pool is torn down and pooled
+    connections are closed.
     """
 
-    await init_db()
+    await verify_schema()
+    start_workers()
+    start_listener()
+    start_client()
+    start_dispatcher()
+    if get_settings().startup_warm_imports:
+        threading.Thread(
+            target=_warm_imports, name="warm-imports", daemon=True
+        ).start()
     yield
+    await stop_dispatcher()
+    await close_client()
+    await close_search_clients()
+    await close_shared_cache()
+    await stop_listener()
+    await stop_workers()
+    shutdown_process_pool()
+    await dispose_engines()
 
 
 def create_app() -> FastAPI:
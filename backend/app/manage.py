@@ -0,0 +1,62 @@
+"""Operational commands, run before (not inside) the API processes::
+
+    python -m app.manage migrate [--seed]   # create/update the schema
+    python -m app.manage seed               # demo rows + policy document
+    python -m app.manage check              # exit 1 if a migration is due
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import sys
+
+from .core.db import dispose_engines
+from .core.migrations import (
+    SCHEMA_VERSION,
+    SchemaVersionError,
+    migrate,
+    seed,
+    verify_schema,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+async def _run(command: str, with_seed: bool) -> int:
+    try:
+        if command == "check":
+            try:
+                await verify_schema()
+            except SchemaVersionError as exc:
+                logger.error("%s", exc)
+                return 1
+            logger.info("Schema is at version %d", SCHEMA_VERSION)
+            return 0
+        if command == "migrate":
+            await migrate()
+            logger.info("Schema migrated to version %d", SCHEMA_VERSION)
+        if command == "seed" or with_seed:
+            await seed()
+            logger.info("Seed data loaded")
+        return 0
+    finally:
+        await dispose_engines()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Optimus Agent management commands")
+    parser.add_argument("command", choices=("migrate", "seed", "check"))
+    parser.add_argument(
+        "--seed", action="store_true", help="load seed data after migrating"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(_run(args.command, args.seed)))
+
+
+if __name__ == "__main__":
+    main()
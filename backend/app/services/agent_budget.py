@@ -0,0 +1,241 @@
+"""Per-run agent budgets: limits, usage and the tool results of one run.
+
+Runs opt in by calling ``begin_run()``, which puts a fresh ``RunBudget`` in
+a context variable that ``agent_middleware.AgentBudgetMiddleware`` (running
+inside the same request task and the tasks LangGraph spawns from it) reads
+and updates. Kept free of LangChain imports so metrics can report
+``get_agent_stats()`` without loading the agent runtime.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+from ..config import get_settings
+
+if TYPE_CHECKING:
+    from langchain_core.messages import ToolMessage
+
+
+logger = logging.getLogger(__name__)
+
+
+def _is_error(message: ToolMessage) -> bool:
+    if getattr(message, "status", None) == "error":
+        return True
+    content = message.content
+    if isinstance(content, str) and content.startswith("{"):
+        try:
+            payload = json.loads(content)
+        except ValueError:
+            return False
+        return isinstance(payload, dict) and payload.get("status") == "error"
+    return False
+
+
+@dataclass
+class RunBudget:
+    """Limits and usage of one agent run."""
+
+    max_model_turns: int
+    max_tool_calls_per_tool: int
+    tool_call_limits: dict[str, int]
+    max_total_tokens: int
+    max_run_seconds: float
+    max_consecutive_errors: int
+
+    started: float = field(default_factory=time.monotonic)
+    model_turns: int = 0
+    total_tokens: int = 0
+    tool_calls: Counter[str] = field(default_factory=Counter)
+    duplicate_calls_avoided: int = 0
+    tool_calls_blocked: int = 0
+    consecutive_errors: int = 0
+    exhausted: str | None = None
+    exhausted_detail: str = ""
+    wrapped_up: bool = False
+    reported: bool = False
+    _results: dict[tuple[str, str], asyncio.Future[ToolMessage | None]] = field(
+        default_factory=dict, repr=False
+    )
+
+    @classmethod
+    def from_settings(cls) -> "RunBudget":
+        settings = get_settings()
+        return cls(
+            max_model_turns=settings.agent_max_model_turns,
+            max_tool_calls_per_tool=settings.agent_max_tool_calls_per_tool,
+            tool_call_limits=dict(settings.agent_tool_call_limits),
+            max_total_tokens=settings.agent_max_total_tokens,
+            max_run_seconds=settings.agent_max_run_seconds,
+            max_consecutive_errors=settings.agent_max_consecutive_errors,
+        )
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def recursion_limit(self) -> int | None:
+        """LangGraph step limit leaving room for the wrap-up turn."""
+
+        if not self.max_model_turns:
+            return None
+        # Each turn is a model step plus a tool step.
+        return 2 * (self.max_model_turns + 1) + 5
+
+    def tool_limit(self, name: str) -> int:
+        return self.tool_call_limits.get(name, self.max_tool_calls_per_tool)
+
+    def check(self) -> str | None:
+        """Record and return the first exhausted run-level budget, if any."""
+
+        if self.exhausted is not None:
+            return self.exhausted
+        if self.max_model_turns and self.model_turns >= self.max_model_turns:
+            self._exhaust("model_turns", f"{self.model_turns} model turns")
+        elif self.max_total_tokens and self.total_tokens >= self.max_total_tokens:
+            self._exhaust("tokens", f"{self.total_tokens} tokens")
+        elif self.max_run_seconds and self.elapsed >= self.max_run_seconds:
+            self._exhaust("wall_clock", f"{self.elapsed:.0f}s elapsed")
+        return self.exhausted
+
+    def record_tool_result(self, message: ToolMessage) -> None:
+        if _is_error(message):
+            self.consecutive_errors += 1
+            if (
+                self.max_consecutive_errors
+                and self.consecutive_errors >= self.max_consecutive_errors
+                and self.exhausted is None
+            ):
+                self._exhaust(
+                    "error_loop",
+                    f"the last {self.consecutive_errors} tool calls failed",
+                )
+        else:
+            self.consecutive_errors = 0
+
+    def _exhaust(self, reason: str, detail: str) -> None:
+        self.exhausted = reason
+        self.exhausted_detail = detail
+        _stats.exhausted[reason] += 1
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "model_turns": self.model_turns,
+            "tool_calls": dict(self.tool_calls),
+            "total_tokens": self.total_tokens,
+            "seconds": round(self.elapsed, 2),
+            "duplicate_calls_avoided": self.duplicate_calls_avoided,
+            "tool_calls_blocked": self.tool_calls_blocked,
+            "exhausted": self.exhausted,
+            "limits": {
+                "model_turns": self.max_model_turns,
+                "tool_calls_per_tool": self.max_tool_calls_per_tool,
+                "tool_call_limits": self.tool_call_limits,
+                "total_tokens": self.max_total_tokens,
+                "run_seconds": self.max_run_seconds,
+                "consecutive_errors": self.max_consecutive_errors,
+            },
+        }
+
+    def exhaustion_event(self) -> dict[str, Any]:
+        """Payload of the ``budget_exhausted`` SSE event."""
+
+        return {
+            "type": "budget_exhausted",
+            "reason": self.exhausted,
+            "detail": self.exhausted_detail,
+            "summary": self.summary(),
+        }
+
+
+@dataclass
+class AgentStats:
+    """Budget outcomes across runs."""
+
+    runs: int = 0
+    duplicate_calls_avoided: int = 0
+    tool_calls_blocked: int = 0
+    exhausted: Counter[str] = field(default_factory=Counter)
+    _turns: deque[int] = field(
+        default_factory=lambda: deque(maxlen=512), init=False, repr=False
+    )
+    _tokens: deque[int] = field(
+        default_factory=lambda: deque(maxlen=512), init=False, repr=False
+    )
+
+    def snapshot(self) -> dict[str, Any]:
+        def percentiles(values: deque[int]) -> tuple[int, int]:
+            ordered = sorted(values)
+            if not ordered:
+                return 0, 0
+            return (
+                ordered[len(ordered) // 2],
+                ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+            )
+
+        turns_p50, turns_p95 = percentiles(self._turns)
+        tokens_p50, tokens_p95 = percentiles(self._tokens)
+        return {
+            "runs": self.runs,
+            "duplicate_calls_avoided": self.duplicate_calls_avoided,
+            "tool_calls_blocked": self.tool_calls_blocked,
+            "budget_exhausted": dict(self.exhausted),
+            "model_turns_p50": turns_p50,
+            "model_turns_p95": turns_p95,
+            "tokens_p50": tokens_p50,
+            "tokens_p95": tokens_p95,
+        }
+
+
+_stats = AgentStats()
+# Not reset after a run: every request runs in its own task, whose context
+# (and therefore this variable) is discarded with it.
+_current: ContextVar[RunBudget | None] = ContextVar("agent_run_budget", default=None)
+
+
+def begin_run() -> RunBudget:
+    """Start budgeting the agent run executed in the current context."""
+
+    budget = RunBudget.from_settings()
+    _current.set(budget)
+    return budget
+
+
+def finish_run(budget: RunBudget) -> dict[str, Any]:
+    """Record a finished run and return its summary."""
+
+    _stats.runs += 1
+    _stats.duplicate_calls_avoided += budget.duplicate_calls_avoided
+    _stats.tool_calls_blocked += budget.tool_calls_blocked
+    _stats._turns.append(budget.model_turns)
+    _stats._tokens.append(budget.total_tokens)
+    summary = budget.summary()
+    logger.info("Agent run finished: %s", json.dumps(summary))
+    return summary
+
+
+def current_budget() -> RunBudget | None:
+    """The budget of the run executing in this context, if any."""
+
+    return _current.get()
+
+
+def get_agent_stats() -> dict[str, Any]:
+    return _stats.snapshot()
+
+
+__all__ = [
+    "RunBudget",
+    "begin_run",
+    "current_budget",
+    "finish_run",
+    "get_agent_stats",
+]
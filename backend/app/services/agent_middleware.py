@@ -0,0 +1,160 @@
+"""LangChain agent middleware enforcing the current run's ``RunBudget``.
+
+* Model turns, total tokens and wall clock are checked before each model
+  call. Once one is exhausted, or the last ``agent_max_consecutive_errors``
+  tool results were all errors, the model gets one final turn with its tools
+  removed and a note asking for the best answer from what it has. A model
+  that still asks for tools after that gets a canned final answer.
+* Each tool has a call budget; calls past it return a structured
+  ``tool_budget_exhausted`` error without running the tool.
+* An identical call (same tool, same arguments) returns the earlier result,
+  and concurrent identical calls share one execution.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any, Awaitable, Callable
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from .agent_budget import current_budget
+
+
+_REASONS = {
+    "model_turns": "model turn",
+    "tokens": "token",
+    "wall_clock": "time",
+    "error_loop": "error",
+}
+
+_WRAP_UP_NOTE = (
+    "The {label} budget for this request is exhausted ({detail}). Do not call "
+    "any more tools. Using only the information gathered so far, give your "
+    "best final answer now and briefly say what could not be completed."
+)
+
+
+def _tool_error(error_type: str, message: str, call: dict[str, Any]) -> ToolMessage:
+    return ToolMessage(
+        content=json.dumps(
+            {"status": "error", "error_type": error_type, "message": message}
+        ),
+        tool_call_id=call["id"],
+        name=call["name"],
+        status="error",
+    )
+
+
+class AgentBudgetMiddleware(AgentMiddleware):
+    """Enforces the current ``RunBudget`` around model and tool calls."""
+
+    def __init__(self, final_answer_marker: str) -> None:
+        super().__init__()
+        self._final_answer_marker = final_answer_marker
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+    ) -> ModelResponse:
+        budget = current_budget()
+        if budget is None:
+            return await handler(request)
+
+        if budget.check() is not None:
+            label = _REASONS[budget.exhausted]
+            if budget.wrapped_up:
+                return ModelResponse(
+                    result=[
+                        AIMessage(
+                            content=(
+                                f"{self._final_answer_marker}\n"
+                                f"I had to stop before finishing: the {label} "
+                                "budget for this request ran out."
+                            )
+                        )
+                    ]
+                )
+            budget.wrapped_up = True
+            note = _WRAP_UP_NOTE.format(label=label, detail=budget.exhausted_detail)
+            request = request.override(
+                tools=[], messages=[*request.messages, HumanMessage(content=note)]
+            )
+
+        budget.model_turns += 1
+        response = await handler(request)
+        for message in response.result:
+            usage = getattr(message, "usage_metadata", None)
+            if usage:
+                budget.total_tokens += usage.get("total_tokens", 0)
+        return response
+
+    async def awrap_tool_call(
+        self,
+        request: Any,
+        handler: Callable[[Any], Awaitable[Any]],
+    ) -> Any:
+        budget = current_budget()
+        if budget is None:
+            return await handler(request)
+
+        call = request.tool_call
+        name = call["name"]
+        key = (name, json.dumps(call.get("args"), sort_keys=True, default=str))
+
+        earlier = budget._results.get(key)
+        if earlier is not None:
+            # Shielded: a cancelled waiter must not cancel the shared call.
+            result = await asyncio.shield(earlier)
+            if result is not None:
+                budget.duplicate_calls_avoided += 1
+                message = ToolMessage(
+                    content=result.content,
+                    tool_call_id=call["id"],
+                    name=name,
+                    status=result.status,
+                )
+                # Feeds loop detection: repeating a failed call fails again.
+                budget.record_tool_result(message)
+                return message
+
+        if budget.exhausted is not None:
+            budget.tool_calls_blocked += 1
+            return _tool_error(
+                "budget_exhausted",
+                "The budget for this request is exhausted; answer with what "
+                "you have.",
+                call,
+            )
+        limit = budget.tool_limit(name)
+        if limit and budget.tool_calls[name] >= limit:
+            budget.tool_calls_blocked += 1
+            message = _tool_error(
+                "tool_budget_exhausted",
+                f"{name} may be called at most {limit} times per request.",
+                call,
+            )
+            budget.record_tool_result(message)
+            return message
+
+        budget.tool_calls[name] += 1
+        # Resolves to the ToolMessage to replay, or None when the call is
+        # not replayable (it raised, or returned a state-updating Command).
+        future: asyncio.Future[ToolMessage | None] = (
+            asyncio.get_running_loop().create_future()
+        )
+        budget._results[key] = future
+        result = None
+        try:
+            result = await handler(request)
+        finally:
+            replayable = isinstance(result, ToolMessage)
+            if not replayable:
+                del budget._results[key]
+            future.set_result(result if replayable else None)
+        if replayable:
+            budget.record_tool_result(result)
+        return result
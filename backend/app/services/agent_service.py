@@ -10,6 +10,8 @@ from typing import Any
 from langchain.agents import create_agent
 from langchain_core.messages import BaseMessage
 
+from .agent_budget import RunBudget, begin_run, finish_run
+from .agent_middleware import AgentBudgetMiddleware
 from .llm_factory import get_chat_model
 from .tool_registry import get_tools
 from .telemetry import get_callback_handlers
@@ -20,7 +22,9 @@ _TOOL_LABELS: dict[str, str] = {
     "sql_fetch": "Database lookup",
     "http_request": "External API call",
     "rag_lookup": "Knowledge base search",
+    "rag_lookup_many": "Knowledge base search",
     "calculator": "Calculate value",
+    "calculator_batch": "Calculate values",
     "send_mail": "Send email",
     "search": "Search knowledge base",
 }
@@ -29,7 +33,9 @@ _REQUEST_LABELS: dict[str, str] = {
     "sql_fetch": "Searching internal database",
     "http_request": "Calling external API",
     "rag_lookup": "Searching knowledge base",
+    "rag_lookup_many": "Searching knowledge base",
     "calculator": "Calculating",
+    "calculator_batch": "Calculating",
     "send_mail": "Sending email",
     "search": "Searching knowledge base",
 }
@@ -38,8 +44,10 @@ _RESULT_LABELS: dict[str, str] = {
     "sql_fetch": "Database result",
     "http_request": "API response",
     "rag_lookup": "Knowledge result",
+    "rag_lookup_many": "Knowledge results",
     "calculator": "Calculation result",
-    "send_mail": "Email sent",
+    "calculator_batch": "Calculation results",
+    "send_mail": "Email queued",
     "search": "Search result",
 }
 
@@ -68,23 +76,40 @@ def _get_agent(provider: str, model_name: str):
         llm,
         tools,
         system_prompt=SYSTEM_PROMPT,
+        middleware=[AgentBudgetMiddleware(_FINAL_ANSWER_DELIMITER)],
     )
 
 
+def _run_config(budget: RunBudget) -> dict[str, Any] | None:
+    config: dict[str, Any] = {}
+    callbacks = list(get_callback_handlers())
+    if callbacks:
+        config["callbacks"] = callbacks
+    recursion_limit = budget.recursion_limit()
+    if recursion_limit is not None:
+        config["recursion_limit"] = recursion_limit
+    return config or None
+
+
 async def run_agent_query(query: str, provider: str, model_name: str) -> str:
     """Execute the agent once and return the final text answer."""
     agent = _get_agent(provider, model_name)
 
-    callbacks = list(get_callback_handlers())
-    config: dict[str, Any] | None = {"callbacks": callbacks} if callbacks else None
+    budget = begin_run()
+    config = _run_config(budget)
 
-    if config is not None:
-        result = await agent.ainvoke(
-            {"messages": [{"role": "user", "content": query}]},
-            config=config,
-        )
-    else:
-        result = await agent.ainvoke({"messages": [{"role": "user", "content": query}]})
+    try:
+        if config is not None:
+            result = await agent.ainvoke(
+                {"messages": [{"role": "user", "content": query}]},
+                config=config,
+            )
+        else:
+            result = await agent.ainvoke(
+                {"messages": [{"role": "user", "content": query}]}
+            )
+    finally:
+        finish_run(budget)
 
     messages = result.get("messages", []) if isinstance(result, dict) else []
     if not messages:
@@ -98,15 +123,37 @@ async def stream_agent_events(
     provider: str,
     model_name: str,
 ) -> AsyncIterator[str]:
-    """Yield SSE-formatted updates and messages from the agent run"""
+    """Yield SSE-formatted updates and messages from the agent run.
 
+    A ``budget_exhausted`` event is sent as soon as a run budget runs out
+    (the final answer follows), and a ``run_summary`` event with the run's
+    usage and avoided calls closes the stream.
+    """
+
+    budget = begin_run()
+    try:
+        async for event in _stream_run(query, provider, model_name, budget):
+            yield event
+        if budget.exhausted is not None and not budget.reported:
+            budget.reported = True
+            yield _format_sse(budget.exhaustion_event())
+        yield _format_sse({"type": "run_summary", "summary": budget.summary()})
+    finally:
+        finish_run(budget)
+
+
+async def _stream_run(
+    query: str,
+    provider: str,
+    model_name: str,
+    budget: RunBudget,
+) -> AsyncIterator[str]:
     agent = _get_agent(provider, model_name)
     final_text: str | None = None
     pending_text: str = ""
     final_answer_started = False
 
-    callbacks = list(get_callback_handlers())
-    config: dict[str, Any] | None = {"callbacks": callbacks} if callbacks else None
+    config = _run_config(budget)
 
     stream_kwargs: dict[str, Any] = {
         "stream_mode": ["updates", "messages"],
@@ -118,6 +165,10 @@ async def stream_agent_events(
         {"messages": [{"role": "user", "content": query}]},
         **stream_kwargs,
     ):
+        if budget.exhausted is not None and not budget.reported:
+            budget.reported = True
+            yield _format_sse(budget.exhaustion_event())
+
         if mode == "updates":
             chunk = data
             if not isinstance(chunk, dict):
@@ -1,35 +1,519 @@
-"""Simple arithmetic expression evaluation service."""
+"""Bounded-cost math expression evaluation for the calculator tools.
+
+Expressions are parsed with ``ast`` and compiled (iteratively, so deep
+nesting cannot exhaust the interpreter stack) into a flat postfix program
+of whitelisted operations, with constant subexpressions folded. Compiled
+programs are cached by expression text.
+
+Every evaluation runs under budgets from Settings: expression length and
+operation count at compile time; an exponent cap, a cap on
+the magnitude of every intermediate result, and an evaluation step limit
+(instructions x rows) at run time. Arithmetic is done in floats, so no
+single operation can run away the way ``9**9**9**9`` does on integers.
+
+``evaluate_batch`` runs one expression over columns of inputs, vectorized
+with NumPy when it is installed and row by row otherwise.
+"""
 
 from __future__ import annotations
 
 import ast
+import math
 import operator as op
-from typing import Any
+from functools import lru_cache, reduce
+from typing import Any, Callable, Mapping, NamedTuple, Sequence
+
+from ..config import get_settings
+
+
+class BudgetExceededError(ValueError):
+    """The expression exceeds one of the calculator's cost budgets."""
+
+
+# Instruction opcodes.
+_CONST = 0
+_LOAD = 1
+_APPLY = 2
+
+
+class Instruction(NamedTuple):
+    opcode: int
+    # Constant value, variable name, or operator key (an ast operator class
+    # or a function name).
+    operand: Any
+    nargs: int = 0
 
 
-_ALLOWED_OPERATORS: dict[type[ast.AST], Any] = {
+class CompiledExpression(NamedTuple):
+    program: tuple[Instruction, ...]
+    variables: frozenset[str]
+
+
+def _factorial(value: float) -> float:
+    # Beyond 170! the result no longer fits in a float.
+    if not float(value).is_integer() or not 0 <= value <= 170:
+        raise ValueError("needs an integer between 0 and 170")
+    return float(math.factorial(int(value)))
+
+
+def _round(value: float, digits: float = 0) -> float:
+    if not float(digits).is_integer():
+        raise ValueError("digits must be an integer")
+    return round(value, int(digits))
+
+
+# Operator/function key -> scalar implementation.
+_SCALAR_OPS: dict[Any, Callable[..., float]] = {
     ast.Add: op.add,
     ast.Sub: op.sub,
     ast.Mult: op.mul,
     ast.Div: op.truediv,
-    ast.Pow: op.pow,
+    ast.FloorDiv: op.floordiv,
+    ast.Mod: op.mod,
+    ast.Pow: math.pow,
     ast.USub: op.neg,
+    ast.UAdd: op.pos,
+    "abs": abs,
+    "sqrt": math.sqrt,
+    "exp": math.exp,
+    "log": math.log,
+    "log10": math.log10,
+    "log2": math.log2,
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "asin": math.asin,
+    "acos": math.acos,
+    "atan": math.atan,
+    "atan2": math.atan2,
+    "sinh": math.sinh,
+    "cosh": math.cosh,
+    "tanh": math.tanh,
+    "degrees": math.degrees,
+    "radians": math.radians,
+    "floor": lambda x: float(math.floor(x)),
+    "ceil": lambda x: float(math.ceil(x)),
+    "trunc": lambda x: float(math.trunc(x)),
+    "round": _round,
+    "min": lambda *args: min(args),
+    "max": lambda *args: max(args),
+    "hypot": math.hypot,
+    "factorial": _factorial,
+}
+
+# Function name -> (min args, max args or None for variadic).
+_ARITY: dict[str, tuple[int, int | None]] = {
+    name: (1, 1) for name in _SCALAR_OPS if isinstance(name, str)
 }
+_ARITY.update(
+    log=(1, 2), round=(1, 2), atan2=(2, 2), min=(1, None), max=(1, None), hypot=(1, None)
+)
+
+_CONSTANTS = {"pi": math.pi, "e": math.e, "tau": math.tau}
+
+_SYMBOLS = {
+    ast.Add: "+",
+    ast.Sub: "-",
+    ast.Mult: "*",
+    ast.Div: "/",
+    ast.FloorDiv: "//",
+    ast.Mod: "%",
+    ast.Pow: "**",
+    ast.USub: "-",
+    ast.UAdd: "+",
+}
+
+
+# --- Compilation -------------------------------------------------------------
+
+
+def _children(node: ast.AST) -> list[ast.expr]:
+    """Validate ``node`` and return its operands."""
+
+    if isinstance(node, ast.BinOp) and type(node.op) in _SYMBOLS:
+        return [node.left, node.right]
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _SYMBOLS:
+        return [node.operand]
+    if isinstance(node, ast.Call):
+        name = node.func.id if isinstance(node.func, ast.Name) else None
+        if name not in _ARITY:
+            raise ValueError(f"Unknown function: {ast.unparse(node.func)}")
+        if node.keywords or any(isinstance(arg, ast.Starred) for arg in node.args):
+            raise ValueError(f"{name}() takes positional arguments only")
+        low, high = _ARITY[name]
+        if len(node.args) < low or (high is not None and len(node.args) > high):
+            raise ValueError(f"Wrong number of arguments for {name}()")
+        return list(node.args)
+    if isinstance(node, (ast.Constant, ast.Name)):
+        return []
+    raise ValueError(f"Unsupported syntax: {type(node).__name__}")
+
+
+def _leaf(node: ast.expr, max_magnitude: float) -> Instruction:
+    if isinstance(node, ast.Constant):
+        value = node.value
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"Unsupported constant: {value!r}")
+        if not abs(value) <= max_magnitude:
+            raise BudgetExceededError(
+                f"Number {value!r} exceeds the magnitude limit of {max_magnitude:g}"
+            )
+        return Instruction(_CONST, float(value))
+    assert isinstance(node, ast.Name)
+    if node.id in _CONSTANTS:
+        return Instruction(_CONST, _CONSTANTS[node.id])
+    if node.id in _ARITY:
+        raise ValueError(f"{node.id} is a function; call it as {node.id}(...)")
+    return Instruction(_LOAD, node.id)
+
+
+def _operator(node: ast.expr) -> Instruction:
+    if isinstance(node, ast.BinOp):
+        return Instruction(_APPLY, type(node.op), 2)
+    if isinstance(node, ast.UnaryOp):
+        return Instruction(_APPLY, type(node.op), 1)
+    assert isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+    return Instruction(_APPLY, node.func.id, len(node.args))
+
+
+@lru_cache(maxsize=get_settings().calculator_cache_size)
+def compile_expression(expression: str) -> CompiledExpression:
+    """Parse, validate and compile ``expression`` into a postfix program.
+
+    Raises ValueError for invalid or unsupported expressions and
+    BudgetExceededError when a compile-time budget is exceeded.
+    """
+
+    settings = get_settings()
+    if len(expression) > settings.calculator_max_expression_chars:
+        raise BudgetExceededError(
+            f"Expression is longer than {settings.calculator_max_expression_chars} characters"
+        )
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as exc:
+        raise ValueError(f"Invalid expression: {exc.msg}") from None
+    except (RecursionError, MemoryError):
+        raise BudgetExceededError("Expression is nested too deeply") from None
+
+    program: list[Instruction] = []
+    # Post-order walk with an explicit stack: (node, operands_done).
+    pending: list[tuple[ast.expr, bool]] = [(tree.body, False)]
+    while pending:
+        node, operands_done = pending.pop()
+        if operands_done:
+            _fold_constants(program, _operator(node), settings)
+            continue
+        children = _children(node)
+        if children:
+            pending.append((node, True))
+            pending.extend((child, False) for child in reversed(children))
+        else:
+            program.append(_leaf(node, settings.calculator_max_magnitude))
+        if len(program) + len(pending) > settings.calculator_max_nodes:
+            raise BudgetExceededError(
+                f"Expression has more than {settings.calculator_max_nodes} operations"
+            )
+
+    return CompiledExpression(
+        program=tuple(program),
+        variables=frozenset(i.operand for i in program if i.opcode == _LOAD),
+    )
+
+
+def _fold_constants(
+    program: list[Instruction], instruction: Instruction, settings: Any
+) -> None:
+    """Append ``instruction``, evaluating it now if its operands are constants."""
+
+    nargs = instruction.nargs
+    operands = program[-nargs:]
+    if all(operand.opcode == _CONST for operand in operands):
+        value = _apply_scalar(
+            instruction.operand,
+            [operand.operand for operand in operands],
+            settings.calculator_max_exponent,
+            settings.calculator_max_magnitude,
+        )
+        del program[-nargs:]
+        program.append(Instruction(_CONST, value))
+    else:
+        program.append(instruction)
+
+
+# --- Scalar evaluation -------------------------------------------------------
+
+
+def _describe(key: Any) -> str:
+    return _SYMBOLS.get(key) or f"{key}()"
+
+
+def _apply_scalar(
+    key: Any, args: Sequence[float], max_exponent: float, max_magnitude: float
+) -> float:
+    if key is ast.Pow and not abs(args[1]) <= max_exponent:
+        raise BudgetExceededError(
+            f"Exponent {args[1]:g} exceeds the limit of {max_exponent:g}"
+        )
+    try:
+        value = float(_SCALAR_OPS[key](*args))
+    except ZeroDivisionError:
+        raise ValueError(f"Division by zero in {_describe(key)}") from None
+    except OverflowError:
+        raise BudgetExceededError(
+            f"Result of {_describe(key)} exceeds the magnitude limit of {max_magnitude:g}"
+        ) from None
+    except ValueError as exc:
+        raise ValueError(f"{_describe(key)}: {exc}") from None
+    if not abs(value) <= max_magnitude:
+        raise BudgetExceededError(
+            f"Result of {_describe(key)} exceeds the magnitude limit of {max_magnitude:g}"
+        )
+    return value
+
+
+def _coerce(name: str, value: Any) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"Variable {name!r} must be a number")
+    return float(value)
+
+
+def _check_variables(
+    compiled: CompiledExpression, names: Mapping[str, Any]
+) -> None:
+    missing = sorted(compiled.variables - names.keys())
+    if missing:
+        raise ValueError(f"Missing value for variable(s): {', '.join(missing)}")
+
+
+def _run_scalar(
+    program: Sequence[Instruction],
+    values: Mapping[str, float],
+    max_exponent: float,
+    max_magnitude: float,
+) -> float:
+    stack: list[float] = []
+    for opcode, operand, nargs in program:
+        if opcode == _CONST:
+            stack.append(operand)
+        elif opcode == _LOAD:
+            stack.append(values[operand])
+        else:
+            args = stack[-nargs:]
+            del stack[-nargs:]
+            stack.append(_apply_scalar(operand, args, max_exponent, max_magnitude))
+    return stack[0]
+
+
+def evaluate(expression: str, variables: Mapping[str, Any] | None = None) -> float:
+    """Evaluate ``expression`` with optional named ``variables``.
+
+    Raises ValueError (BudgetExceededError for budget breaches) on invalid
+    expressions, math errors and missing variables.
+    """
+
+    settings = get_settings()
+    compiled = compile_expression(expression)
+    variables = variables or {}
+    _check_variables(compiled, variables)
+    values = {name: _coerce(name, variables[name]) for name in compiled.variables}
+    return _run_scalar(
+        compiled.program,
+        values,
+        settings.calculator_max_exponent,
+        settings.calculator_max_magnitude,
+    )
+
+
+# --- Batch evaluation --------------------------------------------------------
+
+
+def _numpy() -> Any | None:
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+@lru_cache(maxsize=1)
+def _numpy_ops() -> dict[Any, Callable[..., Any]]:
+    np = _numpy()
+    assert np is not None
+
+    def log(x: Any, base: Any = None) -> Any:
+        return np.log(x) if base is None else np.log(x) / np.log(base)
+
+    def round_(x: Any, digits: Any = 0) -> Any:
+        if np.ndim(digits) or not float(digits).is_integer():
+            raise ValueError("round() digits must be an integer constant")
+        return np.round(x, int(digits))
+
+    def factorial(x: float) -> float:
+        try:
+            return _factorial(x)
+        except ValueError:
+            return math.nan
+
+    return {
+        ast.Add: np.add,
+        ast.Sub: np.subtract,
+        ast.Mult: np.multiply,
+        ast.Div: np.true_divide,
+        ast.FloorDiv: np.floor_divide,
+        ast.Mod: np.mod,
+        ast.Pow: np.power,
+        ast.USub: np.negative,
+        ast.UAdd: np.positive,
+        "abs": np.abs,
+        "sqrt": np.sqrt,
+        "exp": np.exp,
+        "log": log,
+        "log10": np.log10,
+        "log2": np.log2,
+        "sin": np.sin,
+        "cos": np.cos,
+        "tan": np.tan,
+        "asin": np.arcsin,
+        "acos": np.arccos,
+        "atan": np.arctan,
+        "atan2": np.arctan2,
+        "sinh": np.sinh,
+        "cosh": np.cosh,
+        "tanh": np.tanh,
+        "degrees": np.degrees,
+        "radians": np.radians,
+        "floor": np.floor,
+        "ceil": np.ceil,
+        "trunc": np.trunc,
+        "round": round_,
+        "min": lambda *args: reduce(np.minimum, args),
+        "max": lambda *args: reduce(np.maximum, args),
+        "hypot": lambda *args: reduce(np.hypot, args),
+        "factorial": np.vectorize(factorial, otypes=[float]),
+    }
+
+
+def _run_numpy(
+    np: Any,
+    program: Sequence[Instruction],
+    columns: Mapping[str, Any],
+    rows: int,
+    max_exponent: float,
+    max_magnitude: float,
+) -> list[float | None]:
+    ops = _numpy_ops()
+    stack: list[Any] = []
+    # Rows that hit a math error or a budget; reported as None.
+    failed = np.zeros(rows, dtype=bool)
+    with np.errstate(all="ignore"):
+        for opcode, operand, nargs in program:
+            if opcode == _CONST:
+                stack.append(operand)
+            elif opcode == _LOAD:
+                stack.append(columns[operand])
+            else:
+                args = stack[-nargs:]
+                del stack[-nargs:]
+                if operand is ast.Pow:
+                    failed |= ~(np.abs(args[1]) <= max_exponent)
+                value = np.asarray(ops[operand](*args), dtype=float)
+                # Also catches NaN, which numpy returns for domain errors.
+                failed |= ~(np.abs(value) <= max_magnitude)
+                stack.append(value)
+    results = np.broadcast_to(stack[0], (rows,))
+    return [
+        None if row_failed else value
+        for value, row_failed in zip(results.tolist(), failed.tolist())
+    ]
+
+
+def evaluate_batch(
+    expression: str, variables: Mapping[str, Sequence[Any] | Any]
+) -> list[float | None]:
+    """Evaluate ``expression`` once per row of ``variables``.
+
+    Each variable is a sequence (one value per row; all the same length) or
+    a single number shared by every row. Rows whose evaluation fails (e.g.
+    division by zero or a magnitude budget) come back as None; invalid
+    expressions and a batch over the step budget raise ValueError.
+    """
+
+    settings = get_settings()
+    compiled = compile_expression(expression)
+    _check_variables(compiled, variables)
+
+    columns: dict[str, list[float] | float] = {}
+    lengths = set()
+    for name in compiled.variables:
+        value = variables[name]
+        if isinstance(value, (str, bytes)) or not isinstance(value, Sequence):
+            columns[name] = _coerce(name, value)
+        else:
+            columns[name] = [_coerce(name, item) for item in value]
+            lengths.add(len(value))
+    if len(lengths) > 1:
+        raise ValueError("All variable lists must have the same length")
+    rows = lengths.pop() if lengths else 1
+
+    steps = len(compiled.program) * rows
+    if steps > settings.calculator_max_steps:
+        raise BudgetExceededError(
+            f"Batch needs {steps} evaluation steps; the limit is "
+            f"{settings.calculator_max_steps}"
+        )
+
+    np = _numpy()
+    if np is not None:
+        arrays = {
+            name: np.asarray(value, dtype=float) for name, value in columns.items()
+        }
+        return _run_numpy(
+            np,
+            compiled.program,
+            arrays,
+            rows,
+            settings.calculator_max_exponent,
+            settings.calculator_max_magnitude,
+        )
 
+    results: list[float | None] = []
+    for row in range(rows):
+        values = {
+            name: value[row] if isinstance(value, list) else value
+            for name, value in columns.items()
+        }
+        try:
+            results.append(
+                _run_scalar(
+                    compiled.program,
+                    values,
+                    settings.calculator_max_exponent,
+                    settings.calculator_max_magnitude,
+                )
+            )
+        except ValueError:
+            results.append(None)
+    return results
 
-def _eval(node: ast.AST) -> float:
-    if isinstance(node, ast.Num):  # type: ignore[attr-defined]
-        return float(node.n)  # type: ignore[no-any-return]
-    if isinstance(node, ast.BinOp) and type(node.op) in _ALLOWED_OPERATORS:
-        return _ALLOWED_OPERATORS[type(node.op)](_eval(node.left), _eval(node.right))
-    if isinstance(node, ast.UnaryOp) and type(node.op) in _ALLOWED_OPERATORS:
-        return _ALLOWED_OPERATORS[type(node.op)](_eval(node.operand))
-    msg = f"Unsupported expression: {ast.dump(node, include_attributes=False)}"
-    raise ValueError(msg)
 
+def get_cache_stats() -> dict[str, Any]:
+    info = compile_expression.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "entries": info.currsize,
+        "max_entries": info.maxsize,
+        "hit_rate": round(info.hits / lookups, 4) if lookups else 0.0,
+    }
 
-def evaluate(expression: str) -> float:
-    """Evaluate a basic arithmetic expression safely."""
 
-    parsed = ast.parse(expression, mode="eval")
-    return float(_eval(parsed.body))
+__all__ = [
+    "BudgetExceededError",
+    "CompiledExpression",
+    "compile_expression",
+    "evaluate",
+    "evaluate_batch",
+    "get_cache_stats",
+]
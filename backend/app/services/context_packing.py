@@ -0,0 +1,291 @@
+"""Token-budgeted packing of retrieved chunks into compact LLM context."""
+
+from __future__ import annotations
+
+import json
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Sequence
+
+from ..config import get_settings
+from .embeddings import estimate_tokens
+
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+# Passages shorter than this are not worth truncating into the remaining
+# budget; they would carry too little context to be useful.
+_MIN_TRUNCATED_TOKENS = 32
+
+# Shorter seams are as likely to be coincidence ("the" / "then") as real
+# splitter overlap; those chunks are joined with a newline instead.
+_MIN_OVERLAP_CHARS = 8
+
+
+@dataclass
+class Passage:
+    """A run of adjacent chunks from one document, merged without overlap."""
+
+    document_id: int
+    first_chunk: int
+    last_chunk: int
+    text: str
+    score: float
+    words: frozenset[str] = field(default_factory=frozenset, repr=False)
+
+    def as_dict(self) -> dict[str, Any]:
+        chunks = (
+            str(self.first_chunk)
+            if self.first_chunk == self.last_chunk
+            else f"{self.first_chunk}-{self.last_chunk}"
+        )
+        return {
+            "document_id": self.document_id,
+            "chunks": chunks,
+            "score": round(float(self.score), 4),
+            "text": self.text,
+        }
+
+
+@dataclass
+class PackedContext:
+    passages: list[Passage]
+    tokens: int
+    tokens_saved: int
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "passages": [passage.as_dict() for passage in self.passages],
+            "tokens": self.tokens,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+@dataclass
+class PackingStats:
+    """Cumulative counters across all packing calls."""
+
+    calls: int = 0
+    tokens_in: int = 0
+    tokens_out: int = 0
+    chunks_in: int = 0
+    passages_out: int = 0
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False
+    )
+
+    def record(
+        self, tokens_in: int, tokens_out: int, chunks: int, passages: int
+    ) -> None:
+        with self._lock:
+            self.calls += 1
+            self.tokens_in += tokens_in
+            self.tokens_out += tokens_out
+            self.chunks_in += chunks
+            self.passages_out += passages
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "tokens_in": self.tokens_in,
+            "tokens_out": self.tokens_out,
+            "tokens_saved": self.tokens_in - self.tokens_out,
+            "chunks_in": self.chunks_in,
+            "passages_out": self.passages_out,
+        }
+
+
+_stats = PackingStats()
+
+
+def get_packing_stats() -> dict[str, Any]:
+    return _stats.snapshot()
+
+
+def _merge_overlap(left: str, right: str, max_overlap: int) -> str:
+    """Join consecutive chunks, dropping the text they share at the seam.
+
+    The splitter only cuts between words, so a seam counts as overlap only if
+    it is at least ``_MIN_OVERLAP_CHARS`` long and both of its ends fall on
+    word boundaries in both chunks.
+    """
+
+    longest = min(len(left), len(right), max_overlap)
+    for size in range(longest, _MIN_OVERLAP_CHARS - 1, -1):
+        seam = right[:size]
+        if not left.endswith(seam):
+            continue
+        starts_on_boundary = size == len(left) or not (
+            left[-size - 1].isalnum() and seam[0].isalnum()
+        )
+        ends_on_boundary = size == len(right) or not (
+            seam[-1].isalnum() and right[size].isalnum()
+        )
+        if starts_on_boundary and ends_on_boundary:
+            return left + right[size:]
+    return f"{left}\n{right}"
+
+
+def _jaccard(a: frozenset[str], b: frozenset[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _containment(a: frozenset[str], b: frozenset[str]) -> float:
+    # Overlap coefficient: 1.0 when one passage's words are a subset of the
+    # other's, which Jaccard misses once neighbours have been merged.
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def merge_adjacent(rows: Sequence[dict[str, Any]], max_overlap: int) -> list[Passage]:
+    """Merge rows from the same document with consecutive ``chunk_index``."""
+
+    by_document: dict[int, list[dict[str, Any]]] = {}
+    for row in rows:
+        by_document.setdefault(row["document_id"], []).append(row)
+
+    passages: list[Passage] = []
+    for document_id, document_rows in by_document.items():
+        document_rows.sort(key=lambda row: row["chunk_index"])
+        current: Passage | None = None
+        for row in document_rows:
+            index = row["chunk_index"]
+            score = float(row["score"])
+            if current is not None and index == current.last_chunk + 1:
+                current.text = _merge_overlap(current.text, row["content"], max_overlap)
+                current.last_chunk = index
+                current.score = max(current.score, score)
+                continue
+            if current is not None and index == current.last_chunk:
+                continue  # duplicate row
+            current = Passage(document_id, index, index, row["content"], score)
+            passages.append(current)
+
+    for passage in passages:
+        passage.words = frozenset(_WORD_PATTERN.findall(passage.text.lower()))
+    return passages
+
+
+def _serialize(value: Any) -> str:
+    # What the tool layer would hand the model, for before/after estimates.
+    return json.dumps(value, default=str, ensure_ascii=False)
+
+
+def _truncate_to_tokens(text: str, tokens: int) -> str:
+    # Mirrors estimate_tokens (~4 characters per token); cut at a word break.
+    cut = text[: max(0, tokens - 1) * 4]
+    space = cut.rfind(" ")
+    if space > len(cut) // 2:
+        cut = cut[:space]
+    return cut.rstrip() + " …"
+
+
+def select_passages(
+    passages: list[Passage],
+    token_budget: int,
+    mmr_lambda: float,
+    duplicate_threshold: float,
+) -> list[Passage]:
+    """Pick passages by maximal marginal relevance within ``token_budget``.
+
+    Relevance is the min-max normalized retrieval score and redundancy the
+    word-set Jaccard similarity to already selected passages. Candidates
+    whose words are at least ``duplicate_threshold`` contained in a selected
+    passage are dropped as near-duplicates.
+    """
+
+    if not passages:
+        return []
+    scores = [passage.score for passage in passages]
+    low, high = min(scores), max(scores)
+    spread = (high - low) or 1.0
+    relevance = {id(p): (p.score - low) / spread for p in passages}
+
+    remaining = list(passages)
+    selected: list[Passage] = []
+    budget = token_budget
+    while remaining and budget > 0:
+        best: Passage | None = None
+        best_value = float("-inf")
+        for candidate in list(remaining):
+            if any(
+                _containment(candidate.words, chosen.words) >= duplicate_threshold
+                for chosen in selected
+            ):
+                remaining.remove(candidate)
+                continue
+            redundancy = max(
+                (_jaccard(candidate.words, chosen.words) for chosen in selected),
+                default=0.0,
+            )
+            value = (
+                mmr_lambda * relevance[id(candidate)]
+                - (1 - mmr_lambda) * redundancy
+            )
+            if value > best_value:
+                best, best_value = candidate, value
+        if best is None:
+            break
+        remaining.remove(best)
+
+        cost = estimate_tokens(best.text)
+        if cost > budget:
+            if budget < _MIN_TRUNCATED_TOKENS:
+                continue
+            best.text = _truncate_to_tokens(best.text, budget)
+            cost = estimate_tokens(best.text)
+        selected.append(best)
+        budget -= cost
+    return selected
+
+
+def pack_context(
+    rows: Sequence[dict[str, Any]],
+    *,
+    token_budget: int | None = None,
+    mmr_lambda: float | None = None,
+    duplicate_threshold: float | None = None,
+) -> PackedContext:
+    """Pack ``rag_service.query`` rows into a compact, token-bounded context.
+
+    Adjacent chunks of a document are merged with their overlap removed,
+    near-duplicates are dropped and the remaining passages are chosen by MMR
+    until the token budget is spent. ``tokens_saved`` compares the packed
+    output with sending the raw rows.
+    """
+
+    settings = get_settings()
+    token_budget = token_budget or settings.rag_context_token_budget
+    if mmr_lambda is None:
+        mmr_lambda = settings.rag_mmr_lambda
+    if duplicate_threshold is None:
+        duplicate_threshold = settings.rag_near_duplicate_threshold
+
+    passages = merge_adjacent(rows, settings.rag_chunk_overlap)
+    selected = select_passages(
+        passages, token_budget, mmr_lambda, duplicate_threshold
+    )
+    # Most relevant first, regardless of the order MMR picked them in.
+    selected.sort(key=lambda passage: -passage.score)
+
+    packed = PackedContext(selected, 0, 0)
+    tokens_in = estimate_tokens(_serialize(list(rows)))
+    tokens_out = estimate_tokens(_serialize(packed.as_dict()["passages"]))
+    packed.tokens = tokens_out
+    packed.tokens_saved = max(0, tokens_in - tokens_out)
+    _stats.record(tokens_in, tokens_out, len(rows), len(selected))
+    return packed
+
+
+__all__ = [
+    "PackedContext",
+    "Passage",
+    "get_packing_stats",
+    "merge_adjacent",
+    "pack_context",
+    "select_passages",
+]
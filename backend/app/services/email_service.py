@@ -1,17 +1,564 @@
-"""Send-mail mock service."""
+"""Outbound email: a durable outbox with a background SMTP dispatcher.
+
+``send`` stores the message in the ``email_outbox`` table and returns at
+once with its Message-ID; it never touches SMTP. Every send carries an
+idempotency key (explicit, or derived from the recipient and content
+within ``email_dedup_window_seconds``), so a retried tool call returns the
+original message instead of queueing a second one.
+
+One dispatcher task per process claims due messages in batches with
+``FOR UPDATE SKIP LOCKED`` and delivers them over a single SMTP connection
+that is kept open between batches (closed after ``email_smtp_idle_seconds``
+idle), under a token-bucket rate limit. Transient failures are retried
+with jittered backoff; permanent rejections fail the message. Delivery is
+at-least-once: a process that dies between the SMTP handoff and recording
+it will have the message sent again once its lease lapses.
+
+``email_mode="log"`` logs messages instead of sending them, which keeps the
+stack self-contained; ``"smtp"`` delivers to ``email_smtp_host``.
+"""
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import logging
-from typing import Any
+import smtplib
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.message import EmailMessage
+from email.utils import format_datetime, make_msgid
+from typing import Any, Sequence
+
+from sqlalchemy import text
+
+from ..config import get_settings
+from ..core.db import get_engine
+from .retry import backoff_delay
+
+
+logger = logging.getLogger(__name__)
+mock_logger = logging.getLogger("email_mock")
+
+_dispatcher: asyncio.Task[None] | None = None
+_wakeup: asyncio.Event | None = None
+
+
+# --- Metrics ---------------------------------------------------------------
+
+
+@dataclass
+class EmailStats:
+    """Outbox counters, queue depth and enqueue-to-delivery latency."""
+
+    enqueued: int = 0
+    duplicates: int = 0
+    sent: int = 0
+    retried: int = 0
+    failed: int = 0
+    batches: int = 0
+    connections_opened: int = 0
+    queue_depth: int = 0
+    oldest_queued_seconds: float = 0.0
+    _latencies: deque[float] = field(
+        default_factory=lambda: deque(maxlen=512), init=False, repr=False
+    )
+
+    def snapshot(self) -> dict[str, Any]:
+        latencies = sorted(self._latencies)
+        if latencies:
+            p50 = latencies[len(latencies) // 2]
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        else:
+            p50 = p95 = 0.0
+        return {
+            "enqueued": self.enqueued,
+            "duplicates": self.duplicates,
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "batches": self.batches,
+            "connections_opened": self.connections_opened,
+            "queue_depth": self.queue_depth,
+            "oldest_queued_seconds": round(self.oldest_queued_seconds, 1),
+            "delivery_latency_p50_ms": round(p50 * 1000, 2),
+            "delivery_latency_p95_ms": round(p95 * 1000, 2),
+        }
+
+
+_stats = EmailStats()
+
+
+def get_email_stats() -> dict[str, Any]:
+    """Return outbox counters (queue depth as of the last dispatcher poll)."""
+
+    return {"mode": get_settings().email_mode, **_stats.snapshot()}
+
+
+# --- Outbox ----------------------------------------------------------------
+
+
+def _derived_key(to: str, subject: str, body: str) -> str:
+    # Identical messages within one dedup window share a key.
+    window = max(1.0, get_settings().email_dedup_window_seconds)
+    bucket = int(time.time() // window)
+    digest = hashlib.sha256(
+        "\x00".join((to.strip().lower(), subject, body, str(bucket))).encode()
+    ).hexdigest()
+    return f"auto:{digest}"
+
+
+def _as_dict(row: Any, duplicate: bool) -> dict[str, Any]:
+    return {
+        "status": row.status,
+        "message_id": row.message_id,
+        "outbox_id": row.id,
+        "to": row.to_address,
+        "subject": row.subject,
+        "duplicate": duplicate,
+    }
+
+
+async def send(
+    to: str, subject: str, body: str, idempotency_key: str | None = None
+) -> dict[str, Any]:
+    """Queue an email for delivery and return its outbox record.
+
+    Returns ``{"status": "queued", "message_id", ...}``; a repeated send
+    with the same idempotency key returns the existing message (with its
+    current status) and ``duplicate: true``.
+    """
+
+    settings = get_settings()
+    to = to.strip()
+    if "@" not in to or any(char in to for char in "\r\n,;"):
+        raise ValueError(f"Invalid recipient address: {to!r}")
+    key = idempotency_key or _derived_key(to, subject, body)
+    domain = settings.email_from.rpartition("@")[2] or None
+
+    async with get_engine("api").begin() as conn:
+        row = (
+            await conn.execute(
+                text(
+                    """
+                    INSERT INTO email_outbox
+                        (idempotency_key, message_id, status, to_address,
+                         subject, body, attempts)
+                    VALUES (:key, :message_id, 'queued', :to, :subject, :body, 0)
+                    ON CONFLICT (idempotency_key) DO NOTHING
+                    RETURNING id, message_id, status, to_address, subject
+                    """
+                ),
+                {
+                    "key": key,
+                    "message_id": make_msgid(domain=domain),
+                    "to": to,
+                    "subject": subject,
+                    "body": body,
+                },
+            )
+        ).first()
+        duplicate = row is None
+        if duplicate:
+            row = (
+                await conn.execute(
+                    text(
+                        """
+                        SELECT id, message_id, status, to_address, subject
+                        FROM email_outbox WHERE idempotency_key = :key
+                        """
+                    ),
+                    {"key": key},
+                )
+            ).one()
+
+    if duplicate:
+        _stats.duplicates += 1
+    else:
+        _stats.enqueued += 1
+        if _wakeup is not None:
+            _wakeup.set()
+    return _as_dict(row, duplicate)
+
+
+# --- SMTP ------------------------------------------------------------------
+
+
+class _RateLimiter:
+    """Token bucket: ``rate`` messages per second, bursts of up to ``burst``."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self._rate = rate
+        self._burst = max(1, burst)
+        self._tokens = float(self._burst)
+        self._updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        if self._rate <= 0:
+            return
+        while True:
+            now = time.monotonic()
+            self._tokens = min(
+                self._burst, self._tokens + (now - self._updated) * self._rate
+            )
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+class _PermanentError(Exception):
+    """The server rejected the message; retrying will not help."""
+
+
+class _SmtpConnection:
+    """One reusable SMTP session, driven from a worker thread."""
+
+    def __init__(self) -> None:
+        self._smtp: smtplib.SMTP | None = None
+        self._last_used = 0.0
+
+    def _connect(self) -> smtplib.SMTP:
+        settings = get_settings()
+        smtp = smtplib.SMTP(
+            settings.email_smtp_host,
+            settings.email_smtp_port,
+            timeout=settings.email_smtp_timeout_seconds,
+        )
+        try:
+            smtp.ehlo()
+            if settings.email_smtp_starttls:
+                smtp.starttls()
+                smtp.ehlo()
+            if settings.email_smtp_username:
+                smtp.login(
+                    settings.email_smtp_username, settings.email_smtp_password or ""
+                )
+        except BaseException:
+            smtp.close()
+            raise
+        _stats.connections_opened += 1
+        return smtp
+
+    def _session(self) -> smtplib.SMTP:
+        if self._smtp is not None:
+            idle = time.monotonic() - self._last_used
+            if idle > get_settings().email_smtp_idle_seconds:
+                self.close()
+            elif idle > 5:
+                # The server may have dropped an idle session; check cheaply.
+                try:
+                    if self._smtp.noop()[0] != 250:
+                        self.close()
+                except smtplib.SMTPException:
+                    self.close()
+        if self._smtp is None:
+            self._smtp = self._connect()
+        return self._smtp
+
+    def send(self, message: EmailMessage) -> None:
+        for attempt in range(2):
+            smtp = self._session()
+            try:
+                refused = smtp.send_message(message)
+            except smtplib.SMTPServerDisconnected:
+                self.close()
+                if attempt:
+                    raise
+                continue
+            except smtplib.SMTPRecipientsRefused as exc:
+                codes = [code for code, _ in exc.recipients.values()]
+                if all(code >= 500 for code in codes):
+                    raise _PermanentError(str(exc.recipients)) from exc
+                raise
+            except smtplib.SMTPResponseException as exc:
+                if exc.smtp_code >= 500:
+                    raise _PermanentError(
+                        f"{exc.smtp_code} {exc.smtp_error!r}"
+                    ) from exc
+                raise
+            finally:
+                self._last_used = time.monotonic()
+            if refused:
+                raise _PermanentError(str(refused))
+            return
+
+    def close_if_idle(self) -> None:
+        if (
+            self._smtp is not None
+            and time.monotonic() - self._last_used
+            > get_settings().email_smtp_idle_seconds
+        ):
+            self.close()
+
+    def close(self) -> None:
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                self._smtp.close()
+            self._smtp = None
+
+
+def _build_message(row: Any) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = get_settings().email_from
+    message["To"] = row.to_address
+    message["Subject"] = row.subject
+    message["Message-ID"] = row.message_id
+    message["Date"] = format_datetime(row.created_at)
+    message.set_content(row.body)
+    return message
+
+
+# --- Dispatcher ------------------------------------------------------------
+
+
+async def _claim_batch() -> Sequence[Any]:
+    """Lease up to ``email_batch_size`` due messages, oldest first."""
+
+    settings = get_settings()
+    async with get_engine("api").begin() as conn:
+        result = await conn.execute(
+            text(
+                """
+                UPDATE email_outbox
+                SET status = 'sending',
+                    attempts = attempts + 1,
+                    lease_expires_at = now()
+                        + make_interval(secs => CAST(:lease AS float8))
+                WHERE id IN (
+                    SELECT id FROM email_outbox
+                    WHERE (status = 'queued' AND next_attempt_at <= now())
+                       OR (status = 'sending' AND lease_expires_at < now())
+                    ORDER BY id
+                    LIMIT :batch
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, message_id, to_address, subject, body, attempts,
+                          created_at
+                """
+            ),
+            {
+                "lease": settings.email_lease_seconds,
+                "batch": settings.email_batch_size,
+            },
+        )
+        return sorted(result.all(), key=lambda row: row.id)
+
+
+async def _refresh_queue_depth() -> None:
+    async with get_engine("api").connect() as conn:
+        row = (
+            await conn.execute(
+                text(
+                    """
+                    SELECT count(*) AS depth,
+                           extract(epoch FROM now() - min(created_at)) AS oldest
+                    FROM email_outbox
+                    WHERE status IN ('queued', 'sending')
+                    """
+                )
+            )
+        ).one()
+    _stats.queue_depth = row.depth
+    _stats.oldest_queued_seconds = float(row.oldest or 0.0)
+
+
+async def _mark_sent(message_id: int, created_at: datetime) -> None:
+    async with get_engine("api").begin() as conn:
+        await conn.execute(
+            text(
+                """
+                UPDATE email_outbox
+                SET status = 'sent', sent_at = now(), lease_expires_at = NULL,
+                    last_error = NULL
+                WHERE id = :id
+                """
+            ),
+            {"id": message_id},
+        )
+    _stats.sent += 1
+    _stats._latencies.append(
+        (datetime.now(timezone.utc) - created_at).total_seconds()
+    )
+
+
+async def _mark_failed(
+    message_id: int, attempts: int, error: str, *, retry: bool
+) -> None:
+    settings = get_settings()
+    retry = retry and attempts < settings.email_max_attempts
+    delay = backoff_delay(
+        attempts - 1, settings.email_retry_base_delay, settings.email_retry_max_delay
+    )
+    async with get_engine("api").begin() as conn:
+        await conn.execute(
+            text(
+                """
+                UPDATE email_outbox
+                SET status = :status, last_error = :error, lease_expires_at = NULL,
+                    next_attempt_at = now()
+                        + make_interval(secs => CAST(:delay AS float8))
+                WHERE id = :id
+                """
+            ),
+            {
+                "id": message_id,
+                "status": "queued" if retry else "failed",
+                "error": error[:2000],
+                "delay": delay,
+            },
+        )
+    if retry:
+        _stats.retried += 1
+    else:
+        _stats.failed += 1
+        logger.error("Giving up on email %s: %s", message_id, error)
+
+
+async def _release(rows: Sequence[Any]) -> None:
+    """Hand claimed but unattempted messages back without using an attempt."""
+
+    if not rows:
+        return
+    async with get_engine("api").begin() as conn:
+        await conn.execute(
+            text(
+                """
+                UPDATE email_outbox
+                SET status = 'queued', attempts = attempts - 1,
+                    lease_expires_at = NULL
+                WHERE id = ANY(:ids)
+                """
+            ),
+            {"ids": [row.id for row in rows]},
+        )
+
+
+async def _attempt(row: Any, connection: _SmtpConnection, mode: str) -> bool:
+    """Send one claimed message and record the outcome.
+
+    Returns False when the server looks unreachable and the rest of the batch
+    should go back to the queue.
+    """
+
+    try:
+        if mode == "smtp":
+            await asyncio.to_thread(connection.send, _build_message(row))
+        else:
+            mock_logger.info(
+                "SEND-MAIL MOCK: %s",
+                {"to": row.to_address, "subject": row.subject, "body": row.body},
+            )
+    except _PermanentError as exc:
+        await _mark_failed(row.id, row.attempts, str(exc), retry=False)
+    except (smtplib.SMTPException, OSError) as exc:
+        error = str(exc) or type(exc).__name__
+        await _mark_failed(row.id, row.attempts, error, retry=True)
+        await asyncio.to_thread(connection.close)
+        return False
+    else:
+        await _mark_sent(row.id, row.created_at)
+    return True
+
+
+async def _settle(attempt: asyncio.Future[bool] | None, rest: Sequence[Any]) -> None:
+    """Let an in-flight attempt record its outcome, then requeue ``rest``."""
+
+    if attempt is not None:
+        try:
+            await attempt
+        except Exception:
+            logger.exception("Email delivery failed while shutting down")
+    await _release(rest)
+
+
+async def _deliver(
+    rows: Sequence[Any], connection: _SmtpConnection, limiter: _RateLimiter
+) -> None:
+    mode = get_settings().email_mode
+    for index, row in enumerate(rows):
+        attempt: asyncio.Future[bool] | None = None
+        try:
+            await limiter.acquire()
+            attempt = asyncio.ensure_future(_attempt(row, connection, mode))
+            keep_going = await asyncio.shield(attempt)
+        except asyncio.CancelledError:
+            # Shutting down. The worker thread may already be handing the
+            # message to the server, so the attempt is finished and recorded
+            # rather than requeued (and sent twice); only the messages after
+            # it go straight back.
+            rest = rows[index:] if attempt is None else rows[index + 1 :]
+            await asyncio.shield(_settle(attempt, rest))
+            raise
+        if not keep_going:
+            # The server is likely unreachable; the rest of the batch goes
+            # back to the queue rather than failing one message after another.
+            await _release(rows[index + 1 :])
+            return
+
+
+async def _dispatcher_loop() -> None:
+    settings = get_settings()
+    connection = _SmtpConnection()
+    limiter = _RateLimiter(settings.email_rate_per_second, settings.email_rate_burst)
+    try:
+        while True:
+            try:
+                rows = await _claim_batch()
+                await _refresh_queue_depth()
+            except Exception:
+                logger.exception("Email dispatcher failed to claim messages")
+                rows = []
+
+            if rows:
+                _stats.batches += 1
+                try:
+                    await _deliver(rows, connection, limiter)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    # Leases lapse and the messages are retried.
+                    logger.exception("Email dispatcher failed to deliver a batch")
+                continue
+
+            await asyncio.to_thread(connection.close_if_idle)
+            assert _wakeup is not None
+            try:
+                await asyncio.wait_for(
+                    _wakeup.wait(), timeout=settings.email_poll_seconds
+                )
+            except asyncio.TimeoutError:
+                pass
+            _wakeup.clear()
+    finally:
+        await asyncio.shield(asyncio.to_thread(connection.close))
+
+
+def start_dispatcher() -> None:
+    """Start this process's outbox dispatcher (no-op if already running)."""
 
+    global _dispatcher, _wakeup
+    if _dispatcher is None:
+        _wakeup = asyncio.Event()
+        _dispatcher = asyncio.create_task(_dispatcher_loop(), name="email-dispatcher")
 
-logger = logging.getLogger("email_mock")
 
+async def stop_dispatcher() -> None:
+    global _dispatcher
+    if _dispatcher is not None:
+        _dispatcher.cancel()
+        await asyncio.gather(_dispatcher, return_exceptions=True)
+        _dispatcher = None
 
-async def send(to: str, subject: str, body: str) -> dict[str, Any]:
-    """Send an email to the specified recipient and return a confirmation payload."""
 
-    payload = {"to": to, "subject": subject, "body": body}
-    logger.info("SEND-MAIL MOCK: %s", payload)
-    return {"status": "sent", **payload}
+__all__ = [
+    "get_email_stats",
+    "send",
+    "start_dispatcher",
+    "stop_dispatcher",
+]
@@ -1,32 +1,414 @@
-"""Embedding helper using remote OpenAI embeddings."""
+"""Embedding providers with pluggable backends (OpenAI, local, hashing)."""
 
 from __future__ import annotations
 
 import asyncio
+import hashlib
+import math
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from functools import lru_cache
-from typing import Sequence
+from typing import Any, Sequence
 
-from langchain_openai import OpenAIEmbeddings
+from ..config import Settings, get_settings
+from .retry import backoff_delay
 
-from ..config import get_settings
 
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for budgeting."""
+
+    return len(text) // 4 + 1
+
+
+@dataclass
+class EmbeddingStats:
+    """Rolling latency and throughput counters for one embedding lane."""
+
+    batches: int = 0
+    texts: int = 0
+    estimated_tokens: int = 0
+    retries: int = 0
+    failures: int = 0
+    busy_seconds: float = 0.0
+    _latencies: deque[float] = field(
+        default_factory=lambda: deque(maxlen=512), init=False, repr=False
+    )
+
+    def record_batch(self, latency: float, texts: int, tokens: int) -> None:
+        self.batches += 1
+        self.texts += texts
+        self.estimated_tokens += tokens
+        self.busy_seconds += latency
+        self._latencies.append(latency)
+
+    def snapshot(self) -> dict[str, Any]:
+        latencies = sorted(self._latencies)
+        if latencies:
+            p50 = latencies[len(latencies) // 2]
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        else:
+            p50 = p95 = 0.0
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "estimated_tokens": self.estimated_tokens,
+            "retries": self.retries,
+            "failures": self.failures,
+            "batch_latency_p50_ms": round(p50 * 1000, 2),
+            "batch_latency_p95_ms": round(p95 * 1000, 2),
+            "texts_per_second": (
+                round(self.texts / self.busy_seconds, 2) if self.busy_seconds else 0.0
+            ),
+        }
+
+
+_stats: dict[str, EmbeddingStats] = {
+    "bulk": EmbeddingStats(),
+    "query": EmbeddingStats(),
+}
+
+
+def get_embedding_stats() -> dict[str, dict[str, Any]]:
+    """Return per-lane embedding statistics."""
+
+    return {lane: stats.snapshot() for lane, stats in _stats.items()}
+
+
+class EmbeddingBackend(ABC):
+    """A model that turns batches of text into fixed-size vectors.
+
+    ``lane`` is either ``"bulk"`` or ``"query"``; backends use it to keep
+    query-time embeddings off the resources used by ingestion.
+    """
+
+    name: str
+    model_name: str
+    dimension: int
+
+    @classmethod
+    def default_dimension(cls, settings: Settings) -> int | None:
+        """Return the vector dimension without loading the model, if known."""
+
+        return None
+
+    @abstractmethod
+    async def embed_batch(self, texts: list[str], lane: str) -> list[list[float]]:
+        """Embed one batch of texts."""
+
+    def is_retryable(self, exc: BaseException) -> bool:
+        """Return True if a failed batch should be retried."""
+
+        return False
 
-class EmbeddingProvider:
-    """Thin wrapper around an OpenAI embedding model."""
 
-    def __init__(self, model_name: str, api_key: str | None) -> None:
-        if not api_key:
+_OPENAI_DIMENSIONS: dict[str, int] = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    """Remote OpenAI embeddings via the native async client."""
+
+    name = "openai"
+
+    def __init__(self, settings: Settings) -> None:
+        if not settings.openai_api_key:
             raise RuntimeError("Missing OpenAI API key for embeddings")
-        self._embedder = OpenAIEmbeddings(model=model_name, api_key=api_key)
+        from langchain_openai import OpenAIEmbeddings
+
+        self.model_name = settings.embedding_model_name
+        self.dimension = self.default_dimension(settings) or 1536
+        native = _OPENAI_DIMENSIONS.get(self.model_name)
+        kwargs: dict[str, Any] = {
+            "model": self.model_name,
+            "api_key": settings.openai_api_key,
+            # Retries are handled by the provider so they can be observed
+            # and jittered.
+            "max_retries": 0,
+        }
+        if native is not None and native != self.dimension:
+            # text-embedding-3-* support shortened (Matryoshka) outputs.
+            kwargs["dimensions"] = self.dimension
+
+        self._clients = {
+            "bulk": OpenAIEmbeddings(
+                chunk_size=settings.embedding_batch_max_items, **kwargs
+            ),
+            "query": OpenAIEmbeddings(**kwargs),
+        }
+
+    @classmethod
+    def default_dimension(cls, settings: Settings) -> int | None:
+        return settings.embedding_dimension or _OPENAI_DIMENSIONS.get(
+            settings.embedding_model_name, 1536
+        )
+
+    async def embed_batch(self, texts: list[str], lane: str) -> list[list[float]]:
+        return await self._clients[lane].aembed_documents(texts)
+
+    def is_retryable(self, exc: BaseException) -> bool:
+        import openai
+
+        status_code = getattr(exc, "status_code", None)
+        if isinstance(status_code, int):
+            return status_code == 429 or status_code >= 500
+        return isinstance(exc, openai.APIConnectionError)
+
+
+class LocalEmbeddingBackend(EmbeddingBackend):
+    """CPU sentence-transformers model loaded from a local path.
+
+    ``embedding_local_runtime`` selects the sentence-transformers runtime
+    (``"torch"`` or ``"onnx"``). Inference runs on dedicated threads, one per
+    lane, so it neither blocks the event loop nor lets ingestion starve
+    queries.
+    """
+
+    name = "local"
+
+    def __init__(self, settings: Settings) -> None:
+        if not settings.embedding_local_model_path:
+            raise RuntimeError("Missing embedding_local_model_path for local embeddings")
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as exc:  # pragma: no cover - optional dependency
+            raise RuntimeError(
+                "The local embedding backend requires the sentence-transformers package"
+            ) from exc
+
+        self.model_name = settings.embedding_local_model_path
+        self._model = SentenceTransformer(
+            settings.embedding_local_model_path,
+            device=settings.embedding_local_device,
+            backend=settings.embedding_local_runtime,
+            truncate_dim=settings.embedding_dimension,
+        )
+        self.dimension = int(self._model.get_sentence_embedding_dimension())
+        self._executors = {
+            lane: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"embed-{lane}")
+            for lane in ("bulk", "query")
+        }
+
+    @classmethod
+    def default_dimension(cls, settings: Settings) -> int | None:
+        return settings.embedding_dimension
+
+    async def embed_batch(self, texts: list[str], lane: str) -> list[list[float]]:
+        loop = asyncio.get_running_loop()
+        vectors = await loop.run_in_executor(
+            self._executors[lane],
+            lambda: self._model.encode(texts, normalize_embeddings=True),
+        )
+        return vectors.tolist()
+
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """Deterministic feature-hashing embedder for tests and offline use.
+
+    Words and word bigrams are hashed into signed buckets and the result is
+    L2-normalized. No model or network access is needed.
+    """
+
+    name = "hashing"
+    model_name = "feature-hashing"
+
+    def __init__(self, settings: Settings) -> None:
+        self.dimension = self.default_dimension(settings) or 384
+
+    @classmethod
+    def default_dimension(cls, settings: Settings) -> int | None:
+        return settings.embedding_dimension or 384
+
+    async def embed_batch(self, texts: list[str], lane: str) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+    def _embed(self, text: str) -> list[float]:
+        vector = [0.0] * self.dimension
+        tokens = _TOKEN_PATTERN.findall(text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            sign = 1.0 if value & 1 else -1.0
+            vector[(value >> 1) % self.dimension] += sign
+        norm = math.sqrt(sum(component * component for component in vector))
+        if norm == 0.0:
+            return vector
+        return [component / norm for component in vector]
+
+
+_BACKENDS: dict[str, type[EmbeddingBackend]] = {
+    "openai": OpenAIEmbeddingBackend,
+    "local": LocalEmbeddingBackend,
+    "hashing": HashingEmbeddingBackend,
+}
+
+
+def register_embedding_backend(name: str, backend: type[EmbeddingBackend]) -> None:
+    """Register an additional embedding backend under ``name``."""
+
+    _BACKENDS[name] = backend
+
+
+def _backend_class(settings: Settings) -> type[EmbeddingBackend]:
+    try:
+        return _BACKENDS[settings.embedding_backend]
+    except KeyError as exc:
+        raise RuntimeError(
+            f"Unknown embedding backend: {settings.embedding_backend}"
+        ) from exc
+
+
+def _make_batches(
+    texts: Sequence[str], max_tokens: int, max_items: int
+) -> list[list[str]]:
+    """Group texts into contiguous batches bounded by token and item counts."""
+
+    batches: list[list[str]] = []
+    current: list[str] = []
+    current_tokens = 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if current and (
+            current_tokens + tokens > max_tokens or len(current) >= max_items
+        ):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+class EmbeddingProvider:
+    """Batching, retrying front-end over an embedding backend.
+
+    Bulk (ingestion) and query embeddings use separate lanes and concurrency
+    limits, so a single query never queues behind a large upload.
+    """
+
+    def __init__(self, backend: EmbeddingBackend) -> None:
+        settings = get_settings()
+        self.backend = backend
+        self._batch_max_tokens = settings.embedding_batch_max_tokens
+        self._batch_max_items = settings.embedding_batch_max_items
+        self._max_retries = settings.embedding_max_retries
+        self._retry_base_delay = settings.embedding_retry_base_delay
+        self._retry_max_delay = settings.embedding_retry_max_delay
+        self._semaphores = {
+            "bulk": asyncio.Semaphore(settings.embedding_max_concurrency),
+            "query": asyncio.Semaphore(settings.embedding_query_concurrency),
+        }
+
+    @property
+    def dimension(self) -> int:
+        return self.backend.dimension
 
     async def embed_texts(self, texts: Sequence[str]) -> list[list[float]]:
-        """Embed a batch of texts async-friendly using OpenAI embeddings."""
+        """Embed texts in concurrent, token-bounded batches, preserving order."""
+
+        batches = _make_batches(texts, self._batch_max_tokens, self._batch_max_items)
+        results = await asyncio.gather(
+            *(self._embed_with_retry(batch, "bulk") for batch in batches)
+        )
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+    async def embed_query(self, text: str) -> list[float]:
+        """Embed a single query on the low-latency lane."""
+
+        [vector] = await self._embed_with_retry([text], "query")
+        return vector
+
+    async def embed_queries(self, texts: Sequence[str]) -> list[list[float]]:
+        """Embed several queries on the query lane, in as few calls as possible."""
+
+        batches = _make_batches(texts, self._batch_max_tokens, self._batch_max_items)
+        results = await asyncio.gather(
+            *(self._embed_with_retry(batch, "query") for batch in batches)
+        )
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+    async def _embed_with_retry(self, batch: list[str], lane: str) -> list[list[float]]:
+        stats = _stats[lane]
+        attempt = 0
+        async with self._semaphores[lane]:
+            while True:
+                started = time.perf_counter()
+                try:
+                    vectors = await self.backend.embed_batch(batch, lane)
+                except Exception as exc:
+                    if attempt >= self._max_retries or not self.backend.is_retryable(
+                        exc
+                    ):
+                        stats.failures += 1
+                        raise
+                    stats.retries += 1
+                    await asyncio.sleep(
+                        backoff_delay(
+                            attempt, self._retry_base_delay, self._retry_max_delay
+                        )
+                    )
+                    attempt += 1
+                    continue
 
-        texts_list = list(texts)
-        return await asyncio.to_thread(self._embedder.embed_documents, texts_list)
+                stats.record_batch(
+                    time.perf_counter() - started,
+                    len(batch),
+                    sum(estimate_tokens(text) for text in batch),
+                )
+                return vectors
 
 
 @lru_cache(maxsize=1)
 def get_embedding_provider() -> EmbeddingProvider:
     settings = get_settings()
-    return EmbeddingProvider(settings.embedding_model_name, settings.openai_api_key)
+    backend_class = _backend_class(settings)
+    backend = backend_class(settings)
+    expected = backend_class.default_dimension(settings)
+    if expected is not None and backend.dimension != expected:
+        raise RuntimeError(
+            f"Embedding backend {backend.name!r} produces {backend.dimension}-dim "
+            f"vectors but the store is configured for {expected}"
+        )
+    return EmbeddingProvider(backend)
+
+
+@lru_cache(maxsize=1)
+def get_embedding_dimension() -> int:
+    """Return the vector dimension used by the store and the active backend.
+
+    Always resolved from settings: the models module sizes the vector column
+    from it at import time, which must not load an embedding model. The
+    provider checks the model's actual output against it when it loads.
+    """
+
+    settings = get_settings()
+    dimension = _backend_class(settings).default_dimension(settings)
+    if dimension is None:
+        raise RuntimeError(
+            f"embedding_dimension must be set for the {settings.embedding_backend!r} "
+            "embedding backend (the model's output dimension)"
+        )
+    return dimension
+
+
+def get_embedding_model_id() -> str:
+    """Return an identifier for the active backend, model and dimension."""
+
+    settings = get_settings()
+    model = (
+        settings.embedding_local_model_path
+        if settings.embedding_backend == "local"
+        else settings.embedding_model_name
+    )
+    return f"{settings.embedding_backend}:{model}:{get_embedding_dimension()}"
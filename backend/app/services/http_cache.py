@@ -0,0 +1,412 @@
+"""HTTP response cache for the http_request tool.
+
+Implements the parts of HTTP caching (RFC 9111) a private client cache
+needs: freshness from ``Cache-Control: max-age`` or ``Expires``,
+revalidation with ``ETag``/``Last-Modified`` (``If-None-Match`` /
+``If-Modified-Since``), ``stale-while-revalidate``, and ``no-store`` /
+``no-cache`` / ``must-revalidate``. Concurrent identical requests share one
+upstream call. Entries live in a byte-bounded in-memory LRU with an
+optional on-disk tier.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, field, replace
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Mapping
+
+from ..config import get_settings
+from .cache import ByteLRUCache
+
+
+logger = logging.getLogger(__name__)
+
+# Statuses cacheable by default (RFC 9110, section 15.1).
+_CACHEABLE_STATUSES = {200, 203, 204, 300, 301, 308, 404, 405, 410, 414, 501}
+# Response headers kept with an entry (and all that caching looks at).
+STORED_HEADERS = (
+    "age",
+    "cache-control",
+    "content-type",
+    "date",
+    "etag",
+    "expires",
+    "last-modified",
+    "vary",
+)
+
+
+@dataclass
+class HttpResponseData:
+    """A fully read (possibly truncated) upstream response."""
+
+    status_code: int
+    headers: dict[str, str]
+    body: bytes
+    truncated: bool = False
+
+
+@dataclass
+class CacheEntry:
+    response: HttpResponseData
+    # Wall-clock times, so entries stay meaningful in the disk tier.
+    fresh_until: float
+    stale_until: float
+    stored_at: float = field(default_factory=time.time)
+
+    @property
+    def validators(self) -> dict[str, str]:
+        headers = {}
+        if "etag" in self.response.headers:
+            headers["If-None-Match"] = self.response.headers["etag"]
+        if "last-modified" in self.response.headers:
+            headers["If-Modified-Since"] = self.response.headers["last-modified"]
+        return headers
+
+
+Fetch = Callable[[dict[str, str]], Awaitable["HttpResponseData | dict[str, Any]"]]
+
+
+def _parse_cache_control(value: str) -> dict[str, str | None]:
+    directives: dict[str, str | None] = {}
+    for part in value.split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip().strip('"') or None
+    return directives
+
+
+def _seconds(value: str | None) -> int | None:
+    try:
+        return max(0, int(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _http_date(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def make_entry(
+    response: HttpResponseData, now: float | None = None
+) -> CacheEntry | None:
+    """Return a cache entry for ``response``, or None if it is not storable."""
+
+    now = time.time() if now is None else now
+    headers = response.headers
+    directives = _parse_cache_control(headers.get("cache-control", ""))
+    if (
+        response.truncated
+        or response.status_code not in _CACHEABLE_STATUSES
+        or "no-store" in directives
+        or headers.get("vary", "").strip() == "*"
+    ):
+        return None
+
+    lifetime: float | None
+    if "no-cache" in directives:
+        lifetime = 0.0
+    elif (max_age := _seconds(directives.get("max-age"))) is not None:
+        lifetime = float(max_age)
+    elif (expires := _http_date(headers.get("expires"))) is not None:
+        date = _http_date(headers.get("date")) or now
+        lifetime = max(0.0, expires - date)
+    else:
+        lifetime = None
+
+    has_validator = "etag" in headers or "last-modified" in headers
+    if lifetime is None:
+        if not has_validator:
+            return None
+        # No explicit freshness: keep it, but revalidate on every use.
+        lifetime = 0.0
+    lifetime = max(0.0, lifetime - (_seconds(headers.get("age")) or 0))
+
+    stale = _seconds(directives.get("stale-while-revalidate")) or 0
+    if "must-revalidate" in directives or "no-cache" in directives:
+        stale = 0
+    if lifetime + stale <= 0 and not has_validator:
+        return None
+
+    return CacheEntry(
+        response=response,
+        fresh_until=now + lifetime,
+        stale_until=now + lifetime + stale,
+        stored_at=now,
+    )
+
+
+def _sizeof(entry: CacheEntry) -> int:
+    headers = sum(len(k) + len(v) for k, v in entry.response.headers.items())
+    return len(entry.response.body) + headers + 160
+
+
+class DiskTier:
+    """Byte-bounded on-disk store, evicting least-recently-used files.
+
+    Each entry is one file named by the key hash: a JSON header line
+    followed by the raw body. Reads touch the file's mtime, which drives
+    eviction order.
+    """
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._bytes = sum(size for _, size, _ in self._files())
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self._directory, f"{digest}.entry")
+
+    def _files(self) -> list[tuple[str, int, float]]:
+        files = []
+        for entry in os.scandir(self._directory):
+            if entry.name.endswith(".entry"):
+                stat = entry.stat()
+                files.append((entry.path, stat.st_size, stat.st_mtime))
+        return files
+
+    def get(self, key: str) -> CacheEntry | None:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as handle:
+                header, _, body = handle.read().partition(b"\n")
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        meta = json.loads(header)
+        if meta.pop("key") != key:
+            return None
+        response = HttpResponseData(body=body, **meta.pop("response"))
+        return CacheEntry(response=response, **meta)
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        meta = asdict(entry)
+        meta["response"].pop("body")
+        meta["key"] = key
+        data = json.dumps(meta).encode() + b"\n" + entry.response.body
+        if len(data) > self._max_bytes:
+            return
+        path = self._path(key)
+        with self._lock:
+            try:
+                self._bytes -= os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+            fd, tmp_path = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+            os.replace(tmp_path, path)
+            self._bytes += len(data)
+            if self._bytes > self._max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        files = sorted(self._files(), key=lambda item: item[2])
+        self._bytes = sum(size for _, size, _ in files)
+        for path, size, _ in files:
+            if self._bytes <= self._max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self._bytes -= size
+
+
+@dataclass
+class HttpCacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    stale_served: int = 0
+    revalidated: int = 0
+    coalesced: int = 0
+    stored: int = 0
+    uncacheable: int = 0
+    refresh_errors: int = 0
+
+    def snapshot(self) -> dict[str, Any]:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            **asdict(self),
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_settings = get_settings()
+_memory: ByteLRUCache[str, CacheEntry] = ByteLRUCache(
+    max_bytes=_settings.http_cache_bytes, sizeof=_sizeof
+)
+_disk = (
+    DiskTier(_settings.http_cache_dir, _settings.http_cache_disk_bytes)
+    if _settings.http_cache_dir
+    else None
+)
+_inflight: dict[str, asyncio.Task[Any]] = {}
+_stats = HttpCacheStats()
+
+
+def get_cache_stats() -> dict[str, Any]:
+    return {
+        "memory": _memory.stats(),
+        "disk_enabled": _disk is not None,
+        **_stats.snapshot(),
+    }
+
+
+def is_cacheable_request(method: str, url: str) -> bool:
+    """GETs are cached; POSTs only to explicitly whitelisted URL prefixes."""
+
+    if not _memory.enabled and _disk is None:
+        return False
+    if method == "GET":
+        return True
+    return method == "POST" and url.startswith(
+        tuple(get_settings().http_cache_post_prefixes)
+    )
+
+
+def cache_key(method: str, url: str, body: Mapping[str, Any] | None) -> str:
+    key = f"{method} {url}"
+    if body is not None:
+        canonical = json.dumps(body, sort_keys=True, separators=(",", ":"))
+        key += " " + hashlib.sha256(canonical.encode()).hexdigest()
+    return key
+
+
+async def _lookup(key: str) -> tuple[CacheEntry | None, str | None]:
+    """Return the entry for ``key`` and the tier it came from."""
+
+    entry = _memory.get(key)
+    if entry is not None:
+        return entry, "memory"
+    if _disk is None:
+        return None, None
+    try:
+        entry = await asyncio.to_thread(_disk.get, key)
+    except (OSError, ValueError, TypeError):
+        logger.warning("Unreadable HTTP cache entry for %s", key, exc_info=True)
+        return None, None
+    if entry is None:
+        return None, None
+    _memory.set(key, entry)
+    return entry, "disk"
+
+
+async def _store(key: str, entry: CacheEntry) -> None:
+    _stats.stored += 1
+    _memory.set(key, entry)
+    if _disk is not None:
+        try:
+            await asyncio.to_thread(_disk.set, key, entry)
+        except OSError:
+            logger.warning("Could not write HTTP cache entry", exc_info=True)
+
+
+async def _refresh(
+    key: str, entry: CacheEntry | None, fetch: Fetch
+) -> HttpResponseData | dict[str, Any]:
+    """Fetch (conditionally, if ``entry`` has validators) and store."""
+
+    result = await fetch(entry.validators if entry is not None else {})
+    if isinstance(result, dict):
+        return result
+
+    if result.status_code == 304 and entry is not None:
+        _stats.revalidated += 1
+        # The 304's headers update the stored ones (RFC 9111, 4.3.4).
+        headers = {**entry.response.headers, **result.headers}
+        refreshed = make_entry(replace(entry.response, headers=headers))
+        if refreshed is not None:
+            await _store(key, refreshed)
+        return refreshed.response if refreshed is not None else entry.response
+
+    new_entry = make_entry(result)
+    if new_entry is None:
+        _stats.uncacheable += 1
+    else:
+        await _store(key, new_entry)
+    return result
+
+
+def _coalesced(key: str, factory: Callable[[], Awaitable[Any]]) -> asyncio.Task[Any]:
+    """Return the in-flight task for ``key``, starting one if needed."""
+
+    task = _inflight.get(key)
+    if task is not None:
+        _stats.coalesced += 1
+        return task
+    task = asyncio.ensure_future(factory())
+    _inflight[key] = task
+    task.add_done_callback(lambda _: _inflight.pop(key, None))
+    return task
+
+
+def _background_refresh_done(task: asyncio.Task[Any]) -> None:
+    # Nobody awaits a stale-while-revalidate refresh, so its failures are
+    # retrieved and counted here; the stale entry stays until it expires.
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if exc is not None:
+        _stats.refresh_errors += 1
+        logger.warning("Background HTTP cache refresh failed", exc_info=exc)
+    elif isinstance(task.result(), dict):
+        _stats.refresh_errors += 1
+
+
+async def fetch_cached(key: str, fetch: Fetch) -> HttpResponseData | dict[str, Any]:
+    """Serve ``key`` from the cache, revalidating or fetching as needed.
+
+    ``fetch(extra_headers)`` performs the upstream request and returns the
+    response, or an error payload which is passed through uncached.
+    """
+
+    entry, tier = await _lookup(key)
+    now = time.time()
+    if entry is not None and now < entry.fresh_until:
+        if tier == "memory":
+            _stats.memory_hits += 1
+        else:
+            _stats.disk_hits += 1
+        return entry.response
+    if entry is not None and now < entry.stale_until:
+        # Serve stale now; one background request refreshes the entry.
+        _stats.stale_served += 1
+        task = _coalesced(key, lambda: _refresh(key, entry, fetch))
+        task.add_done_callback(_background_refresh_done)
+        return entry.response
+
+    _stats.misses += 1
+    # Shielded so a cancelled caller does not cancel the shared request.
+    return await asyncio.shield(_coalesced(key, lambda: _refresh(key, entry, fetch)))
+
+
+__all__ = [
+    "CacheEntry",
+    "DiskTier",
+    "HttpResponseData",
+    "STORED_HEADERS",
+    "cache_key",
+    "fetch_cached",
+    "get_cache_stats",
+    "is_cacheable_request",
+    "make_entry",
+]
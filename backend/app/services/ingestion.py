@@ -0,0 +1,169 @@
+"""CPU-bound ingestion helpers executed off the event loop in a process pool."""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, TypeVar
+
+from ..config import get_settings
+
+
+T = TypeVar("T")
+
+
+class IngestionTimeoutError(TimeoutError):
+    """Raised when a CPU-bound ingestion job exceeds its configured timeout."""
+
+
+# --- Worker-side functions -------------------------------------------------
+#
+# These run inside pool processes, so they must stay top-level (picklable)
+# and import their heavy dependencies lazily.
+
+
+def pdf_page_count(raw_bytes: bytes) -> int:
+    """Return the number of pages in a PDF."""
+
+    import fitz  # PyMuPDF
+
+    doc = fitz.open(stream=raw_bytes, filetype="pdf")
+    try:
+        return doc.page_count
+    finally:
+        doc.close()
+
+
+def extract_pdf_pages(raw_bytes: bytes, start: int, stop: int) -> str:
+    """Extract concatenated text from pages ``[start, stop)`` of a PDF."""
+
+    import fitz  # PyMuPDF
+
+    doc = fitz.open(stream=raw_bytes, filetype="pdf")
+    try:
+        parts: list[str] = []
+        for page_number in range(start, stop):
+            parts.append(doc.load_page(page_number).get_text("text"))
+        return "\n".join(parts)
+    finally:
+        doc.close()
+
+
+def split_text(text_content: str, chunk_size: int, chunk_overlap: int) -> list[str]:
+    """Split text into overlapping chunks for embedding."""
+
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+    )
+    return splitter.split_text(text_content)
+
+
+# --- Event-loop side -------------------------------------------------------
+
+
+@lru_cache(maxsize=1)
+def get_process_pool() -> ProcessPoolExecutor | None:
+    """Return the shared ingestion process pool, or None when disabled."""
+
+    settings = get_settings()
+    if settings.ingest_process_pool_size <= 0:
+        return None
+
+    # "spawn" avoids forking a process that owns a running event loop and
+    # open database connections.
+    return ProcessPoolExecutor(
+        max_workers=settings.ingest_process_pool_size,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+def shutdown_process_pool() -> None:
+    """Shut down the ingestion process pool if it was started."""
+
+    if get_process_pool.cache_info().currsize == 0:
+        return
+    pool = get_process_pool()
+    get_process_pool.cache_clear()
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_cpu_bound(func: Callable[..., T], *args: Any) -> T:
+    """Run ``func(*args)`` in the process pool with the configured timeout.
+
+    Falls back to a worker thread when the pool is disabled so the event loop
+    is never blocked either way.
+    """
+
+    settings = get_settings()
+    pool = get_process_pool()
+    if pool is None:
+        future: asyncio.Future[T] = asyncio.ensure_future(
+            asyncio.to_thread(func, *args)
+        )
+    else:
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(pool, func, *args)
+
+    try:
+        return await asyncio.wait_for(
+            future, timeout=settings.ingest_job_timeout_seconds
+        )
+    except asyncio.TimeoutError as exc:
+        raise IngestionTimeoutError(
+            f"{func.__name__} exceeded {settings.ingest_job_timeout_seconds}s"
+        ) from exc
+    except BrokenProcessPool:
+        # A worker died (e.g. a malformed PDF crashed the parser); replace the
+        # pool so subsequent uploads are not affected.
+        shutdown_process_pool()
+        raise
+
+
+async def extract_pdf_text(
+    raw_bytes: bytes,
+    on_pages: Callable[[int, int], Awaitable[None]] | None = None,
+) -> str:
+    """Extract text from a PDF, fanning page ranges out across the pool.
+
+    ``on_pages(done, total)`` is awaited whenever a page range completes.
+    """
+
+    settings = get_settings()
+    page_count = await run_cpu_bound(pdf_page_count, raw_bytes)
+    step = max(1, settings.ingest_pdf_pages_per_job)
+    done = 0
+
+    async def extract_range(start: int) -> str:
+        nonlocal done
+        stop = min(start + step, page_count)
+        text_content = await run_cpu_bound(extract_pdf_pages, raw_bytes, start, stop)
+        done += stop - start
+        if on_pages is not None:
+            await on_pages(done, page_count)
+        return text_content
+
+    if on_pages is not None:
+        await on_pages(0, page_count)
+    parts = await asyncio.gather(
+        *(extract_range(start) for start in range(0, page_count, step))
+    )
+    return "\n".join(parts)
+
+
+async def split_into_chunks(text_content: str) -> list[str]:
+    """Split text into chunks using the configured RAG chunking parameters."""
+
+    settings = get_settings()
+    return await run_cpu_bound(
+        split_text,
+        text_content,
+        settings.rag_chunk_size,
+        settings.rag_chunk_overlap,
+    )
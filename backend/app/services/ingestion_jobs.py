@@ -0,0 +1,631 @@
+"""Persistent background ingestion jobs for document and archive uploads.
+
+Uploads are stored in the ``ingestion_jobs`` table and processed by a small
+pool of asyncio workers per API process. Workers claim jobs with
+``FOR UPDATE SKIP LOCKED`` and hold a lease that a heartbeat renews while the
+job runs, so jobs survive restarts and several processes can share the queue.
+Every write is conditional on the worker still holding the lease; a worker
+that lost it (e.g. after stalling past the lease) stops without touching the
+job again.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import logging
+import os
+import socket
+import tarfile
+import zipfile
+from dataclasses import dataclass
+from typing import Any, Mapping
+
+from sqlalchemy import bindparam, select, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import get_settings
+from ..core import models
+from ..core.db import get_engine, get_session_factory
+from . import rag_service
+from .ingestion import IngestionTimeoutError
+
+
+logger = logging.getLogger(__name__)
+
+_MEMBER_CONTENT_TYPES = {
+    ".pdf": "application/pdf",
+    ".txt": "text/plain",
+    ".md": "text/markdown",
+}
+_ZIP_CONTENT_TYPES = {"application/zip", "application/x-zip-compressed"}
+_TAR_CONTENT_TYPES = {
+    "application/x-tar",
+    "application/gzip",
+    "application/x-gzip",
+    "application/x-bzip2",
+    "application/x-xz",
+}
+_TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+_workers: list[asyncio.Task[None]] = []
+_wakeup: asyncio.Event | None = None
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload or expanded archive exceeds the configured limits."""
+
+
+class LeaseLostError(RuntimeError):
+    """Raised when a worker no longer holds the lease of the job it is running."""
+
+
+@dataclass
+class UploadedFile:
+    filename: str
+    content_type: str
+    data: bytes
+
+
+# --- Queue -----------------------------------------------------------------
+
+
+async def enqueue(
+    session: AsyncSession,
+    *,
+    filename: str,
+    content_type: str | None,
+    payload: bytes,
+    collection: str | None = None,
+    metadata: Mapping[str, Any] | None = None,
+) -> models.IngestionJob:
+    """Persist an upload as a queued job and wake a local worker."""
+
+    settings = get_settings()
+    if not payload:
+        raise ValueError("Uploaded file is empty")
+    if len(payload) > settings.ingest_max_upload_bytes:
+        raise UploadTooLargeError(
+            f"Upload exceeds {settings.ingest_max_upload_bytes} bytes"
+        )
+
+    job = models.IngestionJob(
+        status="queued",
+        filename=filename,
+        content_type=rag_service.normalize_content_type(content_type),
+        collection=await rag_service.ensure_collection(collection),
+        metadata_=dict(metadata or {}),
+        payload=payload,
+        payload_bytes=len(payload),
+    )
+    session.add(job)
+    await session.commit()
+
+    if _wakeup is not None:
+        _wakeup.set()
+    return job
+
+
+async def get_job(session: AsyncSession, job_id: int) -> models.IngestionJob | None:
+    return await session.get(models.IngestionJob, job_id)
+
+
+def job_as_dict(job: models.IngestionJob) -> dict[str, Any]:
+    """Return the public status/progress representation of a job."""
+
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "filename": job.filename,
+        "collection": job.collection,
+        "attempts": job.attempts,
+        "progress": {
+            "documents_total": job.documents_total,
+            "documents_done": job.documents_done,
+            "pages_total": job.pages_total,
+            "pages_done": job.pages_done,
+            "chunks_total": job.chunks_total,
+            "chunks_embedded": job.chunks_embedded,
+            "chunks_written": job.chunks_written,
+        },
+        "results": job.results or [],
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+# --- Archive expansion -----------------------------------------------------
+
+
+def _member_content_type(name: str) -> str | None:
+    basename = os.path.basename(name)
+    if not basename or basename.startswith(".") or name.startswith("__MACOSX/"):
+        return None
+    return _MEMBER_CONTENT_TYPES.get(os.path.splitext(basename)[1].lower())
+
+
+def _is_zip(filename: str, content_type: str, payload: bytes) -> bool:
+    return (
+        content_type in _ZIP_CONTENT_TYPES
+        or filename.lower().endswith(".zip")
+        or payload[:4] == b"PK\x03\x04"
+    )
+
+
+def _is_tar(filename: str, content_type: str) -> bool:
+    return content_type in _TAR_CONTENT_TYPES or filename.lower().endswith(
+        _TAR_SUFFIXES
+    )
+
+
+def expand_upload(
+    filename: str, content_type: str, payload: bytes
+) -> list[UploadedFile]:
+    """Return the documents contained in an upload.
+
+    Zip and tar archives are expanded into their PDF/text members, bounded
+    by ``ingest_archive_max_files`` and ``ingest_archive_max_bytes``; any
+    other upload is a single document.
+    """
+
+    settings = get_settings()
+    if _is_zip(filename, content_type, payload):
+        members = _zip_members(payload)
+    elif _is_tar(filename, content_type):
+        members = _tar_members(payload)
+    else:
+        return [UploadedFile(filename, content_type, payload)]
+
+    files: list[UploadedFile] = []
+    total = 0
+    for name, member_type, read in members:
+        if len(files) >= settings.ingest_archive_max_files:
+            raise UploadTooLargeError(
+                f"Archive has more than {settings.ingest_archive_max_files} documents"
+            )
+        # Read one byte past the remaining budget so lying headers are caught.
+        data = read(settings.ingest_archive_max_bytes - total + 1)
+        total += len(data)
+        if total > settings.ingest_archive_max_bytes:
+            raise UploadTooLargeError(
+                f"Archive expands beyond {settings.ingest_archive_max_bytes} bytes"
+            )
+        files.append(UploadedFile(name[-255:], member_type, data))
+
+    if not files:
+        raise ValueError("Archive contains no PDF or text documents")
+    return files
+
+
+def _zip_members(payload: bytes):
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(payload))
+    except zipfile.BadZipFile as exc:
+        raise ValueError(f"Invalid zip archive: {exc}") from exc
+    for info in archive.infolist():
+        member_type = None if info.is_dir() else _member_content_type(info.filename)
+        if member_type is None:
+            continue
+
+        def read(limit: int, info: zipfile.ZipInfo = info) -> bytes:
+            with archive.open(info) as handle:
+                return handle.read(limit)
+
+        yield info.filename, member_type, read
+
+
+def _tar_members(payload: bytes):
+    try:
+        archive = tarfile.open(fileobj=io.BytesIO(payload), mode="r:*")
+    except tarfile.TarError as exc:
+        raise ValueError(f"Invalid tar archive: {exc}") from exc
+    for member in archive:
+        member_type = _member_content_type(member.name) if member.isfile() else None
+        if member_type is None:
+            continue
+
+        def read(limit: int, member: tarfile.TarInfo = member) -> bytes:
+            handle = archive.extractfile(member)
+            return handle.read(limit) if handle is not None else b""
+
+        yield member.name, member_type, read
+
+
+# --- Workers ---------------------------------------------------------------
+
+
+def start_workers() -> None:
+    """Start the ingestion worker tasks for this process."""
+
+    global _wakeup
+    settings = get_settings()
+    if _workers or settings.ingest_worker_concurrency <= 0:
+        return
+    _wakeup = asyncio.Event()
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    for index in range(settings.ingest_worker_concurrency):
+        _workers.append(
+            asyncio.create_task(
+                _worker_loop(f"{prefix}:{index}"), name=f"ingest-worker-{index}"
+            )
+        )
+
+
+async def stop_workers() -> None:
+    """Cancel worker tasks; their in-flight jobs are released back to the queue."""
+
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+
+async def _worker_loop(worker_id: str) -> None:
+    settings = get_settings()
+    while True:
+        try:
+            job_id = await _claim_job(worker_id)
+        except Exception:
+            logger.exception("Ingestion worker %s failed to claim a job", worker_id)
+            job_id = None
+
+        if job_id is None:
+            assert _wakeup is not None
+            try:
+                await asyncio.wait_for(
+                    _wakeup.wait(), timeout=settings.ingest_job_poll_seconds
+                )
+            except asyncio.TimeoutError:
+                pass
+            _wakeup.clear()
+            continue
+
+        logger.info("Ingestion worker %s running job %s", worker_id, job_id)
+        try:
+            await _run_job(job_id, worker_id)
+        except Exception:
+            # The lease lapses and another worker retries the job.
+            logger.exception("Ingestion worker %s crashed on job %s", worker_id, job_id)
+
+
+async def _claim_job(worker_id: str) -> int | None:
+    """Lease the oldest runnable job to ``worker_id``, failing jobs out of attempts."""
+
+    settings = get_settings()
+    async with get_engine("ingest").begin() as conn:
+        row = (
+            await conn.execute(
+                text(
+                    """
+                    UPDATE ingestion_jobs
+                    SET status = 'running',
+                        claimed_by = :worker,
+                        attempts = attempts + 1,
+                        started_at = coalesce(started_at, now()),
+                        lease_expires_at = now()
+                            + make_interval(secs => CAST(:lease AS float8))
+                    WHERE id = (
+                        SELECT id FROM ingestion_jobs
+                        WHERE status = 'queued'
+                           OR (status = 'running' AND lease_expires_at < now())
+                        ORDER BY id
+                        LIMIT 1
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING id, attempts
+                    """
+                ),
+                {"lease": settings.ingest_job_lease_seconds, "worker": worker_id},
+            )
+        ).first()
+    if row is None:
+        return None
+
+    if row.attempts > settings.ingest_job_max_attempts:
+        await _finish(
+            row.id,
+            worker_id,
+            "failed",
+            error=f"Gave up after {settings.ingest_job_max_attempts} attempts",
+        )
+        return None
+    return row.id
+
+
+async def _update_job(job_id: int, worker_id: str, **values: Any) -> None:
+    """Update job columns and renew its lease in a short transaction.
+
+    Raises LeaseLostError when ``worker_id`` no longer holds the job.
+    """
+
+    assignments = ", ".join(f"{column} = :{column}" for column in values)
+    statement = text(
+        f"""
+        UPDATE ingestion_jobs
+        SET {assignments}{", " if assignments else ""}
+            lease_expires_at = now() + make_interval(secs => CAST(:lease AS float8))
+        WHERE id = :job_id AND claimed_by = :worker AND status = 'running'
+        """
+    )
+    if "results" in values:
+        statement = statement.bindparams(bindparam("results", type_=JSONB))
+    params = {**values, "job_id": job_id, "worker": worker_id}
+    params["lease"] = get_settings().ingest_job_lease_seconds
+    async with get_engine("ingest").begin() as conn:
+        result = await conn.execute(statement, params)
+    if result.rowcount == 0:
+        raise LeaseLostError(f"Worker {worker_id} lost the lease on job {job_id}")
+
+
+async def _finish(
+    job_id: int,
+    worker_id: str,
+    status: str,
+    *,
+    error: str | None = None,
+    results: list[dict[str, Any]] | None = None,
+) -> None:
+    statement = text(
+        """
+        UPDATE ingestion_jobs
+        SET status = :status, error = :error,
+            results = coalesce(:results, results),
+            payload = CASE WHEN :status = 'queued' THEN payload END,
+            lease_expires_at = NULL,
+            finished_at = CASE WHEN :status = 'queued' THEN NULL ELSE now() END
+        WHERE id = :job_id AND claimed_by = :worker AND status = 'running'
+        """
+    ).bindparams(bindparam("results", type_=JSONB))
+    async with get_engine("ingest").begin() as conn:
+        result = await conn.execute(
+            statement,
+            {
+                "job_id": job_id,
+                "worker": worker_id,
+                "status": status,
+                "error": error,
+                "results": results,
+            },
+        )
+    if result.rowcount == 0:
+        logger.warning(
+            "Worker %s lost the lease on job %s; not marking it %s",
+            worker_id,
+            job_id,
+            status,
+        )
+
+
+async def _heartbeat(
+    job_id: int, worker_id: str, work: asyncio.Task[None], lost: asyncio.Event
+) -> None:
+    """Renew the lease until cancelled; cancel ``work`` once it is lost.
+
+    Progress updates also renew the lease, but a single embedding group (with
+    retries) can take longer than the lease between two of them.
+    """
+
+    interval = max(1.0, get_settings().ingest_job_lease_seconds / 3)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await _update_job(job_id, worker_id)
+        except LeaseLostError:
+            lost.set()
+            work.cancel()
+            return
+        except Exception:
+            # Keep trying; if the lease lapses meanwhile the next renewal
+            # finds it taken and stops the job.
+            logger.warning(
+                "Could not renew the lease on ingestion job %s", job_id, exc_info=True
+            )
+
+
+class _JobRunner:
+    """Processes one claimed job, reporting progress as it goes."""
+
+    def __init__(self, job: models.IngestionJob, worker_id: str) -> None:
+        self.job = job
+        self.worker_id = worker_id
+        self.settings = get_settings()
+        self.counters = dict.fromkeys(
+            (
+                "documents_total",
+                "documents_done",
+                "pages_total",
+                "pages_done",
+                "chunks_total",
+                "chunks_embedded",
+                "chunks_written",
+            ),
+            0,
+        )
+        self.results: list[dict[str, Any]] = []
+        self.group: list[rag_service.PreparedDocument] = []
+        self.group_chunks = 0
+        self._pages_base = 0
+
+    async def report(self, **changes: int) -> None:
+        self.counters.update(changes)
+        await _update_job(self.job.id, self.worker_id, **self.counters)
+
+    async def run(self, payload: bytes) -> None:
+        files = await asyncio.to_thread(
+            expand_upload, self.job.filename, self.job.content_type, payload
+        )
+        await self.report(documents_total=len(files))
+
+        seen: set[str] = set()
+        for uploaded in files:
+            file_hash = rag_service.content_hash(uploaded.data)
+            if file_hash in seen:
+                self.results.append(
+                    {"filename": uploaded.filename, "status": "duplicate"}
+                )
+                await self._document_done()
+                continue
+            seen.add(file_hash)
+
+            async with get_session_factory("ingest")() as session:
+                existing = await rag_service.find_document_by_hash(
+                    session, file_hash, self.job.collection
+                )
+            if existing is not None:
+                self.results.append(
+                    {"filename": uploaded.filename, **existing.as_dict()}
+                )
+                await self._document_done()
+                continue
+
+            try:
+                chunks = await rag_service.extract_chunks(
+                    uploaded.data,
+                    uploaded.filename,
+                    uploaded.content_type,
+                    on_pages=self._on_pages,
+                )
+                if not chunks:
+                    raise ValueError("Document contained no extractable text")
+            except (ValueError, IngestionTimeoutError) as exc:
+                if len(files) == 1:
+                    raise
+                # One bad member should not sink the rest of an archive.
+                self.results.append(
+                    {
+                        "filename": uploaded.filename,
+                        "status": "error",
+                        "error": str(exc),
+                    }
+                )
+                await self._document_done()
+                continue
+            self._pages_base = self.counters["pages_total"]
+
+            self.group.append(
+                rag_service.PreparedDocument(
+                    filename=uploaded.filename,
+                    content_type=uploaded.content_type,
+                    file_hash=file_hash,
+                    collection=self.job.collection,
+                    chunks=chunks,
+                    metadata=self.job.metadata_,
+                )
+            )
+            self.group_chunks += len(chunks)
+            await self.report(chunks_total=self.counters["chunks_total"] + len(chunks))
+            if self.group_chunks >= self.settings.ingest_embed_group_chunks:
+                await self._flush()
+
+        await self._flush()
+
+    async def _on_pages(self, done: int, total: int) -> None:
+        await self.report(
+            pages_total=self._pages_base + total, pages_done=self._pages_base + done
+        )
+
+    async def _document_done(self, count: int = 1) -> None:
+        await self.report(documents_done=self.counters["documents_done"] + count)
+
+    async def _on_embedded(self, chunks: int) -> None:
+        await self.report(chunks_embedded=self.counters["chunks_embedded"] + chunks)
+
+    async def _flush(self) -> None:
+        """Embed and write the pending documents with shared batches."""
+
+        if not self.group:
+            return
+        async with get_session_factory("ingest")() as session:
+            indexed = await rag_service.index_prepared(
+                session, self.group, on_embedded=self._on_embedded
+            )
+        for prepared, result in zip(self.group, indexed):
+            self.results.append({"filename": prepared.filename, **result.as_dict()})
+        self.counters["chunks_written"] += self.group_chunks
+        await self._document_done(len(self.group))
+        self.group = []
+        self.group_chunks = 0
+
+
+async def _run_job(job_id: int, worker_id: str) -> None:
+    settings = get_settings()
+    async with get_session_factory("ingest")() as session:
+        job = await session.get(models.IngestionJob, job_id)
+        payload = (
+            await session.execute(
+                select(models.IngestionJob.payload).where(
+                    models.IngestionJob.id == job_id
+                )
+            )
+        ).scalar()
+    if job is None or payload is None:
+        return
+
+    runner = _JobRunner(job, worker_id)
+    lost = asyncio.Event()
+    owner = asyncio.current_task()
+    assert owner is not None
+    # The job runs in its own task so the heartbeat can stop it without
+    # cancelling this one; cancelling this task cancels the job too.
+    work = asyncio.create_task(runner.run(payload), name=f"ingest-job-{job_id}")
+    heartbeat = asyncio.create_task(
+        _heartbeat(job_id, worker_id, work, lost), name=f"ingest-lease-{job_id}"
+    )
+    try:
+        try:
+            await work
+        finally:
+            heartbeat.cancel()
+    except LeaseLostError:
+        logger.warning("Worker %s lost the lease on job %s", worker_id, job_id)
+        return
+    except asyncio.CancelledError:
+        if lost.is_set() and not owner.cancelling():
+            # Stopped by the heartbeat: another worker owns the job now.
+            logger.warning("Worker %s lost the lease on job %s", worker_id, job_id)
+            return
+        # Shutting down: hand the job straight back instead of waiting for the
+        # lease to lapse.
+        await asyncio.shield(
+            _finish(job_id, worker_id, "queued", results=runner.results)
+        )
+        raise
+    except (ValueError, IngestionTimeoutError) as exc:
+        # Bad input will not get better on retry.
+        await _finish(
+            job_id, worker_id, "failed", error=str(exc), results=runner.results
+        )
+        return
+    except Exception as exc:
+        logger.exception("Ingestion job %s failed", job_id)
+        retry = job.attempts < settings.ingest_job_max_attempts
+        status = "queued" if retry else "failed"
+        await _finish(job_id, worker_id, status, error=str(exc), results=runner.results)
+        return
+
+    documents = [result for result in runner.results if result.get("status") != "error"]
+    if not documents:
+        await _finish(
+            job_id,
+            worker_id,
+            "failed",
+            error="No documents could be indexed",
+            results=runner.results,
+        )
+        return
+    await _finish(job_id, worker_id, "succeeded", results=runner.results)
+
+__all__ = [
+    "LeaseLostError",
+    "UploadTooLargeError",
+    "UploadedFile",
+    "enqueue",
+    "expand_upload",
+    "get_job",
+    "job_as_dict",
+    "start_workers",
+    "stop_workers",
+]
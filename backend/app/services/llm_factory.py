@@ -1,11 +1,14 @@
 """Factory helpers for constructing chat models."""
 
-from langchain_core.language_models import BaseChatModel
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
 
 from ..config import get_settings
 
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+
 
 class UnsupportedProviderError(ValueError):
     """Raised when a requested LLM provider does not exist."""
@@ -19,11 +22,16 @@ def get_chat_model(provider: str, model_name: str) -> BaseChatModel:
     if provider == "openai":
         if not settings.openai_api_key:
             raise RuntimeError("Missing OpenAI API key")
+        # Provider SDKs are imported only when that provider is used.
+        from langchain_openai import ChatOpenAI
+
         return ChatOpenAI(model=model_name, api_key=settings.openai_api_key)
 
     if provider == "google":
         if not settings.google_api_key:
             raise RuntimeError("Missing Google API key")
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
         return ChatGoogleGenerativeAI(
             model=model_name, google_api_key=settings.google_api_key
         )
@@ -2,68 +2,167 @@
 
 from __future__ import annotations
 
-from typing import Any, List
+import hashlib
+import json
+import unicodedata
+from array import array
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, List, Mapping, Sequence
 
-import fitz  # PyMuPDF
 from fastapi import UploadFile
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from sqlalchemy import Integer, bindparam, text
+from sqlalchemy import Integer, TextClause, bindparam, delete, select, text, update
+from sqlalchemy.dialects.postgresql import JSONB
 from pgvector.sqlalchemy import Vector
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..config import get_settings
 from ..core import models
-from .embeddings import get_embedding_provider
-
-
-async def index_document(session: AsyncSession, file: UploadFile) -> int:
-    """Ingest a single uploaded document (text or PDF) into the RAG store."""
-
-    settings = get_settings()
+from ..core.db import get_engine
+from ..core.vector_store import (
+    RAG_TABLES,
+    create_collection_index,
+    get_distance_metric,
+    get_index_spec,
+    validate_collection_name,
+)
+from . import table_versions
+from .shared_cache import JsonCodec, TieredCache, VectorCodec
+from .embeddings import (
+    get_embedding_dimension,
+    get_embedding_model_id,
+    get_embedding_provider,
+)
+from .ingestion import extract_pdf_text, split_into_chunks
+
+
+_PDF_CONTENT_TYPES = {"application/pdf", "application/x-pdf"}
+
+_settings = get_settings()
+
+# Query embeddings are stored as float32 arrays (4 bytes per dimension)
+# keyed by (embedding backend/model/dimension, normalized query text), and
+# shared with other workers through the configured cache backend.
+_query_embedding_cache: TieredCache[array] = TieredCache(
+    "rag:query_embeddings",
+    max_bytes=_settings.rag_query_embedding_cache_bytes,
+    sizeof=lambda vector: vector.itemsize * len(vector) + 64,
+    codec=VectorCodec(),
+    ttl_seconds=_settings.rag_query_embedding_cache_ttl_seconds,
+)
+
+# Top-k results keyed by embedding-cache key + top_k + search options.
+# Invalidated (in every worker) whenever the store is written to: through
+# the shared generation and, for "memory" and missed generation checks,
+# through the table-change listener.
+_result_cache: TieredCache[list[dict[str, Any]]] = TieredCache(
+    "rag:results",
+    max_bytes=_settings.rag_result_cache_bytes,
+    sizeof=lambda rows: sum(
+        len(str(row.get("content", ""))) + len(str(row.get("metadata"))) + 96
+        for row in rows
+    ),
+    codec=JsonCodec(),
+    ttl_seconds=_settings.rag_result_cache_ttl_seconds,
+)
+for _table in RAG_TABLES:
+    table_versions.on_change(_table, _result_cache.clear_local)
+
+
+class DocumentNotFoundError(LookupError):
+    """Raised when a document id does not exist in the RAG store."""
+
+
+@dataclass
+class IndexResult:
+    """Outcome of an indexing operation, including embedding reuse counts."""
+
+    document_id: int
+    status: str
+    chunks: int
+    embeddings_computed: int
+    embeddings_reused: int
+
+    def as_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class PreparedDocument:
+    """A document that has been extracted and chunked, ready to embed."""
+
+    filename: str
+    content_type: str
+    file_hash: str
+    collection: str
+    chunks: list[str]
+    metadata: Mapping[str, Any] | None = None
+
+
+@dataclass(frozen=True)
+class SearchFilters:
+    """Restrictions applied inside the candidate scans of ``query``."""
+
+    collection: str | None = None
+    content_type: str | None = None
+    created_after: datetime | None = None
+    created_before: datetime | None = None
+    metadata: Mapping[str, Any] | None = None
+
+    def cache_key(self) -> str:
+        return json.dumps(asdict(self), sort_keys=True, default=str)
+
+
+def content_hash(data: bytes | str) -> str:
+    """Return the hex SHA-256 of raw bytes or UTF-8 text."""
+
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+async def index_document(
+    session: AsyncSession,
+    file: UploadFile,
+    *,
+    collection: str | None = None,
+    metadata: Mapping[str, Any] | None = None,
+) -> IndexResult:
+    """Ingest a single uploaded document (text or PDF) into the RAG store.
+
+    Byte-identical re-uploads to the same collection short-circuit to the
+    existing document, and chunks whose text is already stored reuse the
+    stored embedding.
+    """
+
+    collection = await ensure_collection(collection)
     raw_bytes = await file.read()
+    content_type = normalize_content_type(file.content_type)
+    file_hash = content_hash(raw_bytes)
 
-    # Basic content-type dispatch; default to UTF-8 text.
-    content_type = (file.content_type or "text/plain").lower()
-    if content_type in {
-        "application/pdf",
-        "application/x-pdf",
-    } or file.filename.lower().endswith(".pdf"):
-        text_content = _extract_text_from_pdf(raw_bytes)
-    else:
-        text_content = raw_bytes.decode("utf-8", errors="ignore")
-
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=settings.rag_chunk_size,
-        chunk_overlap=settings.rag_chunk_overlap,
-    )
-    chunks = splitter.split_text(text_content)
+    existing = await find_document_by_hash(session, file_hash, collection)
+    if existing is not None:
+        return existing
+
+    chunks = await extract_chunks(raw_bytes, file.filename, content_type)
 
     if not chunks:
         raise ValueError("Uploaded document contained no extractable text")
 
-    provider = get_embedding_provider()
-    embeddings = await provider.embed_texts(chunks)
-
-    document = models.Document(
-        filename=file.filename,
-        content_type=content_type,
-        metadata_={},
+    [result] = await index_prepared(
+        session,
+        [
+            PreparedDocument(
+                filename=file.filename,
+                content_type=content_type,
+                file_hash=file_hash,
+                collection=collection,
+                chunks=chunks,
+                metadata=metadata,
+            )
+        ],
     )
-    session.add(document)
-    await session.flush()
-
-    for idx, (chunk_text, embedding) in enumerate(zip(chunks, embeddings)):
-        chunk = models.DocumentChunk(
-            document_id=document.id,
-            chunk_index=idx,
-            content=chunk_text,
-            metadata_={},
-            embedding=embedding,
-        )
-        session.add(chunk)
-
-    await session.commit()
-    return document.id
+    return result
 
 
 async def index_text(
@@ -71,84 +170,854 @@ async def index_text(
     text_content: str,
     filename: str,
     content_type: str = "text/plain",
-) -> int:
+    *,
+    collection: str | None = None,
+    metadata: Mapping[str, Any] | None = None,
+) -> IndexResult:
     """Ingest a raw text document into the RAG store."""
 
-    settings = get_settings()
+    collection = await ensure_collection(collection)
+    file_hash = content_hash(text_content)
+    existing = await find_document_by_hash(session, file_hash, collection)
+    if existing is not None:
+        return existing
 
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=settings.rag_chunk_size,
-        chunk_overlap=settings.rag_chunk_overlap,
-    )
-    chunks = splitter.split_text(text_content)
+    chunks = await split_into_chunks(text_content)
 
     if not chunks:
         raise ValueError("Provided text contained no extractable text")
 
-    provider = get_embedding_provider()
-    embeddings = await provider.embed_texts(chunks)
-
-    document = models.Document(
-        filename=filename,
-        content_type=content_type,
-        metadata_={},
+    [result] = await index_prepared(
+        session,
+        [
+            PreparedDocument(
+                filename=filename,
+                content_type=content_type,
+                file_hash=file_hash,
+                collection=collection,
+                chunks=chunks,
+                metadata=metadata,
+            )
+        ],
     )
-    session.add(document)
-    await session.flush()
+    return result
 
-    for idx, (chunk_text, embedding) in enumerate(zip(chunks, embeddings)):
-        chunk = models.DocumentChunk(
-            document_id=document.id,
-            chunk_index=idx,
-            content=chunk_text,
-            metadata_={},
-            embedding=embedding,
+
+async def replace_document(
+    session: AsyncSession,
+    document_id: int,
+    file: UploadFile,
+    *,
+    metadata: Mapping[str, Any] | None = None,
+) -> IndexResult:
+    """Replace a document's content, embedding and writing only changed chunks.
+
+    Old and new chunk sets are diffed by content hash: unchanged chunks are
+    kept (re-numbered if they moved), removed chunks are deleted and only
+    genuinely new chunk texts are embedded. ``metadata``, when given,
+    replaces the document's metadata on the document and all its chunks.
+    """
+
+    document = await session.get(models.Document, document_id)
+    if document is None:
+        raise DocumentNotFoundError(f"Document {document_id} not found")
+
+    raw_bytes = await file.read()
+    content_type = normalize_content_type(file.content_type)
+    file_hash = content_hash(raw_bytes)
+
+    if metadata is not None:
+        document.metadata_ = dict(metadata)
+        await session.execute(
+            update(models.DocumentChunk)
+            .where(models.DocumentChunk.document_id == document_id)
+            .values(metadata_=dict(metadata))
+        )
+
+    if document.content_hash == file_hash:
+        if metadata is not None:
+            await session.commit()
+            await _result_cache.invalidate()
+        chunk_count = await _count_chunks(session, document_id)
+        return IndexResult(
+            document_id=document_id,
+            status="unchanged",
+            chunks=chunk_count,
+            embeddings_computed=0,
+            embeddings_reused=chunk_count,
+        )
+
+    text_content = await _extract_text(raw_bytes, file.filename, content_type)
+    chunks = await split_into_chunks(text_content)
+
+    if not chunks:
+        raise ValueError("Uploaded document contained no extractable text")
+
+    old_rows = (
+        await session.execute(
+            select(
+                models.DocumentChunk.id,
+                models.DocumentChunk.chunk_index,
+                models.DocumentChunk.content_hash,
+            ).where(models.DocumentChunk.document_id == document_id)
+        )
+    ).all()
+
+    # Multiset of old chunk rows per hash, so repeated chunk texts are
+    # matched one-to-one.
+    old_by_hash: dict[str | None, list[Any]] = {}
+    for row in old_rows:
+        old_by_hash.setdefault(row.content_hash, []).append(row)
+
+    hashes = [content_hash(chunk) for chunk in chunks]
+    renumbered: list[dict[str, int]] = []
+    new_positions: list[int] = []
+    kept = 0
+    for idx, chunk_hash in enumerate(hashes):
+        candidates = old_by_hash.get(chunk_hash)
+        if candidates:
+            row = candidates.pop()
+            kept += 1
+            if row.chunk_index != idx:
+                renumbered.append({"id": row.id, "chunk_index": idx})
+        else:
+            new_positions.append(idx)
+
+    stale_ids = [row.id for rows in old_by_hash.values() for row in rows]
+    if stale_ids:
+        await session.execute(
+            delete(models.DocumentChunk).where(models.DocumentChunk.id.in_(stale_ids))
+        )
+    if renumbered:
+        await session.execute(update(models.DocumentChunk), renumbered)
+
+    new_chunks = [chunks[idx] for idx in new_positions]
+    embeddings, computed_hashes = await _resolve_embeddings(
+        session, new_chunks, [hashes[idx] for idx in new_positions]
+    )
+    computed = len(computed_hashes)
+    for idx, embedding in zip(new_positions, embeddings):
+        session.add(
+            models.DocumentChunk(
+                document_id=document_id,
+                chunk_index=idx,
+                content=chunks[idx],
+                content_hash=hashes[idx],
+                collection=document.collection,
+                metadata_=dict(document.metadata_ or {}),
+                embedding=embedding,
+            )
         )
-        session.add(chunk)
+
+    document.filename = file.filename
+    document.content_type = content_type
+    document.content_hash = file_hash
 
     await session.commit()
-    return document.id
+    await _result_cache.invalidate()
+    return IndexResult(
+        document_id=document_id,
+        status="replaced",
+        chunks=len(chunks),
+        embeddings_computed=computed,
+        embeddings_reused=kept + len(new_chunks) - computed,
+    )
 
 
-def _extract_text_from_pdf(raw_bytes: bytes) -> str:
-    """Extract concatenated text from a PDF file using PyMuPDF."""
+async def delete_document(session: AsyncSession, document_id: int) -> None:
+    """Delete a document and (via FK cascade) all of its chunks."""
 
-    doc = fitz.open(stream=raw_bytes, filetype="pdf")
-    try:
-        parts: list[str] = []
-        for page in doc:
-            parts.append(page.get_text("text"))
-        return "\n".join(parts)
-    finally:
-        doc.close()
+    result = await session.execute(
+        delete(models.Document).where(models.Document.id == document_id)
+    )
+    if result.rowcount == 0:
+        raise DocumentNotFoundError(f"Document {document_id} not found")
+    await session.commit()
+    await _result_cache.invalidate()
 
 
-async def query(
-    session: AsyncSession, query_text: str, top_k: int = 5
-) -> List[dict[str, Any]]:
-    """Return the top-k most similar chunks for the given query text."""
+def normalize_content_type(content_type: str | None) -> str:
+    # Basic content-type dispatch; default to UTF-8 text.
+    return (content_type or "text/plain").lower()
 
-    provider = get_embedding_provider()
-    [query_embedding] = await provider.embed_texts([query_text])
 
-    sql = (
+def is_pdf(filename: str, content_type: str) -> bool:
+    return content_type in _PDF_CONTENT_TYPES or filename.lower().endswith(".pdf")
+
+
+async def _extract_text(
+    raw_bytes: bytes,
+    filename: str,
+    content_type: str,
+    on_pages: Callable[[int, int], Awaitable[None]] | None = None,
+) -> str:
+    if is_pdf(filename, content_type):
+        return await extract_pdf_text(raw_bytes, on_pages=on_pages)
+    return raw_bytes.decode("utf-8", errors="ignore")
+
+
+async def extract_chunks(
+    raw_bytes: bytes,
+    filename: str,
+    content_type: str,
+    *,
+    on_pages: Callable[[int, int], Awaitable[None]] | None = None,
+) -> list[str]:
+    """Extract text from an uploaded file and split it into chunks.
+
+    ``on_pages(done, total)`` is awaited as PDF page ranges finish.
+    """
+
+    text_content = await _extract_text(raw_bytes, filename, content_type, on_pages)
+    return await split_into_chunks(text_content)
+
+
+async def ensure_collection(collection: str | None) -> str:
+    """Validate a collection name, registering it (and its index) if new."""
+
+    collection = validate_collection_name(
+        collection or _settings.rag_default_collection
+    )
+    # A separate short transaction keeps the index build out of the
+    # (potentially long) ingestion transaction.
+    async with get_engine("ingest").begin() as conn:
+        created = (
+            await conn.execute(
+                text(
+                    "INSERT INTO collections (name) VALUES (:name) "
+                    "ON CONFLICT (name) DO NOTHING RETURNING name"
+                ),
+                {"name": collection},
+            )
+        ).scalar()
+        if created is not None and _settings.rag_collection_indexes:
+            await create_collection_index(conn, collection)
+    return collection
+
+
+async def list_collections(session: AsyncSession) -> list[dict[str, Any]]:
+    """Return all collections with their document counts."""
+
+    result = await session.execute(
         text(
             """
-            SELECT id, document_id, content, metadata,
-                   1 - (embedding <-> :embedding) AS score
-            FROM document_chunks
-            ORDER BY embedding <-> :embedding
-            LIMIT :top_k
+            SELECT c.name, c.created_at, count(d.id) AS documents
+            FROM collections c
+            LEFT JOIN documents d ON d.collection = c.name
+            GROUP BY c.name, c.created_at
+            ORDER BY c.name
             """
         )
-        .bindparams(bindparam("embedding", type_=Vector(1536)))
-        .bindparams(bindparam("top_k", type_=Integer))
     )
+    return [dict(row._mapping) for row in result.fetchall()]
+
+
+async def find_document_by_hash(
+    session: AsyncSession, file_hash: str, collection: str
+) -> IndexResult | None:
+    document_id = (
+        await session.execute(
+            select(models.Document.id)
+            .where(
+                models.Document.content_hash == file_hash,
+                models.Document.collection == collection,
+            )
+            .limit(1)
+        )
+    ).scalar()
+    if document_id is None:
+        return None
+
+    chunk_count = await _count_chunks(session, document_id)
+    return IndexResult(
+        document_id=document_id,
+        status="unchanged",
+        chunks=chunk_count,
+        embeddings_computed=0,
+        embeddings_reused=chunk_count,
+    )
+
+
+async def _count_chunks(session: AsyncSession, document_id: int) -> int:
+    result = await session.execute(
+        text("SELECT count(*) FROM document_chunks WHERE document_id = :document_id"),
+        {"document_id": document_id},
+    )
+    return int(result.scalar() or 0)
+
+
+async def _resolve_embeddings(
+    session: AsyncSession, chunks: Sequence[str], hashes: Sequence[str]
+) -> tuple[list[Any], set[str]]:
+    """Return embeddings for ``chunks`` and the hashes that had to be computed.
 
+    Embeddings are reused from any stored chunk with the same content hash;
+    the remaining distinct texts are embedded in a single provider call.
+    """
+
+    if not chunks:
+        return [], set()
+
+    known: dict[str, Any] = {}
     result = await session.execute(
-        sql,
-        {"embedding": query_embedding, "top_k": top_k},
+        select(models.DocumentChunk.content_hash, models.DocumentChunk.embedding)
+        .where(
+            models.DocumentChunk.content_hash.in_(set(hashes)),
+            models.DocumentChunk.embedding.is_not(None),
+        )
+        .distinct(models.DocumentChunk.content_hash)
+    )
+    for chunk_hash, embedding in result.all():
+        known[chunk_hash] = embedding
+
+    missing: dict[str, str] = {}
+    for chunk_hash, chunk_text in zip(hashes, chunks):
+        if chunk_hash not in known and chunk_hash not in missing:
+            missing[chunk_hash] = chunk_text
+
+    if missing:
+        provider = get_embedding_provider()
+        vectors = await provider.embed_texts(list(missing.values()))
+        known.update(zip(missing.keys(), vectors))
+
+    return [known[chunk_hash] for chunk_hash in hashes], set(missing)
+
+
+async def index_prepared(
+    session: AsyncSession,
+    documents: Sequence[PreparedDocument],
+    *,
+    on_embedded: Callable[[int], Awaitable[None]] | None = None,
+) -> list[IndexResult]:
+    """Embed and write prepared documents in one transaction.
+
+    Chunks of all documents are resolved together, so their embedding
+    requests share batches (and identical chunks are embedded once).
+    ``on_embedded(chunks)`` is awaited once embeddings are resolved.
+    """
+
+    all_chunks = [chunk for document in documents for chunk in document.chunks]
+    hashes = [content_hash(chunk) for chunk in all_chunks]
+    embeddings, computed_hashes = await _resolve_embeddings(
+        session, all_chunks, hashes
+    )
+    if on_embedded is not None:
+        await on_embedded(len(all_chunks))
+
+    results: list[IndexResult] = []
+    counted: set[str] = set()
+    offset = 0
+    for prepared in documents:
+        document = models.Document(
+            filename=prepared.filename,
+            content_type=prepared.content_type,
+            content_hash=prepared.file_hash,
+            collection=prepared.collection,
+            metadata_=dict(prepared.metadata or {}),
+        )
+        session.add(document)
+        await session.flush()
+
+        computed = 0
+        for idx, chunk_text in enumerate(prepared.chunks):
+            chunk_hash = hashes[offset + idx]
+            if chunk_hash in computed_hashes and chunk_hash not in counted:
+                counted.add(chunk_hash)
+                computed += 1
+            session.add(
+                models.DocumentChunk(
+                    document_id=document.id,
+                    chunk_index=idx,
+                    content=chunk_text,
+                    content_hash=chunk_hash,
+                    collection=prepared.collection,
+                    # Chunks carry the document metadata so metadata filters
+                    # can be evaluated inside the vector scan.
+                    metadata_=dict(prepared.metadata or {}),
+                    embedding=embeddings[offset + idx],
+                )
+            )
+        offset += len(prepared.chunks)
+
+        results.append(
+            IndexResult(
+                document_id=document.id,
+                status="indexed",
+                chunks=len(prepared.chunks),
+                embeddings_computed=computed,
+                embeddings_reused=len(prepared.chunks) - computed,
+            )
+        )
+
+    await session.commit()
+    await _result_cache.invalidate()
+    return results
+
+
+def get_cache_stats() -> dict[str, dict[str, Any]]:
+    """Return hit-rate and size metrics for the RAG query caches."""
+
+    return {
+        "query_embeddings": _query_embedding_cache.get_stats(),
+        "results": _result_cache.get_stats(),
+    }
+
+
+def _normalize_query(query_text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", query_text).split())
+
+
+async def _embed_queries_cached(
+    model_id: str, query_texts: Sequence[str]
+) -> list[list[float]]:
+    vectors: dict[str, list[float]] = {}
+    missing: list[str] = []
+    cached_vectors = await _query_embedding_cache.get_many(
+        [(model_id, query_text) for query_text in query_texts]
     )
+    for query_text, cached in zip(query_texts, cached_vectors):
+        if cached is not None:
+            vectors[query_text] = cached.tolist()
+        else:
+            missing.append(query_text)
+
+    if missing:
+        provider = get_embedding_provider()
+        for query_text, embedding in zip(
+            missing, await provider.embed_queries(missing)
+        ):
+            await _query_embedding_cache.set(
+                (model_id, query_text), array("f", embedding)
+            )
+            vectors[query_text] = embedding
+    return [vectors[query_text] for query_text in query_texts]
+
+
+async def _embed_query_cached(
+    cache_key: tuple[str, str], query_text: str
+) -> list[float]:
+    cached = await _query_embedding_cache.get(cache_key)
+    if cached is not None:
+        return cached.tolist()
+
+    provider = get_embedding_provider()
+    embedding = await provider.embed_query(query_text)
+    await _query_embedding_cache.set(cache_key, array("f", embedding))
+    return embedding
+
+
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+
+
+def _nearest_sql(conditions: str, limit: str, embedding: str) -> str:
+    """SQL yielding ``(id, distance)`` of the nearest chunks, up to ``limit``.
+
+    Full-precision indexes are scanned directly. Compact indexes (halfvec,
+    binary, truncated) supply ``:ann_limit`` candidates that are re-ranked by
+    their exact distance to the query.
+    """
+
+    metric = get_distance_metric()
+    spec = get_index_spec()
+    where = f"WHERE {conditions}" if conditions else ""
+    if not spec.reranked:
+        return f"""
+            SELECT c.id, c.embedding {metric.operator} {embedding} AS distance
+            FROM document_chunks c
+            {where}
+            ORDER BY c.embedding {metric.operator} {embedding}
+            LIMIT {limit}
+        """
+    return f"""
+        SELECT r.id, r.embedding {metric.operator} {embedding} AS distance
+        FROM document_chunks r
+        WHERE r.id IN (
+            SELECT c.id
+            FROM document_chunks c
+            {where}
+            ORDER BY {spec.column("c.embedding")} {spec.operator}
+                     {spec.query(embedding)}
+            LIMIT :ann_limit
+        )
+        ORDER BY distance
+        LIMIT {limit}
+    """
+
+
+def _vector_sql(conditions: str, embedding: str) -> str:
+    score_sql = get_distance_metric().score_sql
+    # The outer ORDER BY restores exact ordering when iterative scans run in
+    # relaxed_order mode.
+    return f"""
+        WITH hits AS MATERIALIZED ({_nearest_sql(conditions, ":top_k", embedding)})
+        SELECT c.id, c.document_id, c.chunk_index, c.content, c.metadata,
+               {score_sql} AS score
+        FROM hits
+        JOIN document_chunks c ON c.id = hits.id
+        ORDER BY hits.distance
+    """
+
+
+def _lexical_sql(conditions: str, query_text: str) -> str:
+    extra = f"AND {conditions}" if conditions else ""
+    return f"""
+        SELECT c.id, c.document_id, c.chunk_index, c.content, c.metadata,
+               ts_rank_cd(c.content_tsv, q.query) AS score
+        FROM document_chunks c,
+             websearch_to_tsquery(CAST(:ts_config AS regconfig), {query_text})
+                 AS q(query)
+        WHERE c.content_tsv @@ q.query {extra}
+        ORDER BY score DESC
+        LIMIT :top_k
+    """
+
+
+def _hybrid_sql(conditions: str, embedding: str, query_text: str) -> str:
+    extra = f"AND {conditions}" if conditions else ""
+    # Reciprocal rank fusion of HNSW and full-text candidates in one round
+    # trip. Each CTE keeps its own LIMIT so both scans stay index-driven.
+    return f"""
+        WITH vector_hits AS (
+            SELECT id, row_number() OVER (ORDER BY distance) AS rank
+            FROM ({_nearest_sql(conditions, ":candidates", embedding)}) v
+        ),
+        lexical_hits AS (
+            SELECT id, row_number() OVER (ORDER BY text_rank DESC) AS rank
+            FROM (
+                SELECT c.id, ts_rank_cd(c.content_tsv, q.query) AS text_rank
+                FROM document_chunks c,
+                     websearch_to_tsquery(CAST(:ts_config AS regconfig), {query_text})
+                         AS q(query)
+                WHERE c.content_tsv @@ q.query {extra}
+                ORDER BY text_rank DESC
+                LIMIT :candidates
+            ) l
+        ),
+        fused AS (
+            SELECT id, sum(score) AS score
+            FROM (
+                SELECT id, CAST(:vector_weight AS float8)
+                           / (CAST(:rrf_k AS float8) + rank) AS score
+                FROM vector_hits
+                UNION ALL
+                SELECT id, CAST(:lexical_weight AS float8)
+                           / (CAST(:rrf_k AS float8) + rank) AS score
+                FROM lexical_hits
+            ) s
+            GROUP BY id
+        )
+        SELECT c.id, c.document_id, c.chunk_index, c.content, c.metadata,
+               f.score
+        FROM fused f
+        JOIN document_chunks c ON c.id = f.id
+        ORDER BY f.score DESC
+        LIMIT :top_k
+    """
+
+
+def _search_sql(
+    mode: str,
+    conditions: str,
+    embedding: str = ":embedding",
+    query_text: str = ":query_text",
+) -> str:
+    """Return the search SQL for ``mode``.
+
+    ``embedding`` and ``query_text`` are SQL expressions for the query
+    inputs: bind parameters for a single query, or columns of the batch
+    relation when ``query_many`` runs the search as a LATERAL subquery.
+    """
+
+    if mode == "vector":
+        return _vector_sql(conditions, embedding)
+    if mode == "lexical":
+        return _lexical_sql(conditions, query_text)
+    return _hybrid_sql(conditions, embedding, query_text)
+
+
+def _search_params(
+    mode: str, top_k: int, vector_weight: float, lexical_weight: float
+) -> dict[str, Any]:
+    """Return the bind parameters shared by single and batched searches."""
+
+    params: dict[str, Any] = {"top_k": top_k}
+    if mode != "vector":
+        params["ts_config"] = _settings.rag_text_search_config
+    if mode == "hybrid":
+        params.update(
+            candidates=max(top_k, _settings.rag_hybrid_candidates),
+            rrf_k=_settings.rag_rrf_k,
+            vector_weight=vector_weight,
+            lexical_weight=lexical_weight,
+        )
+    if mode != "lexical" and get_index_spec().reranked:
+        params["ann_limit"] = params.get("candidates", top_k) * max(
+            1, _settings.rag_rerank_factor
+        )
+    return params
+
 
-    rows = result.fetchall()
-    return [dict(row._mapping) for row in rows]
+def _bind_search_types(sql: TextClause, params: dict[str, Any]) -> TextClause:
+    sql = sql.bindparams(bindparam("top_k", type_=Integer))
+    if "ann_limit" in params:
+        sql = sql.bindparams(bindparam("ann_limit", type_=Integer))
+    if "embedding" in params:
+        sql = sql.bindparams(
+            bindparam("embedding", type_=Vector(get_embedding_dimension()))
+        )
+    if "filter_metadata" in params:
+        sql = sql.bindparams(bindparam("filter_metadata", type_=JSONB))
+    return sql
+
+
+def _result_key(
+    embedding_key: tuple[str, str],
+    top_k: int,
+    mode: str,
+    vector_weight: float,
+    lexical_weight: float,
+    filters: SearchFilters | None,
+    ef_search: int | None,
+) -> tuple[Any, ...]:
+    return (
+        embedding_key,
+        top_k,
+        mode,
+        vector_weight,
+        lexical_weight,
+        filters.cache_key() if filters else None,
+        ef_search,
+    )
+
+
+def _filter_clause(filters: SearchFilters | None) -> tuple[str, dict[str, Any]]:
+    """Build SQL conditions over ``document_chunks c`` for ``filters``.
+
+    The collection is inlined as a (validated) literal so the planner can
+    match the collection's partial HNSW index. Document-level filters are
+    resolved once into an id array rather than joined, so they act as a
+    plain filter inside the vector scan.
+    """
+
+    if filters is None:
+        return "", {}
+
+    clauses: list[str] = []
+    params: dict[str, Any] = {}
+    if filters.collection:
+        clauses.append(
+            f"c.collection = '{validate_collection_name(filters.collection)}'"
+        )
+    if filters.metadata:
+        clauses.append("c.metadata @> :filter_metadata")
+        params["filter_metadata"] = dict(filters.metadata)
+
+    document_clauses: list[str] = []
+    if filters.content_type:
+        document_clauses.append("d.content_type = :filter_content_type")
+        params["filter_content_type"] = filters.content_type.lower()
+    if filters.created_after:
+        document_clauses.append("d.created_at >= :filter_created_after")
+        params["filter_created_after"] = filters.created_after
+    if filters.created_before:
+        document_clauses.append("d.created_at < :filter_created_before")
+        params["filter_created_before"] = filters.created_before
+    if document_clauses:
+        clauses.append(
+            "c.document_id = ANY(ARRAY(SELECT d.id FROM documents d WHERE "
+            + " AND ".join(document_clauses)
+            + "))"
+        )
+
+    return " AND ".join(clauses), params
+
+
+async def query(
+    session: AsyncSession,
+    query_text: str,
+    top_k: int = 5,
+    *,
+    mode: str | None = None,
+    vector_weight: float = 1.0,
+    lexical_weight: float = 1.0,
+    filters: SearchFilters | None = None,
+    ef_search: int | None = None,
+) -> List[dict[str, Any]]:
+    """Return the top-k most relevant chunks for the given query text.
+
+    ``mode`` selects pure vector search, full-text search (no embedding call)
+    or a hybrid of both fused with reciprocal rank fusion, weighted by
+    ``vector_weight`` / ``lexical_weight``. ``filters`` are applied inside
+    the candidate scans, so filtered queries still return a full top-k.
+    ``ef_search`` overrides the HNSW search width for this query (higher
+    means better recall, slower search).
+    """
+
+    mode = mode or _settings.rag_search_mode
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode: {mode}")
+
+    normalized = _normalize_query(query_text)
+    embedding_key = (get_embedding_model_id(), normalized)
+    result_key = _result_key(
+        embedding_key, top_k, mode, vector_weight, lexical_weight, filters, ef_search
+    )
+
+    cached_rows = await _result_cache.get(result_key)
+    if cached_rows is not None:
+        return [dict(row) for row in cached_rows]
+
+    conditions, params = _filter_clause(filters)
+    params.update(_search_params(mode, top_k, vector_weight, lexical_weight))
+    if mode != "lexical":
+        params["embedding"] = await _embed_query_cached(embedding_key, normalized)
+    if mode != "vector":
+        params["query_text"] = normalized
+    sql = _bind_search_types(text(_search_sql(mode, conditions)), params)
+
+    if mode != "lexical":
+        await _configure_vector_scan(
+            session, params, ef_search=ef_search, filtered=bool(conditions)
+        )
+
+    result = await session.execute(sql, params)
+
+    rows = [dict(row._mapping) for row in result.fetchall()]
+    await _result_cache.set(result_key, [dict(row) for row in rows])
+    return rows
+
+
+async def query_many(
+    session: AsyncSession,
+    query_texts: Sequence[str],
+    top_k: int = 5,
+    *,
+    mode: str | None = None,
+    vector_weight: float = 1.0,
+    lexical_weight: float = 1.0,
+    filters: SearchFilters | None = None,
+    ef_search: int | None = None,
+) -> list[List[dict[str, Any]]]:
+    """Run several searches at once, returning one result list per query.
+
+    Equivalent to calling ``query`` for each text, but cache misses are
+    embedded in a single provider call and retrieved in a single SQL
+    statement that runs the search as a LATERAL subquery over the batch.
+    """
+
+    mode = mode or _settings.rag_search_mode
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode: {mode}")
+
+    model_id = get_embedding_model_id()
+    normalized = [_normalize_query(query_text) for query_text in query_texts]
+    result_keys = {
+        text_: _result_key(
+            (model_id, text_),
+            top_k,
+            mode,
+            vector_weight,
+            lexical_weight,
+            filters,
+            ef_search,
+        )
+        for text_ in normalized
+    }
+
+    results: dict[str, List[dict[str, Any]]] = {}
+    cached_results = await _result_cache.get_many(list(result_keys.values()))
+    for text_, cached_rows in zip(result_keys, cached_results):
+        if cached_rows is not None:
+            results[text_] = cached_rows
+    pending = [text_ for text_ in result_keys if text_ not in results]
+
+    if pending:
+        conditions, params = _filter_clause(filters)
+        params.update(_search_params(mode, top_k, vector_weight, lexical_weight))
+        params["query_texts"] = pending
+        arrays = ["CAST(:query_texts AS text[])"]
+        columns = ["query_text"]
+        selected = ["u.ord", "u.query_text"]
+        if mode != "lexical":
+            embeddings = await _embed_queries_cached(model_id, pending)
+            # asyncpg has no codec for vector[], so vectors travel as text
+            # literals and are cast once per query.
+            params["embeddings"] = [
+                "[" + ",".join(map(str, embedding)) + "]" for embedding in embeddings
+            ]
+            arrays.append("CAST(:embeddings AS text[])")
+            columns.append("embedding_text")
+            selected.append(
+                f"CAST(u.embedding_text AS vector({get_embedding_dimension()})) "
+                "AS embedding"
+            )
+
+        search = _search_sql(
+            mode, conditions, embedding="b.embedding", query_text="b.query_text"
+        )
+        sql = _bind_search_types(
+            text(
+                f"""
+                SELECT b.ord, results.*
+                FROM (
+                    SELECT {", ".join(selected)}
+                    FROM unnest({", ".join(arrays)})
+                        WITH ORDINALITY AS u({", ".join(columns)}, ord)
+                ) b
+                CROSS JOIN LATERAL ({search}) results
+                ORDER BY b.ord, results.score DESC
+                """
+            ),
+            params,
+        )
+
+        if mode != "lexical":
+            await _configure_vector_scan(
+                session, params, ef_search=ef_search, filtered=bool(conditions)
+            )
+
+        grouped: dict[str, List[dict[str, Any]]] = {text_: [] for text_ in pending}
+        for row in (await session.execute(sql, params)).fetchall():
+            data = dict(row._mapping)
+            grouped[pending[data.pop("ord") - 1]].append(data)
+        for text_, rows in grouped.items():
+            results[text_] = rows
+            await _result_cache.set(result_keys[text_], [dict(row) for row in rows])
+
+    return [[dict(row) for row in results[text_]] for text_ in normalized]
+
+
+async def _configure_vector_scan(
+    session: AsyncSession,
+    params: dict[str, Any],
+    *,
+    ef_search: int | None,
+    filtered: bool,
+) -> None:
+    """Set HNSW scan parameters for the current transaction (SET LOCAL).
+
+    Filtered scans also enable pgvector iterative index scans; without them
+    HNSW returns ef_search candidates and the filter is applied afterwards,
+    so selective filters yield fewer than top_k rows.
+    """
+
+    # HNSW never returns more than ef_search rows per scan, so keep it at
+    # least as large as the number of candidates requested.
+    scan_limit = params.get("ann_limit", params.get("candidates", params["top_k"]))
+    ef_search = max(ef_search or _settings.rag_hnsw_ef_search, scan_limit)
+
+    settings = {"hnsw.ef_search": str(ef_search)}
+    if filtered and _settings.rag_iterative_scan != "off":
+        settings["hnsw.iterative_scan"] = _settings.rag_iterative_scan
+        settings["hnsw.max_scan_tuples"] = str(_settings.rag_max_scan_tuples)
+
+    # SET cannot take bind parameters; set_config(..., true) is equivalent
+    # to SET LOCAL. All settings go out in one round trip.
+    calls = ", ".join(
+        f"set_config(:name_{i}, :value_{i}, true)" for i in range(len(settings))
+    )
+    params: dict[str, str] = {}
+    for i, (name, value) in enumerate(settings.items()):
+        params[f"name_{i}"] = name
+        params[f"value_{i}"] = value
+    await session.execute(text(f"SELECT {calls}"), params)
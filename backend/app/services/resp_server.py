@@ -0,0 +1,157 @@
+"""In-process stand-in for a Redis server, for ``cache_backend=redis``.
+
+Speaks enough RESP2 for the shared cache (``PING``, ``AUTH``, ``SELECT``,
+``GET``, ``MGET``, ``SET`` with ``EX``/``PX``, ``DEL``, ``INCR``, ``DBSIZE``,
+``FLUSHDB``). Values are kept in a byte-bounded LRU; counters are never
+evicted, matching ``volatile-lru`` on a real server::
+
+    python -m app.services.resp_server --port 6390 --max-bytes 268435456
+    CACHE_BACKEND=redis CACHE_REDIS_URL=redis://localhost:6390/0 uvicorn ...
+
+Not persistent and not a Redis replacement in production.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import time
+from typing import Any
+
+from .cache import ByteLRUCache
+from .shared_cache import RespError, read_reply
+
+
+logger = logging.getLogger(__name__)
+
+
+def _encode_reply(value: Any) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, RespError):
+        return b"-ERR %s\r\n" % str(value).encode()
+    if isinstance(value, str):
+        return b"+%s\r\n" % value.encode()
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    return b"*%d\r\n" % len(value) + b"".join(_encode_reply(item) for item in value)
+
+
+class RespStore:
+    """Key space of the stand-in server."""
+
+    def __init__(self, max_bytes: int) -> None:
+        # (value, wall-clock expiry); the LRU evicts by total value size.
+        self.values: ByteLRUCache[bytes, tuple[bytes, float | None]] = ByteLRUCache(
+            max_bytes=max_bytes, sizeof=lambda entry: len(entry[0]) + 64
+        )
+        self.counters: dict[bytes, int] = {}
+
+    def get(self, key: bytes) -> bytes | None:
+        if key in self.counters:
+            return str(self.counters[key]).encode()
+        entry = self.values.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            self.values.delete(key)
+            return None
+        return value
+
+    def execute(self, command: list[bytes]) -> Any:
+        name = command[0].upper()
+        args = command[1:]
+        if name == b"PING":
+            return args[0] if args else "PONG"
+        if name in (b"AUTH", b"SELECT"):
+            return "OK"
+        if name == b"GET":
+            return self.get(args[0])
+        if name == b"MGET":
+            return [self.get(key) for key in args]
+        if name == b"SET":
+            expires_at = None
+            options = [option.upper() for option in args[2::2]]
+            for option, amount in zip(options, args[3::2]):
+                if option == b"EX":
+                    expires_at = time.time() + int(amount)
+                elif option == b"PX":
+                    expires_at = time.time() + int(amount) / 1000
+                else:
+                    return RespError(f"unsupported SET option {option.decode()}")
+            self.counters.pop(args[0], None)
+            self.values.set(args[0], (args[1], expires_at))
+            return "OK"
+        if name == b"DEL":
+            removed = 0
+            for key in args:
+                if self.counters.pop(key, None) is not None or self.get(key):
+                    removed += 1
+                self.values.delete(key)
+            return removed
+        if name == b"INCR":
+            value = self.get(args[0])
+            try:
+                current = int(value) if value is not None else 0
+            except ValueError:
+                return RespError("value is not an integer or out of range")
+            self.values.delete(args[0])
+            self.counters[args[0]] = current + 1
+            return current + 1
+        if name == b"DBSIZE":
+            return self.values.stats()["entries"] + len(self.counters)
+        if name == b"FLUSHDB":
+            self.values.clear()
+            self.counters.clear()
+            return "OK"
+        return RespError(f"unknown command '{name.decode(errors='replace')}'")
+
+
+async def serve(host: str, port: int, max_bytes: int) -> None:
+    store = RespStore(max_bytes)
+
+    async def handle(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                try:
+                    command = await read_reply(reader)
+                except (RespError, asyncio.IncompleteReadError):
+                    break
+                if not isinstance(command, list) or not command:
+                    writer.write(_encode_reply(RespError("expected a command array")))
+                else:
+                    writer.write(_encode_reply(store.execute(command)))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info("RESP stand-in listening on %s:%d", host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local RESP cache server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    parser.add_argument("--max-bytes", type=int, default=256 * 1024 * 1024)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(serve(args.host, args.port, args.max_bytes))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
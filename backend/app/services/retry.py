@@ -0,0 +1,11 @@
+"""Retry helpers shared by outbound integrations."""
+
+from __future__ import annotations
+
+import random
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Return a full-jitter exponential backoff delay for a 0-based attempt."""
+
+    return random.uniform(0.0, min(max_delay, base_delay * (2**attempt)))
@@ -1,23 +1,466 @@
-"""Mock search service used by the search tool."""
+"""Federated search used by the search tool.
+
+A query fans out concurrently to every enabled backend: the document
+store's full-text index, an internal wiki stand-in and an HTTP search API
+(answered by an in-process mock unless ``search_web_mode="live"``). Each
+backend runs under its own timeout; slow backends can be hedged with a
+second request after a delay, the first answer winning. Results are merged
+as backends finish, deduplicated by URL and ranked by reciprocal rank
+fusion. At the overall deadline whatever has arrived is returned and the
+stragglers are cancelled.
+"""
 
 from __future__ import annotations
 
-from typing import Any, List
+import asyncio
+import logging
+import random
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+from urllib.parse import urlsplit, urlunsplit
 
+import httpx
+from sqlalchemy import text
 
-async def search(query: str) -> List[dict[str, Any]]:
-    """Return mock search results for the given query.
+from ..config import get_settings
+
+
+logger = logging.getLogger(__name__)
+
+SearchFunction = Callable[[str, int], Awaitable[list[dict[str, Any]]]]
+
+
+@dataclass
+class SearchBackend:
+    """A search source. ``search(query, limit)`` returns result dicts with
+    ``title``, ``snippet`` and ``url``, best first."""
+
+    name: str
+    search: SearchFunction
+    timeout_seconds: float
+    # Start a second, racing request when the first has not answered after
+    # this long; None disables hedging.
+    hedge_after_seconds: float | None = None
+
+
+# --- Metrics ---------------------------------------------------------------
+
+
+@dataclass
+class BackendStats:
+    requests: int = 0
+    timeouts: int = 0
+    errors: int = 0
+    hedged: int = 0
+    hedge_wins: int = 0
+    _latencies: deque[float] = field(
+        default_factory=lambda: deque(maxlen=512), init=False, repr=False
+    )
+
+    def snapshot(self) -> dict[str, Any]:
+        latencies = sorted(self._latencies)
+        if latencies:
+            p50 = latencies[len(latencies) // 2]
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        else:
+            p50 = p95 = 0.0
+        return {
+            "requests": self.requests,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "latency_p50_ms": round(p50 * 1000, 2),
+            "latency_p95_ms": round(p95 * 1000, 2),
+        }
+
+
+_stats: dict[str, BackendStats] = {}
+_totals = {"searches": 0, "partial": 0}
+
+
+def _backend_stats(name: str) -> BackendStats:
+    return _stats.setdefault(name, BackendStats())
+
+
+def get_search_stats() -> dict[str, Any]:
+    return {
+        **_totals,
+        "backends": {name: stats.snapshot() for name, stats in _stats.items()},
+    }
 
-    This keeps logic simple and deterministic for the technical test while
-    exercising the agent's ability to call a search tool.
-    """
 
-    base_url = "https://example.com"
+# --- Backends --------------------------------------------------------------
+
+
+async def _search_documents(query: str, limit: int) -> list[dict[str, Any]]:
+    """Full-text search over indexed documents, best chunk per document."""
+
+    from ..core.db import get_async_session
+
+    settings = get_settings()
+    sql = text(
+        """
+        SELECT d.id, d.filename,
+               ts_headline(CAST(:ts_config AS regconfig), hits.content, hits.query,
+                           'MaxFragments=1, MaxWords=30, MinWords=10') AS snippet
+        FROM (
+            SELECT DISTINCT ON (c.document_id)
+                   c.document_id, c.content, q.query,
+                   ts_rank_cd(c.content_tsv, q.query) AS score
+            FROM document_chunks c,
+                 websearch_to_tsquery(CAST(:ts_config AS regconfig), :query)
+                     AS q(query)
+            WHERE c.content_tsv @@ q.query
+            ORDER BY c.document_id, score DESC
+        ) hits
+        JOIN documents d ON d.id = hits.document_id
+        ORDER BY hits.score DESC
+        LIMIT :limit
+        """
+    )
+    async for session in get_async_session("rag"):
+        params = {
+            "ts_config": settings.rag_text_search_config,
+            "query": query,
+            "limit": limit,
+        }
+        rows = await session.execute(sql, params)
+        return [
+            {
+                "title": row.filename,
+                "snippet": row.snippet,
+                # No URL: documents have no readable endpoint, and
+                # rag_lookup can take the passage further.
+                "document_id": row.id,
+            }
+            for row in rows
+        ]
+    return []
+
+
+# Stand-in for the internal wiki: a handful of pages searched in-process.
+_WIKI_PAGES = (
+    (
+        "Returns and refunds",
+        "Returns are accepted within 30 days of delivery. Opened electronics "
+        "carry a restocking fee; refunds go to the original payment method.",
+    ),
+    (
+        "Shipping and order tracking",
+        "Orders ship within two business days. Every order has a "
+        "status_tracking_id that carriers use for live tracking lookups.",
+    ),
+    (
+        "Escalating customer issues",
+        "Escalate delayed or damaged orders to the operations on-call after "
+        "one failed resolution attempt, with the order ID and tracking ID.",
+    ),
+    (
+        "Operations team onboarding",
+        "New team members get access to the order database, the knowledge "
+        "base and the Optimus agent during their first week.",
+    ),
+)
+_WORD = re.compile(r"\w+")
+
+
+def _slug(title: str) -> str:
+    return "-".join(_WORD.findall(title.lower()))
+
+
+async def _search_wiki(query: str, limit: int) -> list[dict[str, Any]]:
+    terms = {term for term in _WORD.findall(query.lower()) if len(term) > 2}
+    scored = []
+    for title, body in _WIKI_PAGES:
+        words = _WORD.findall(f"{title} {body}".lower())
+        score = sum(word in terms for word in words)
+        if score:
+            scored.append((score, title, body))
+    scored.sort(key=lambda item: -item[0])
     return [
         {
-            "title": f"Result {i} for {query}",
-            "snippet": f"This is a mock search snippet {i} about '{query}'.",
-            "url": f"{base_url}/{i}",
+            "title": title,
+            "snippet": body,
+            "url": f"{get_settings().search_wiki_base_url}/{_slug(title)}",
         }
-        for i in range(1, 4)
+        for _, title, body in scored[:limit]
     ]
+
+
+async def _mock_web_handler(request: httpx.Request) -> httpx.Response:
+    """Stand-in for the web search API: fixed results, optional latency."""
+
+    latency_ms = get_settings().search_web_mock_latency_ms
+    if latency_ms:
+        await asyncio.sleep(random.uniform(0.5, 1.5) * latency_ms / 1000)
+    query = request.url.params.get("q", "")
+    limit = int(request.url.params.get("limit", "3"))
+    return httpx.Response(
+        200,
+        json={
+            "results": [
+                {
+                    "title": f"Result {i} for {query}",
+                    "snippet": f"This is a mock search snippet {i} about '{query}'.",
+                    "url": f"https://example.com/{i}",
+                }
+                for i in range(1, min(limit, 3) + 1)
+            ]
+        },
+    )
+
+
+_web_client: httpx.AsyncClient | None = None
+
+
+def _get_web_client() -> httpx.AsyncClient:
+    global _web_client
+    if _web_client is None:
+        settings = get_settings()
+        headers = {}
+        if settings.search_web_api_key:
+            headers["Authorization"] = f"Bearer {settings.search_web_api_key}"
+        _web_client = httpx.AsyncClient(
+            transport=(
+                httpx.MockTransport(_mock_web_handler)
+                if settings.search_web_mode == "mock"
+                else None
+            ),
+            headers=headers,
+        )
+    return _web_client
+
+
+async def close_clients() -> None:
+    global _web_client
+    if _web_client is not None:
+        await _web_client.aclose()
+        _web_client = None
+
+
+async def _search_web(query: str, limit: int) -> list[dict[str, Any]]:
+    response = await _get_web_client().get(
+        get_settings().search_web_url, params={"q": query, "limit": limit}
+    )
+    response.raise_for_status()
+    return [
+        {
+            "title": str(item.get("title", "")),
+            "snippet": str(item.get("snippet", "")),
+            "url": str(item["url"]),
+        }
+        for item in response.json().get("results", [])
+        if item.get("url")
+    ][:limit]
+
+
+# name -> (search function, default timeout, default hedge delay). Timeouts
+# and hedge delays are overridden per backend by Settings.
+_BACKENDS: dict[str, tuple[SearchFunction, float, float | None]] = {
+    "documents": (_search_documents, 1.5, None),
+    "wiki": (_search_wiki, 0.5, None),
+    "web": (_search_web, 1.5, 0.4),
+}
+
+
+def register_backend(
+    name: str,
+    search: SearchFunction,
+    timeout_seconds: float,
+    hedge_after_seconds: float | None = None,
+) -> None:
+    """Add (or replace) a backend; it is used when listed in search_backends."""
+
+    _BACKENDS[name] = (search, timeout_seconds, hedge_after_seconds)
+
+
+def get_backends() -> list[SearchBackend]:
+    settings = get_settings()
+    backends = []
+    for name in settings.search_backends:
+        if name not in _BACKENDS:
+            logger.warning("Unknown search backend %r ignored", name)
+            continue
+        search, timeout, hedge_after = _BACKENDS[name]
+        backends.append(
+            SearchBackend(
+                name=name,
+                search=search,
+                timeout_seconds=settings.search_backend_timeouts.get(name, timeout),
+                hedge_after_seconds=settings.search_hedge_delays.get(name, hedge_after),
+            )
+        )
+    return backends
+
+
+# --- Fan-out ---------------------------------------------------------------
+
+
+async def _hedged(
+    backend: SearchBackend, query: str, limit: int
+) -> list[dict[str, Any]]:
+    """Run the backend, racing a second request if the first is slow."""
+
+    stats = _backend_stats(backend.name)
+    primary = asyncio.ensure_future(backend.search(query, limit))
+    if backend.hedge_after_seconds is None:
+        return await primary
+
+    attempts = [primary]
+    try:
+        done, _ = await asyncio.wait(attempts, timeout=backend.hedge_after_seconds)
+        if not done:
+            stats.hedged += 1
+            attempts.append(asyncio.ensure_future(backend.search(query, limit)))
+        pending = set(attempts)
+        error: BaseException | None = None
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for attempt in done:
+                if attempt.exception() is None:
+                    if attempt is not primary:
+                        stats.hedge_wins += 1
+                    return attempt.result()
+                error = attempt.exception()
+        assert error is not None
+        raise error
+    finally:
+        for attempt in attempts:
+            attempt.cancel()
+
+
+async def _run_backend(
+    backend: SearchBackend, query: str, limit: int
+) -> list[dict[str, Any]]:
+    stats = _backend_stats(backend.name)
+    stats.requests += 1
+    started = time.perf_counter()
+    try:
+        return await asyncio.wait_for(
+            _hedged(backend, query, limit), backend.timeout_seconds
+        )
+    except TimeoutError:
+        stats.timeouts += 1
+        raise
+    except asyncio.CancelledError:
+        # Cut off by the overall deadline.
+        stats.timeouts += 1
+        raise
+    except Exception:
+        stats.errors += 1
+        logger.warning("Search backend %s failed", backend.name, exc_info=True)
+        raise
+    finally:
+        stats._latencies.append(time.perf_counter() - started)
+
+
+def _url_key(url: str) -> str:
+    parts = urlsplit(url.strip())
+    return urlunsplit(
+        (
+            parts.scheme.lower(),
+            parts.netloc.lower(),
+            parts.path.rstrip("/") or "/",
+            parts.query,
+            "",
+        )
+    )
+
+
+def _result_key(result: dict[str, Any]) -> str:
+    if "document_id" in result:
+        return f"document:{result['document_id']}"
+    return _url_key(result["url"])
+
+
+class _Merger:
+    """Deduplicates results by URL (or document) and fuses rankings (RRF)."""
+
+    def __init__(self, rrf_k: int) -> None:
+        self._rrf_k = rrf_k
+        self._results: dict[str, dict[str, Any]] = {}
+        self._scores: dict[str, float] = {}
+
+    def add(self, backend: str, results: list[dict[str, Any]]) -> None:
+        for rank, result in enumerate(results, start=1):
+            key = _result_key(result)
+            merged = self._results.get(key)
+            if merged is None:
+                merged = self._results[key] = {**result, "sources": []}
+            if backend not in merged["sources"]:
+                merged["sources"].append(backend)
+            self._scores[key] = self._scores.get(key, 0.0) + 1 / (self._rrf_k + rank)
+
+    def ranked(self, limit: int) -> list[dict[str, Any]]:
+        keys = sorted(self._scores, key=self._scores.__getitem__, reverse=True)
+        return [self._results[key] for key in keys[:limit]]
+
+
+async def search(query: str, limit: int | None = None) -> dict[str, Any]:
+    """Search every enabled backend concurrently and merge the results.
+
+    Returns ``{"status", "results", "partial", "backends"}``, where
+    ``backends`` maps each backend to "ok", "timeout" or "error" and
+    ``partial`` is true when any backend did not contribute.
+    """
+
+    settings = get_settings()
+    limit = limit or settings.search_max_results
+    backends = get_backends()
+    _totals["searches"] += 1
+
+    tasks = {
+        asyncio.create_task(_run_backend(backend, query, limit)): backend.name
+        for backend in backends
+    }
+    outcome = {name: "timeout" for name in tasks.values()}
+    merger = _Merger(settings.rag_rrf_k)
+    deadline = time.monotonic() + settings.search_deadline_seconds
+    pending = set(tasks)
+    try:
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(
+                pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                name = tasks[task]
+                error = task.exception()
+                if error is None:
+                    outcome[name] = "ok"
+                    merger.add(name, task.result())
+                elif not isinstance(error, TimeoutError):
+                    outcome[name] = "error"
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    partial = any(status != "ok" for status in outcome.values())
+    if partial:
+        _totals["partial"] += 1
+    return {
+        "status": "ok",
+        "results": merger.ranked(limit),
+        "partial": partial,
+        "backends": outcome,
+    }
+
+
+__all__ = [
+    "SearchBackend",
+    "close_clients",
+    "get_backends",
+    "get_search_stats",
+    "register_backend",
+    "search",
+]
@@ -0,0 +1,773 @@
+"""Two-tier caches shared between uvicorn workers.
+
+Each ``TieredCache`` keeps decoded values in an in-process ``ByteLRUCache``
+(tier 1) in front of an optional shared backend (tier 2) selected by
+``cache_backend``:
+
+* ``memory`` - no shared tier; every worker warms its own cache.
+* ``sqlite`` - a WAL-mode SQLite file shared by the workers on one host,
+  bounded in bytes with least-recently-used eviction.
+* ``redis`` - any server speaking the Redis protocol (RESP). Entries carry a
+  TTL, so ``maxmemory-policy volatile-lru`` bounds it without evicting the
+  generation counters. ``python -m app.services.resp_server`` is a local
+  stand-in.
+
+Values cross the shared tier as bytes: float vectors as packed little-endian
+float32 (4 bytes per dimension), everything else as compact JSON. A cache is
+invalidated by bumping its namespace generation, which is part of every
+shared key; other workers pick up the new generation within
+``cache_generation_check_seconds``. Shared-tier errors are counted and the
+tier is skipped for ``cache_retry_after_seconds``, so a slow or missing
+backend degrades to the in-process tier instead of failing requests.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import ssl
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from array import array
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Generic, Sequence, TypeVar
+from urllib.parse import unquote, urlsplit
+
+from ..config import get_settings
+from .cache import ByteLRUCache
+
+
+logger = logging.getLogger(__name__)
+
+V = TypeVar("V")
+
+
+# ---------------------------------------------------------------------------
+# Codecs
+# ---------------------------------------------------------------------------
+
+
+class VectorCodec:
+    """float32 vectors as packed little-endian bytes."""
+
+    def encode(self, value: array) -> bytes:
+        if value.typecode != "f":
+            value = array("f", value)
+        if sys.byteorder == "big":
+            value = array("f", value)
+            value.byteswap()
+        return value.tobytes()
+
+    def decode(self, data: bytes) -> array:
+        value = array("f")
+        value.frombytes(data)
+        if sys.byteorder == "big":
+            value.byteswap()
+        return value
+
+
+class JsonCodec(Generic[V]):
+    """Compact JSON, with optional hooks to and from plain JSON types."""
+
+    def __init__(
+        self,
+        to_json: Callable[[V], Any] | None = None,
+        from_json: Callable[[Any], V] | None = None,
+    ) -> None:
+        self._to_json = to_json
+        self._from_json = from_json
+
+    def encode(self, value: V) -> bytes:
+        data = self._to_json(value) if self._to_json else value
+        return json.dumps(data, separators=(",", ":"), default=str).encode()
+
+    def decode(self, data: bytes) -> V:
+        value = json.loads(data)
+        return self._from_json(value) if self._from_json else value
+
+
+# ---------------------------------------------------------------------------
+# Shared backends
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class BackendStats:
+    """Shared-tier round trips, errors and latency."""
+
+    calls: int = 0
+    errors: int = 0
+    skipped: int = 0
+    evictions: int = 0
+    _latencies: deque[float] = field(
+        default_factory=lambda: deque(maxlen=512), init=False, repr=False
+    )
+
+    def snapshot(self) -> dict[str, Any]:
+        latencies = sorted(self._latencies)
+        if latencies:
+            p50 = latencies[len(latencies) // 2]
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        else:
+            p50 = p95 = 0.0
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "evictions": self.evictions,
+            "latency_p50_ms": round(p50 * 1000, 3),
+            "latency_p95_ms": round(p95 * 1000, 3),
+        }
+
+
+class CacheBackend(ABC):
+    """Byte-valued store shared between processes."""
+
+    name: str
+
+    def __init__(self) -> None:
+        self.stats = BackendStats()
+        self._down_until = 0.0
+
+    async def guarded(
+        self, operation: Callable[..., Awaitable[Any]], *args: Any, default: Any
+    ) -> Any:
+        """Run ``operation``, returning ``default`` if it fails.
+
+        After a failure the backend is skipped for ``cache_retry_after_seconds``
+        so callers fall back to the in-process tier without waiting on it.
+        """
+
+        if time.monotonic() < self._down_until:
+            self.stats.skipped += 1
+            return default
+        retry_after = get_settings().cache_retry_after_seconds
+        started = time.perf_counter()
+        self.stats.calls += 1
+        try:
+            return await operation(*args)
+        except Exception:
+            self.stats.errors += 1
+            self._down_until = time.monotonic() + retry_after
+            logger.warning(
+                "Shared cache (%s) failed; using the in-process tier for %.0fs",
+                self.name,
+                retry_after,
+                exc_info=True,
+            )
+            return default
+        finally:
+            self.stats._latencies.append(time.perf_counter() - started)
+
+    @abstractmethod
+    async def get_many(self, keys: Sequence[str]) -> list[bytes | None]:
+        """Values for ``keys`` (``None`` where missing or expired)."""
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl_seconds: float | None) -> None:
+        """Store ``value`` under ``key``, evicting as needed."""
+
+    @abstractmethod
+    async def incr(self, key: str) -> int:
+        """Atomically increment a (never evicted) counter; return it."""
+
+    @abstractmethod
+    async def get_counter(self, key: str) -> int:
+        """Current value of a counter, 0 if unset."""
+
+    async def close(self) -> None:
+        """Release connections."""
+
+    def describe(self) -> dict[str, Any]:
+        return {"backend": self.name, **self.stats.snapshot()}
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+# Holds the byte total of ``entries`` in ``counters``.
+_SQLITE_BYTES_KEY = "__bytes__"
+
+
+class SqliteBackend(CacheBackend):
+    """A SQLite file shared by the workers on one host.
+
+    WAL mode lets readers proceed while one writer holds the lock. Eviction
+    is least-recently-used by ``accessed_at``, which reads refresh at most
+    every ``touch_interval`` seconds so hits rarely need the write lock.
+    """
+
+    name = "sqlite"
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int,
+        *,
+        timeout: float = 5.0,
+        touch_interval: float = 30.0,
+    ) -> None:
+        super().__init__()
+        self._path = path
+        self._max_bytes = max_bytes
+        self._timeout = timeout
+        self._touch_interval = touch_interval
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self._path,
+                timeout=self._timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SQLITE_SCHEMA)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _get_many(self, keys: Sequence[str]) -> list[bytes | None]:
+        conn = self._conn()
+        placeholders = ",".join("?" * len(keys))
+        rows = conn.execute(
+            "SELECT key, value, expires_at, accessed_at FROM entries "
+            f"WHERE key IN ({placeholders})",
+            list(keys),
+        ).fetchall()
+        now = time.time()
+        found: dict[str, bytes] = {}
+        stale_access: list[str] = []
+        for key, value, expires_at, accessed_at in rows:
+            if expires_at is not None and expires_at <= now:
+                continue
+            found[key] = value
+            if now - accessed_at > self._touch_interval:
+                stale_access.append(key)
+        if stale_access:
+            conn.executemany(
+                "UPDATE entries SET accessed_at = ? WHERE key = ?",
+                [(now, key) for key in stale_access],
+            )
+        return [found.get(key) for key in keys]
+
+    def _set(self, key: str, value: bytes, ttl_seconds: float | None) -> None:
+        size = len(key) + len(value)
+        if size > self._max_bytes:
+            return
+        now = time.time()
+        expires_at = now + ttl_seconds if ttl_seconds else None
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            previous = conn.execute(
+                "SELECT size FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, expires_at, now),
+            )
+            total = self._add_counter(
+                conn, _SQLITE_BYTES_KEY, size - (previous[0] if previous else 0)
+            )
+            if total > self._max_bytes:
+                total = self._evict(conn, total)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self, conn: sqlite3.Connection, total: int) -> int:
+        # Expired entries go first, then the least recently used.
+        victims = conn.execute(
+            "SELECT key, size FROM entries "
+            "ORDER BY (expires_at IS NOT NULL AND expires_at <= ?) DESC, accessed_at "
+            "LIMIT 256",
+            (time.time(),),
+        ).fetchall()
+        freed = 0
+        evicted: list[tuple[str]] = []
+        for key, size in victims:
+            if total - freed <= self._max_bytes:
+                break
+            evicted.append((key,))
+            freed += size
+        conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+        self.stats.evictions += len(evicted)
+        return self._add_counter(conn, _SQLITE_BYTES_KEY, -freed)
+
+    @staticmethod
+    def _add_counter(conn: sqlite3.Connection, key: str, delta: int) -> int:
+        conn.execute(
+            "INSERT INTO counters VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value",
+            (key, delta),
+        )
+        return conn.execute(
+            "SELECT value FROM counters WHERE key = ?", (key,)
+        ).fetchone()[0]
+
+    def _incr(self, key: str) -> int:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            value = self._add_counter(conn, key, 1)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def _get_counter(self, key: str) -> int:
+        row = (
+            self._conn()
+            .execute("SELECT value FROM counters WHERE key = ?", (key,))
+            .fetchone()
+        )
+        return row[0] if row else 0
+
+    async def get_many(self, keys: Sequence[str]) -> list[bytes | None]:
+        return await asyncio.to_thread(self._get_many, keys)
+
+    async def set(self, key: str, value: bytes, ttl_seconds: float | None) -> None:
+        await asyncio.to_thread(self._set, key, value, ttl_seconds)
+
+    async def incr(self, key: str) -> int:
+        return await asyncio.to_thread(self._incr, key)
+
+    async def get_counter(self, key: str) -> int:
+        return await asyncio.to_thread(self._get_counter, key)
+
+    async def close(self) -> None:
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    def describe(self) -> dict[str, Any]:
+        try:
+            used = self._get_counter(_SQLITE_BYTES_KEY)
+        except sqlite3.Error:
+            used = None
+        return {
+            **super().describe(),
+            "path": self._path,
+            "bytes": used,
+            "max_bytes": self._max_bytes,
+        }
+
+
+class RespError(RuntimeError):
+    """An error reply or malformed response from a RESP server."""
+
+
+def encode_command(*args: bytes | str | int) -> bytes:
+    """Encode one command as a RESP array of bulk strings."""
+
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode()
+        elif isinstance(arg, int):
+            arg = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+async def read_reply(reader: asyncio.StreamReader) -> Any:
+    """Read one RESP2 reply. Error replies raise ``RespError``."""
+
+    line = await reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise RespError("Connection closed by server")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload.decode()
+    if kind == b"-":
+        raise RespError(payload.decode())
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        length = int(payload)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        count = int(payload)
+        if count < 0:
+            return None
+        return [await read_reply(reader) for _ in range(count)]
+    raise RespError(f"Unexpected reply type {kind!r}")
+
+
+class RedisBackend(CacheBackend):
+    """Minimal RESP client with a small connection pool.
+
+    Speaks just the commands the cache needs (``MGET``, ``SET ... PX``,
+    ``INCR``, ``GET``), so it works against Redis, Valkey, KeyDB or the
+    ``resp_server`` stand-in without a client library.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, pool_size: int, timeout: float) -> None:
+        super().__init__()
+        parts = urlsplit(url)
+        if parts.scheme not in ("redis", "rediss"):
+            raise ValueError(f"Unsupported cache URL scheme: {parts.scheme}")
+        self._host = parts.hostname or "localhost"
+        self._port = parts.port or 6379
+        self._username = unquote(parts.username) if parts.username else None
+        self._password = unquote(parts.password) if parts.password else None
+        self._db = int(parts.path.lstrip("/") or 0)
+        self._tls = parts.scheme == "rediss"
+        self._pool_size = pool_size
+        self._timeout = timeout
+        self._idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    async def _connect(
+        self,
+    ) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.open_connection(
+            self._host, self._port, ssl=ssl.create_default_context() if self._tls else None
+        )
+        setup: list[tuple[Any, ...]] = []
+        if self._password is not None:
+            setup.append(
+                ("AUTH", self._username, self._password)
+                if self._username
+                else ("AUTH", self._password)
+            )
+        if self._db:
+            setup.append(("SELECT", self._db))
+        if setup:
+            writer.write(b"".join(encode_command(*command) for command in setup))
+            await writer.drain()
+            for _ in setup:
+                await read_reply(reader)
+        return reader, writer
+
+    async def _execute(self, *commands: tuple[Any, ...]) -> list[Any]:
+        """Pipeline ``commands`` on one pooled connection."""
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Connections belong to the loop that opened them.
+            self._idle = []
+            self._slots = asyncio.Semaphore(self._pool_size)
+            self._loop = loop
+        assert self._slots is not None
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else None
+            try:
+                async with asyncio.timeout(self._timeout):
+                    if conn is None:
+                        conn = await self._connect()
+                    reader, writer = conn
+                    writer.write(
+                        b"".join(encode_command(*command) for command in commands)
+                    )
+                    await writer.drain()
+                    replies = [await read_reply(reader) for _ in commands]
+            except BaseException:
+                if conn is not None:
+                    conn[1].close()
+                raise
+            self._idle.append(conn)
+            return replies
+
+    async def get_many(self, keys: Sequence[str]) -> list[bytes | None]:
+        (values,) = await self._execute(("MGET", *keys))
+        return values
+
+    async def set(self, key: str, value: bytes, ttl_seconds: float | None) -> None:
+        if ttl_seconds:
+            await self._execute(("SET", key, value, "PX", int(ttl_seconds * 1000)))
+        else:
+            await self._execute(("SET", key, value))
+
+    async def incr(self, key: str) -> int:
+        (value,) = await self._execute(("INCR", key))
+        return value
+
+    async def get_counter(self, key: str) -> int:
+        (value,) = await self._execute(("GET", key))
+        return int(value) if value is not None else 0
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+
+    def describe(self) -> dict[str, Any]:
+        return {
+            **super().describe(),
+            "address": f"{self._host}:{self._port}/{self._db}",
+            "idle_connections": len(self._idle),
+        }
+
+
+@lru_cache(maxsize=1)
+def get_shared_backend() -> CacheBackend | None:
+    """The configured shared tier, or ``None`` for ``cache_backend=memory``."""
+
+    settings = get_settings()
+    if settings.cache_backend == "memory":
+        return None
+    if settings.cache_backend == "sqlite":
+        return SqliteBackend(
+            settings.cache_sqlite_path,
+            settings.cache_sqlite_max_bytes,
+            timeout=settings.cache_timeout_seconds,
+        )
+    if settings.cache_backend == "redis":
+        return RedisBackend(
+            settings.cache_redis_url,
+            settings.cache_redis_pool_size,
+            settings.cache_timeout_seconds,
+        )
+    raise ValueError(f"Unknown cache backend: {settings.cache_backend}")
+
+
+# ---------------------------------------------------------------------------
+# Tiered cache
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class TierStats:
+    memory_hits: int = 0
+    shared_hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    invalidations: int = 0
+    decode_errors: int = 0
+
+    def snapshot(self) -> dict[str, Any]:
+        lookups = self.memory_hits + self.shared_hits + self.misses
+        shared_lookups = self.shared_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "invalidations": self.invalidations,
+            "decode_errors": self.decode_errors,
+            "memory_hit_rate": (
+                round(self.memory_hits / lookups, 4) if lookups else 0.0
+            ),
+            # Of the lookups that reached the shared tier.
+            "shared_hit_rate": (
+                round(self.shared_hits / shared_lookups, 4) if shared_lookups else 0.0
+            ),
+            "hit_rate": (
+                round((self.memory_hits + self.shared_hits) / lookups, 4)
+                if lookups
+                else 0.0
+            ),
+        }
+
+
+class TieredCache(Generic[V]):
+    """In-process LRU in front of the shared backend, for one namespace.
+
+    Keys are any JSON-serializable value (tuples included); they are hashed
+    into fixed-size shared keys that embed the namespace generation.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        *,
+        max_bytes: int,
+        sizeof: Callable[[V], int],
+        codec: VectorCodec | JsonCodec[Any],
+        ttl_seconds: float | None = None,
+        backend: CacheBackend | None | bool = True,
+    ) -> None:
+        self.namespace = namespace
+        self._local: ByteLRUCache[str, V] = ByteLRUCache(
+            max_bytes=max_bytes, sizeof=sizeof, ttl_seconds=ttl_seconds
+        )
+        self._codec = codec
+        self._ttl = ttl_seconds
+        # ``True`` resolves the configured backend lazily, on first use.
+        self._backend_choice = backend
+        self._generation = 0
+        self._generation_checked = float("-inf")
+        self.stats = TierStats()
+
+    @property
+    def enabled(self) -> bool:
+        return self._local.enabled
+
+    @property
+    def backend(self) -> CacheBackend | None:
+        if self._backend_choice is True:
+            return get_shared_backend()
+        return self._backend_choice or None
+
+    def _digest(self, key: Any) -> str:
+        text = json.dumps(key, separators=(",", ":"), default=str)
+        return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+    def _shared_key(self, digest: str) -> str:
+        prefix = get_settings().cache_key_prefix
+        return f"{prefix}:{self.namespace}:{self._generation}:{digest}"
+
+    def _generation_key(self) -> str:
+        return f"{get_settings().cache_key_prefix}:{self.namespace}:generation"
+
+    async def _sync_generation(self, backend: CacheBackend) -> None:
+        now = time.monotonic()
+        if now - self._generation_checked < get_settings().cache_generation_check_seconds:
+            return
+        generation = await backend.guarded(
+            backend.get_counter, self._generation_key(), default=None
+        )
+        if generation is None:
+            return
+        self._generation_checked = now
+        if generation != self._generation:
+            self._generation = generation
+            self._local.clear()
+
+    async def get(self, key: Any) -> V | None:
+        return (await self.get_many([key]))[0]
+
+    async def get_many(self, keys: Sequence[Any]) -> list[V | None]:
+        if not self.enabled:
+            return [None] * len(keys)
+        backend = self.backend
+        if backend is not None:
+            await self._sync_generation(backend)
+        digests = [self._digest(key) for key in keys]
+        values: list[V | None] = [self._local.get(digest) for digest in digests]
+        missing = [index for index, value in enumerate(values) if value is None]
+        self.stats.memory_hits += len(keys) - len(missing)
+        if not missing or backend is None:
+            self.stats.misses += len(missing)
+            return values
+
+        blobs = await backend.guarded(
+            backend.get_many,
+            [self._shared_key(digests[index]) for index in missing],
+            default=[None] * len(missing),
+        )
+        for index, blob in zip(missing, blobs):
+            if blob is None:
+                self.stats.misses += 1
+                continue
+            try:
+                value = self._codec.decode(blob)
+            except (ValueError, TypeError):
+                self.stats.decode_errors += 1
+                self.stats.misses += 1
+                continue
+            self.stats.shared_hits += 1
+            self._local.set(digests[index], value)
+            values[index] = value
+        return values
+
+    async def set(self, key: Any, value: V) -> None:
+        if not self.enabled:
+            return
+        digest = self._digest(key)
+        self._local.set(digest, value)
+        self.stats.stores += 1
+        backend = self.backend
+        if backend is None:
+            return
+        await backend.guarded(
+            backend.set,
+            self._shared_key(digest),
+            self._codec.encode(value),
+            self._ttl,
+            default=None,
+        )
+
+    async def invalidate(self) -> None:
+        """Drop every entry, in this worker and (via the generation) all others."""
+
+        self._local.clear()
+        self.stats.invalidations += 1
+        backend = self.backend
+        if backend is None or not self.enabled:
+            return
+        generation = await backend.guarded(
+            backend.incr, self._generation_key(), default=None
+        )
+        if generation is not None:
+            self._generation = generation
+            self._generation_checked = time.monotonic()
+        # Otherwise other workers keep their entries until their TTL runs out.
+
+    def clear_local(self) -> None:
+        """Drop this worker's in-process entries after a write elsewhere.
+
+        The generation is re-checked on the next lookup, so stale shared
+        entries are not copied straight back in.
+        """
+
+        self._local.clear()
+        self._generation_checked = float("-inf")
+
+    def get_stats(self) -> dict[str, Any]:
+        backend = self.backend
+        return {
+            "memory": self._local.stats(),
+            "shared": backend.name if backend is not None else None,
+            "generation": self._generation,
+            **self.stats.snapshot(),
+        }
+
+
+def get_backend_stats() -> dict[str, Any] | None:
+    """Round trips, errors and latency of the shared tier."""
+
+    backend = get_shared_backend()
+    return backend.describe() if backend is not None else None
+
+
+async def close_shared_cache() -> None:
+    backend = get_shared_backend()
+    if backend is not None:
+        await backend.close()
+
+
+__all__ = [
+    "CacheBackend",
+    "JsonCodec",
+    "RedisBackend",
+    "SqliteBackend",
+    "TieredCache",
+    "VectorCodec",
+    "close_shared_cache",
+    "get_backend_stats",
+    "get_shared_backend",
+]
@@ -2,31 +2,319 @@
 
 from __future__ import annotations
 
-from typing import Any, Iterable, List
+import json
+import re
+from dataclasses import asdict, dataclass
+from typing import Any
 
 from sqlalchemy import text
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..core.db import _engine
+from ..config import get_settings
+from ..core.db import get_session_factory
+from . import table_versions
+from .cache import ByteLRUCache
+from .shared_cache import JsonCodec, TieredCache
 
 
-_session_factory: async_sessionmaker[AsyncSession] = async_sessionmaker(
-    _engine, expire_on_commit=False
+# SQLSTATEs the model can fix by rewriting the query.
+_TIMEOUT_SQLSTATES = {"57014": "statement_timeout", "55P03": "lock_timeout"}
+_READ_ONLY_SQLSTATE = "25006"
+
+# Quoted literals and identifiers are kept verbatim when normalizing.
+_QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+_WHITESPACE = re.compile(r"\s+")
+
+_settings = get_settings()
+
+
+@dataclass(frozen=True)
+class PlanVerdict:
+    """Outcome of the EXPLAIN cost gate for one normalized query."""
+
+    allowed: bool
+    total_cost: float
+    plan_rows: int
+    hotspot: dict[str, Any] | None = None
+    # Tables the plan reads, used to invalidate cached results.
+    relations: tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class CachedResult:
+    """A sql_fetch response and the table versions it was read at."""
+
+    relations: tuple[str, ...]
+    versions: tuple[int, ...]
+    response: dict[str, Any]
+
+
+# Verdicts keyed by normalized query text, so a repeated query skips the
+# EXPLAIN round trip (in any worker, via the shared cache tier). The TTL
+# lets verdicts follow changing statistics.
+_plan_cache: TieredCache[PlanVerdict] = TieredCache(
+    "sql:plan_verdicts",
+    max_bytes=_settings.sql_plan_cache_bytes,
+    sizeof=lambda verdict: len(json.dumps(verdict.hotspot, default=str)) + 96,
+    codec=JsonCodec(
+        to_json=asdict,
+        from_json=lambda data: PlanVerdict(
+            **{**data, "relations": tuple(data["relations"])}
+        ),
+    ),
+    ttl_seconds=_settings.sql_plan_cache_ttl_seconds,
 )
 
+# Responses keyed by normalized query text. An entry is only served while
+# the versions of the tables it read are unchanged (versions are per
+# process, so this cache stays in-process); only queries reading
+# exclusively from sql_cache_tables (which carry change triggers) are
+# cached, and nothing is served while the change listener is down.
+_result_cache: ByteLRUCache[str, CachedResult] = ByteLRUCache(
+    max_bytes=_settings.sql_result_cache_bytes,
+    sizeof=lambda entry: len(json.dumps(entry.response, default=str)) + 128,
+    ttl_seconds=_settings.sql_result_cache_ttl_seconds,
+)
+
+
+def normalize_sql(query: str) -> str:
+    """Canonical form of a query: trailing ``;`` dropped, whitespace
+    collapsed and keywords/identifiers lower-cased outside quotes."""
+
+    parts = _QUOTED.split(query.strip().rstrip(";").strip())
+    return "".join(
+        part if index % 2 else _WHITESPACE.sub(" ", part).lower()
+        for index, part in enumerate(parts)
+    )
+
+
+def get_cache_stats() -> dict[str, dict[str, Any]]:
+    """Return hit-rate and size metrics for the sql_fetch caches."""
+
+    return {
+        "plan_verdicts": _plan_cache.get_stats(),
+        "results": _result_cache.stats(),
+        "table_versions": table_versions.get_stats(),
+    }
+
+
+def _result_cache_usable() -> bool:
+    # Versions come from NOTIFY on the primary. A replica may not have
+    # replayed the write yet when the bump arrives, and rows read from it
+    # would be stored under the new version, so results read from a replica
+    # are never cached.
+    return (
+        _result_cache.enabled
+        and table_versions.is_live()
+        and not get_settings().database_read_url
+    )
+
+
+def _cached_response(key: str) -> dict[str, Any] | None:
+    if not _result_cache_usable():
+        return None
+    entry = _result_cache.get(key)
+    if entry is None:
+        return None
+    if table_versions.snapshot(entry.relations) != entry.versions:
+        _result_cache.delete(key)
+        return None
+    return entry.response
 
-async def fetch(query: str) -> List[dict[str, Any]]:
-    """Execute a read-only SQL query and return rows as dictionaries.
 
-    For safety, only SELECT statements are allowed.
+def _sqlstate(exc: DBAPIError) -> str | None:
+    orig = exc.orig
+    return getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)
+
+
+def _iter_plan(node: dict[str, Any]):
+    yield node
+    for child in node.get("Plans", ()):
+        yield from _iter_plan(child)
+
+
+def _hotspot(plan: dict[str, Any]) -> dict[str, Any]:
+    """Describe the plan node with the highest cost of its own."""
+
+    def own_cost(node: dict[str, Any]) -> float:
+        children = sum(child["Total Cost"] for child in node.get("Plans", ()))
+        return node["Total Cost"] - children
+
+    node = max(_iter_plan(plan), key=own_cost)
+    hotspot = {
+        "node_type": node["Node Type"],
+        "relation": node.get("Relation Name"),
+        "estimated_rows": node["Plan Rows"],
+        "estimated_cost": round(own_cost(node), 2),
+    }
+    for key in ("Filter", "Join Filter", "Hash Cond", "Index Cond"):
+        if key in node:
+            hotspot["condition"] = node[key]
+            break
+
+    if node["Node Type"] == "Seq Scan" and "Filter" in node:
+        hotspot["hint"] = "filter on an unindexed column; filter by a key instead"
+    elif node["Node Type"] == "Nested Loop" and not (
+        "Join Filter" in node
+        or any("Index Cond" in child for child in node.get("Plans", ()))
+    ):
+        hotspot["hint"] = "join without a join condition (cartesian product)"
+    elif node["Node Type"] == "Seq Scan":
+        hotspot["hint"] = "full table scan; add a WHERE clause or LIMIT"
+    return hotspot
+
+
+async def _check_plan(session: AsyncSession, query: str) -> PlanVerdict:
+    """Run EXPLAIN for ``query`` and compare its estimates to the limits."""
+
+    raw = (await session.execute(text(f"EXPLAIN (FORMAT JSON) {query}"))).scalar()
+    plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+    total_cost = float(plan["Total Cost"])
+    plan_rows = int(plan["Plan Rows"])
+    allowed = not _settings.sql_fetch_explain_gate or (
+        total_cost <= _settings.sql_fetch_max_plan_cost
+        and plan_rows <= _settings.sql_fetch_max_plan_rows
+    )
+    relations = sorted(
+        {node["Relation Name"] for node in _iter_plan(plan) if "Relation Name" in node}
+    )
+    return PlanVerdict(
+        allowed=allowed,
+        total_cost=total_cost,
+        plan_rows=plan_rows,
+        hotspot=None if allowed else _hotspot(plan),
+        relations=tuple(relations),
+    )
+
+
+def _rejected(verdict: PlanVerdict) -> dict[str, Any]:
+    return {
+        "status": "error",
+        "error_type": "query_too_expensive",
+        "message": (
+            "Query rejected before execution: estimated cost "
+            f"{verdict.total_cost:.0f} "
+            f"(limit {_settings.sql_fetch_max_plan_cost:.0f}), "
+            f"estimated rows {verdict.plan_rows} "
+            f"(limit {_settings.sql_fetch_max_plan_rows}). Rewrite it with "
+            "selective filters on indexed columns and explicit join conditions."
+        ),
+        "plan": asdict(verdict),
+    }
+
+
+async def fetch(query: str) -> dict[str, Any]:
+    """Execute a read-only SQL query and return a bounded set of rows.
+
+    The query runs in a READ ONLY transaction with ``statement_timeout``,
+    ``lock_timeout`` and ``work_mem`` limits. Rows are streamed through a
+    server-side cursor and reading stops after ``sql_fetch_max_rows``, so
+    memory stays bounded whatever the query returns; ``truncated`` tells
+    the caller that more rows were available. With the EXPLAIN gate on,
+    queries whose estimated cost or row count exceed the limits are
+    rejected before they run. Responses are cached until a table they
+    read is written to, unless queries run on a read replica.
     """
 
-    stripped = query.strip().lower()
-    if not stripped.startswith("select"):
-        raise ValueError("Only SELECT statements are allowed in sql_fetch tool")
+    settings = get_settings()
+    stripped = query.strip().rstrip(";").strip()
+    if not stripped.lower().startswith(("select", "with")):
+        return {
+            "status": "error",
+            "error_type": "invalid_query",
+            "message": "Only SELECT statements are allowed in sql_fetch tool",
+        }
+
+    key = normalize_sql(stripped)
+    cached = _cached_response(key)
+    if cached is not None:
+        return cached
+
+    # The plan is needed to gate the query and to learn which tables a
+    # cached response depends on.
+    needs_plan = settings.sql_fetch_explain_gate or _result_cache_usable()
+    verdict = await _plan_cache.get(key) if needs_plan else None
+    if verdict is not None and not verdict.allowed:
+        return _rejected(verdict)
+    versions: tuple[int, ...] | None = None
+
+    max_rows = settings.sql_fetch_max_rows
+    rows: list[dict[str, Any]] = []
+    truncated = False
+
+    try:
+        async with get_session_factory("sql")() as session, session.begin():
+            await session.execute(text("SET TRANSACTION READ ONLY"))
+            await session.execute(
+                text(
+                    "SELECT set_config('statement_timeout', :statement_timeout, true), "
+                    "set_config('lock_timeout', :lock_timeout, true), "
+                    "set_config('work_mem', :work_mem, true)"
+                ),
+                {
+                    "statement_timeout": f"{settings.sql_fetch_statement_timeout_ms}ms",
+                    "lock_timeout": f"{settings.sql_fetch_lock_timeout_ms}ms",
+                    "work_mem": settings.sql_fetch_work_mem,
+                },
+            )
+            if needs_plan and verdict is None:
+                verdict = await _check_plan(session, stripped)
+                await _plan_cache.set(key, verdict)
+                if not verdict.allowed:
+                    return _rejected(verdict)
+
+            if (
+                verdict is not None
+                and verdict.relations
+                and set(verdict.relations) <= set(settings.sql_cache_tables)
+                and _result_cache_usable()
+            ):
+                # Taken before the query runs: a write racing with it bumps
+                # the versions and the stored entry is never served.
+                versions = table_versions.snapshot(verdict.relations)
 
-    async with _session_factory() as session:
-        result = await session.execute(text(query))
-        rows = result.fetchall()
+            result = await session.stream(
+                text(stripped),
+                execution_options={"yield_per": min(max_rows + 1, 500)},
+            )
+            async for row in result:
+                if len(rows) >= max_rows:
+                    truncated = True
+                    break
+                rows.append(dict(row._mapping))
+            await result.close()
+    except DBAPIError as exc:
+        sqlstate = _sqlstate(exc)
+        if sqlstate in _TIMEOUT_SQLSTATES:
+            return {
+                "status": "error",
+                "error_type": "timeout",
+                "message": (
+                    f"Query cancelled by {_TIMEOUT_SQLSTATES[sqlstate]}; "
+                    "add selective filters or a LIMIT and avoid cross joins."
+                ),
+            }
+        if sqlstate == _READ_ONLY_SQLSTATE:
+            return {
+                "status": "error",
+                "error_type": "invalid_query",
+                "message": "sql_fetch runs in a read-only transaction",
+            }
+        return {
+            "status": "error",
+            "error_type": "query_failed",
+            "message": str(exc.orig),
+        }
 
-    return [dict(row._mapping) for row in rows]
+    response = {
+        "status": "ok",
+        "rows": rows,
+        "row_count": len(rows),
+        "truncated": truncated,
+        "max_rows": max_rows,
+    }
+    if versions is not None:
+        assert verdict is not None
+        _result_cache.set(key, CachedResult(verdict.relations, versions, response))
+    return response
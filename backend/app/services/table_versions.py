@@ -0,0 +1,145 @@
+"""Per-table change versions driven by Postgres LISTEN/NOTIFY.
+
+Statement-level triggers (installed by ``python -m app.manage migrate``)
+``pg_notify`` the name of every watched table that is written to. A
+dedicated asyncpg connection listens on that channel and bumps an in-process
+version counter per table, which caches use to detect entries that depend on
+changed tables. Caches that are simply cleared on a write register an
+``on_change`` callback instead.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Callable, Iterable
+
+import asyncpg
+from sqlalchemy.engine import make_url
+
+from ..config import get_settings
+from .retry import backoff_delay
+
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "table_changes"
+
+_versions: dict[str, int] = {}
+# Bumped on every (re)connect: notifications may have been missed while
+# disconnected, so everything recorded before is treated as stale.
+_epoch = 0
+_live = False
+_task: asyncio.Task[None] | None = None
+_callbacks: dict[str, list[Callable[[], None]]] = {}
+_stats = {"notifications": 0, "reconnects": 0}
+
+
+def is_live() -> bool:
+    """Whether notifications are currently being received."""
+
+    return _live
+
+
+def snapshot(tables: Iterable[str]) -> tuple[int, ...]:
+    """Return the current versions of ``tables`` (in the given order)."""
+
+    return (_epoch, *(_versions.get(table, 0) for table in tables))
+
+
+def bump(table: str) -> None:
+    _versions[table] = _versions.get(table, 0) + 1
+    for callback in _callbacks.get(table, ()):
+        callback()
+
+
+def on_change(table: str, callback: Callable[[], None]) -> None:
+    """Call ``callback()`` whenever ``table`` is written to by any process.
+
+    Also called after every (re)connect, since changes may have been missed
+    while disconnected. The table must have a notify trigger (see
+    ``core/migrations.py``).
+    """
+
+    _callbacks.setdefault(table, []).append(callback)
+
+
+def get_stats() -> dict[str, Any]:
+    return {"live": _live, "epoch": _epoch, "versions": dict(_versions), **_stats}
+
+
+def _on_notification(
+    connection: Any, pid: int, channel: str, payload: str
+) -> None:
+    _stats["notifications"] += 1
+    bump(payload)
+
+
+def _listen_dsn() -> str:
+    # NOTIFY is not delivered on replicas, so always listen on the primary.
+    url = make_url(get_settings().database_url).set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
+
+
+async def _listen_loop() -> None:
+    global _epoch, _live
+    settings = get_settings()
+    attempt = 0
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(_listen_dsn())
+            await connection.add_listener(CHANNEL, _on_notification)
+            _epoch += 1
+            _live = True
+            for callbacks in _callbacks.values():
+                for callback in callbacks:
+                    callback()
+            attempt = 0
+            while True:
+                # A cheap round trip surfaces dead connections promptly.
+                await asyncio.sleep(settings.sql_cache_listener_ping_seconds)
+                await connection.execute("SELECT 1")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            if _live:
+                _stats["reconnects"] += 1
+            logger.warning("Table change listener disconnected", exc_info=True)
+        finally:
+            _live = False
+            if connection is not None:
+                try:
+                    await connection.close(timeout=5)
+                except Exception:
+                    connection.terminate()
+        await asyncio.sleep(backoff_delay(attempt, 0.5, 30.0))
+        attempt += 1
+
+
+def start_listener() -> None:
+    """Start listening for table changes (no-op if already running)."""
+
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(_listen_loop(), name="table-change-listener")
+
+
+async def stop_listener() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
+
+
+__all__ = [
+    "CHANNEL",
+    "bump",
+    "get_stats",
+    "is_live",
+    "on_change",
+    "snapshot",
+    "start_listener",
+    "stop_listener",
+]
@@ -1,13 +1,15 @@
 """Langfuse / telemetry helpers."""
 
-from functools import lru_cache
-from typing import Sequence
+from __future__ import annotations
 
-from langchain_core.callbacks import BaseCallbackHandler
-from langfuse.langchain import CallbackHandler
+from functools import lru_cache
+from typing import TYPE_CHECKING, Sequence
 
 from ..config import get_settings
 
+if TYPE_CHECKING:
+    from langchain_core.callbacks import BaseCallbackHandler
+
 
 @lru_cache(maxsize=1)
 def get_callback_handlers() -> Sequence[BaseCallbackHandler]:
@@ -23,6 +25,9 @@ def get_callback_handlers() -> Sequence[BaseCallbackHandler]:
 
     # Langfuse v3 integration: CallbackHandler reads LANGFUSE_PUBLIC_KEY,
     # LANGFUSE_SECRET_KEY, and LANGFUSE_BASE_URL from the environment via the
-    # Langfuse client. We only instantiate it if credentials are configured.
+    # Langfuse client. We only import and instantiate it if credentials are
+    # configured.
+    from langfuse.langchain import CallbackHandler
+
     handler: BaseCallbackHandler = CallbackHandler()
     return (handler,)
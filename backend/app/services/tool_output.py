@@ -0,0 +1,137 @@
+"""Compact encodings for tabular tool outputs.
+
+Tool results are serialized into messages the model re-reads on every later
+turn, so lists of row dicts (which repeat each column name per row) are
+re-encoded once in a compact form:
+
+- ``records``: the original list of dicts, with typed values.
+- ``columnar``: ``columns`` once plus ``rows`` as lists of values.
+- ``csv``: a CSV string with a header line.
+- ``markdown``: a pipe table.
+
+Values are serialized by type: datetimes as ISO-8601, Decimals as exact
+strings, UUIDs as strings and bytes as a size placeholder.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import uuid
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Literal, Mapping, Sequence
+
+
+OutputFormat = Literal["records", "columnar", "csv", "markdown"]
+OUTPUT_FORMATS: tuple[str, ...] = ("records", "columnar", "csv", "markdown")
+
+
+def encode_value(value: Any) -> Any:
+    """Return a JSON-safe representation of a single cell value."""
+
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        # Exact text rather than a lossy float.
+        return format(value, "f")
+    if isinstance(value, timedelta):
+        return f"{value.total_seconds():g}s"
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<{len(value)} bytes>"
+    if isinstance(value, Mapping):
+        return {str(key): encode_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [encode_value(item) for item in value]
+    return str(value)
+
+
+def _columns(records: Sequence[Mapping[str, Any]]) -> list[str]:
+    columns: dict[str, None] = {}
+    for record in records:
+        columns.update(dict.fromkeys(record))
+    return list(columns)
+
+
+def _text_cell(value: Any) -> str:
+    value = encode_value(value)
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def _markdown_cell(value: Any) -> str:
+    return " ".join(_text_cell(value).split()).replace("|", "\\|")
+
+
+def encode_records(
+    records: Sequence[Mapping[str, Any]],
+    output_format: str = "columnar",
+    *,
+    key: str = "rows",
+) -> dict[str, Any]:
+    """Encode row dicts as the fields to merge into a tool response.
+
+    The rows are returned under ``key``; ``columnar`` additionally returns
+    ``columns``. Every encoding includes ``format`` so the reader knows how
+    to interpret ``key``.
+    """
+
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(
+            f"Unknown tool output format {output_format!r}; "
+            f"expected one of {', '.join(OUTPUT_FORMATS)}"
+        )
+
+    if output_format == "records":
+        return {
+            "format": output_format,
+            key: [
+                {column: encode_value(value) for column, value in record.items()}
+                for record in records
+            ],
+        }
+
+    columns = _columns(records)
+    if output_format == "columnar":
+        return {
+            "format": output_format,
+            "columns": columns,
+            key: [
+                [encode_value(record.get(column)) for column in columns]
+                for record in records
+            ],
+        }
+
+    if not columns:
+        return {"format": output_format, key: ""}
+
+    if output_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(columns)
+        for record in records:
+            writer.writerow([_text_cell(record.get(column)) for column in columns])
+        return {"format": output_format, key: buffer.getvalue()}
+
+    lines = [
+        "| " + " | ".join(_markdown_cell(column) for column in columns) + " |",
+        "|" + "---|" * len(columns),
+    ]
+    lines.extend(
+        "| "
+        + " | ".join(_markdown_cell(record.get(column)) for column in columns)
+        + " |"
+        for record in records
+    )
+    return {"format": output_format, key: "\n".join(lines)}
+
+
+__all__ = ["OUTPUT_FORMATS", "OutputFormat", "encode_records", "encode_value"]
@@ -1,55 +1,274 @@
 """LangChain tool registry for the Optimus Agent backend."""
 
+from datetime import datetime
 from functools import lru_cache
-from typing import Any, Sequence
+from typing import Any, Literal, Sequence
 
 from langchain.tools import BaseTool, tool
 
+from ..config import get_settings
+
 from . import (
     calculator_service,
+    context_packing,
     email_service,
     http_service,
     rag_service,
     search_service,
     sql_service,
+    tool_output,
 )
 
 
+# Encoding of tabular tool results (see services/tool_output.py). Overridden
+# per tool by Settings.tool_output_formats.
+_OUTPUT_FORMATS: dict[str, str] = {
+    "sql_fetch": "columnar",
+    "rag_lookup": "columnar",
+    "rag_lookup_many": "columnar",
+}
+
+
+def _encode(tool_name: str, response: dict[str, Any], key: str) -> dict[str, Any]:
+    """Re-encode the row dicts under ``key`` in the tool's output format."""
+
+    output_format = get_settings().tool_output_formats.get(
+        tool_name, _OUTPUT_FORMATS.get(tool_name, "records")
+    )
+    encoded = tool_output.encode_records(response[key], output_format, key=key)
+    return {**{k: v for k, v in response.items() if k != key}, **encoded}
+
+
 @tool("search", return_direct=False)
-async def search_tool(query: str) -> list[dict[str, Any]]:
-    """Search internal and external information sources for a query."""
+async def search_tool(query: str) -> dict[str, Any]:
+    """Search internal and external information sources for a query.
+
+    Queries the document store, the internal wiki and web search at once.
+    Returns {"status", "results", "partial", "backends"}: results carry
+    title, snippet, the sources that found them and either a url (wiki,
+    web) or a document_id (knowledge base documents, for rag_lookup);
+    "partial" is true when a source timed out or failed.
+    """
 
     return await search_service.search(query)
 
 
+def _calculator_error(exc: ValueError) -> dict[str, Any]:
+    return {
+        "status": "error",
+        "error_type": (
+            "budget_exceeded"
+            if isinstance(exc, calculator_service.BudgetExceededError)
+            else "invalid_expression"
+        ),
+        "message": str(exc),
+    }
+
+
 @tool("calculator")
-def calculator_tool(expression: str) -> float:
-    """Safely evaluate a basic arithmetic expression."""
+def calculator_tool(
+    expression: str, variables: dict[str, float] | None = None
+) -> float | dict[str, Any]:
+    """Safely evaluate a math expression.
+
+    Supports + - * / // % **, the functions abs, sqrt, exp, log(x[, base]),
+    log10, log2, trig functions, floor, ceil, trunc, round(x[, digits]),
+    min, max, hypot and factorial, the constants pi, e and tau, and named
+    variables whose values are passed in ``variables``.
+    """
+
+    try:
+        return calculator_service.evaluate(expression, variables)
+    except ValueError as exc:
+        return _calculator_error(exc)
+
+
+@tool("calculator_batch")
+def calculator_batch_tool(
+    expression: str, variables: dict[str, list[float] | float]
+) -> dict[str, Any]:
+    """Evaluate one math expression for many inputs in a single call.
+
+    Use it to compute a value per row, e.g. a fee for every order:
+    expression="total * rate + 0.3" with variables={"total": [...], "rate":
+    0.03}. Each variable is a list (one value per row, all lists the same
+    length) or one number used for every row. Returns "results" in row
+    order; rows that failed (e.g. division by zero) are null.
+    """
+
+    try:
+        results = calculator_service.evaluate_batch(expression, variables)
+    except ValueError as exc:
+        return _calculator_error(exc)
+    return {
+        "status": "ok",
+        "results": results,
+        "row_count": len(results),
+        "failed_rows": sum(value is None for value in results),
+    }
+
+
+def _invalid_arguments(exc: ValueError) -> dict[str, Any]:
+    # Bad filter values (dates, collection names, modes) are the model's to
+    # fix, so they come back as a tool result rather than an exception.
+    return {
+        "status": "error",
+        "error_type": "invalid_arguments",
+        "message": str(exc),
+    }
 
-    return calculator_service.evaluate(expression)
+
+def _rag_filters(
+    collection: str | None,
+    content_type: str | None,
+    created_after: str | None,
+    created_before: str | None,
+    metadata: dict[str, Any] | None,
+) -> rag_service.SearchFilters:
+    return rag_service.SearchFilters(
+        collection=collection,
+        content_type=content_type,
+        created_after=datetime.fromisoformat(created_after) if created_after else None,
+        created_before=(
+            datetime.fromisoformat(created_before) if created_before else None
+        ),
+        metadata=metadata,
+    )
 
 
 @tool("rag_lookup")
-async def rag_lookup_tool(query: str, top_k: int = 5) -> list[dict[str, Any]]:
-    """Look up relevant document chunks using the retrieval pipeline."""
+async def rag_lookup_tool(
+    query: str,
+    top_k: int = 5,
+    mode: Literal["vector", "lexical", "hybrid"] | None = None,
+    vector_weight: float = 1.0,
+    lexical_weight: float = 1.0,
+    collection: str | None = None,
+    content_type: str | None = None,
+    created_after: str | None = None,
+    created_before: str | None = None,
+    metadata: dict[str, Any] | None = None,
+    ef_search: int | None = None,
+) -> dict[str, Any]:
+    """Look up relevant document passages using the retrieval pipeline.
+
+    Use mode="lexical" for exact identifiers (SKUs, tracking IDs, policy
+    numbers), "vector" for paraphrased questions, or "hybrid" (default) to
+    combine both; the weights bias hybrid ranking toward either side.
+    Optionally restrict results to a collection, a content type, an ISO-8601
+    upload date range, or documents whose metadata contains the given keys.
+    Raise ef_search (e.g. 100-200) when recall matters more than latency.
+    Returns merged, de-duplicated passages packed into a token budget.
+    """
 
     # The RAG service expects a DB session; here we use a short-lived one.
     from sqlalchemy.ext.asyncio import AsyncSession
 
     from ..core.db import get_async_session
 
-    async for session in get_async_session():  # type: ignore[assignment]
+    try:
+        filters = _rag_filters(
+            collection, content_type, created_after, created_before, metadata
+        )
+    except ValueError as exc:
+        return _invalid_arguments(exc)
+
+    async for session in get_async_session("rag"):  # type: ignore[assignment]
         assert isinstance(session, AsyncSession)
-        return await rag_service.query(session, query, top_k=top_k)
+        try:
+            rows = await rag_service.query(
+                session,
+                query,
+                top_k=top_k,
+                mode=mode,
+                vector_weight=vector_weight,
+                lexical_weight=lexical_weight,
+                filters=filters,
+                ef_search=ef_search,
+            )
+        except ValueError as exc:
+            return _invalid_arguments(exc)
+        packed = context_packing.pack_context(rows).as_dict()
+        return _encode("rag_lookup", packed, "passages")
+
+    return _encode("rag_lookup", context_packing.pack_context([]).as_dict(), "passages")
+
+
+@tool("rag_lookup_many")
+async def rag_lookup_many_tool(
+    queries: list[str],
+    top_k: int = 5,
+    mode: Literal["vector", "lexical", "hybrid"] | None = None,
+    collection: str | None = None,
+    content_type: str | None = None,
+    created_after: str | None = None,
+    created_before: str | None = None,
+    metadata: dict[str, Any] | None = None,
+) -> list[dict[str, Any]] | dict[str, Any]:
+    """Run several knowledge base lookups in one call.
+
+    Prefer this over repeated rag_lookup calls when a request needs several
+    independent facts: all queries are embedded and searched together.
+    Returns one {"query", "passages", ...} entry per query, in order, each
+    packed into an equal share of the context token budget.
+    """
+
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    from ..core.db import get_async_session
+
+    try:
+        filters = _rag_filters(
+            collection, content_type, created_after, created_before, metadata
+        )
+    except ValueError as exc:
+        return _invalid_arguments(exc)
+
+    async for session in get_async_session("rag"):  # type: ignore[assignment]
+        assert isinstance(session, AsyncSession)
+        try:
+            results = await rag_service.query_many(
+                session, queries, top_k=top_k, mode=mode, filters=filters
+            )
+        except ValueError as exc:
+            return _invalid_arguments(exc)
+        budget = get_settings().rag_context_token_budget // max(1, len(queries))
+        return [
+            {
+                "query": query,
+                **_encode(
+                    "rag_lookup_many",
+                    context_packing.pack_context(rows, token_budget=budget).as_dict(),
+                    "passages",
+                ),
+            }
+            for query, rows in zip(queries, results)
+        ]
 
     return []
 
 
 @tool("send_mail")
-async def send_mail_tool(to: str, subject: str, body: str) -> dict[str, Any]:
-    """Send an email and return a confirmation payload."""
+async def send_mail_tool(
+    to: str, subject: str, body: str, idempotency_key: str | None = None
+) -> dict[str, Any]:
+    """Queue an email for delivery and return its message id.
 
-    return await email_service.send(to=to, subject=subject, body=body)
+    The email is sent in the background; "status" is "queued". Calling
+    again with the same message (or idempotency_key) does not send it
+    twice, so retrying after an error is safe.
+    """
+
+    try:
+        return await email_service.send(
+            to=to, subject=subject, body=body, idempotency_key=idempotency_key
+        )
+    except ValueError as exc:
+        return {
+            "status": "error",
+            "error_type": "invalid_recipient",
+            "message": str(exc),
+        }
 
 
 @tool("http_request")
@@ -62,10 +281,20 @@ async def http_request_tool(
 
 
 @tool("sql_fetch")
-async def sql_fetch_tool(query: str) -> list[dict[str, Any]]:
-    """Execute a read-only SQL query and return rows as dictionaries."""
+async def sql_fetch_tool(query: str) -> dict[str, Any]:
+    """Execute a read-only SQL query and return the result rows compactly.
+
+    Returns {"status", "format", "columns", "rows", "row_count",
+    "truncated"}: "columns" lists the column names once and each row is a
+    list of values in that order (not a dictionary). "format" names the
+    encoding in case it was configured differently. Results are capped;
+    when "truncated" is true, narrow the query with filters or aggregates.
+    """
 
-    return await sql_service.fetch(query)
+    response = await sql_service.fetch(query)
+    if response.get("status") != "ok":
+        return response
+    return _encode("sql_fetch", response, "rows")
 
 
 @lru_cache(maxsize=1)
@@ -75,7 +304,9 @@ def get_tools() -> Sequence[BaseTool]:
     return (
         search_tool,
         calculator_tool,
+        calculator_batch_tool,
         rag_lookup_tool,
+        rag_lookup_many_tool,
         send_mail_tool,
         http_request_tool,
         sql_fetch_tool,
@@ -0,0 +1,96 @@
+"""Calculator throughput: single evaluations versus batch evaluation.
+
+Computes an order fee formula for ``--rows`` orders three ways: one
+``evaluate`` call per order (as an agent calling ``calculator`` per row
+would), ``evaluate_batch`` vectorized with NumPy, and ``evaluate_batch``
+with its pure-Python fallback. Also reports the cost of compiling an
+expression against a cache hit::
+
+    python -m benchmarks.calculator --rows 10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import Any, Callable
+from unittest import mock
+
+from app.services import calculator_service
+
+
+FEE = "max(min_fee, round(total * rate + fixed, 2)) + sqrt(weight) * per_kg"
+
+
+def timed(label: str, count: int, run: Callable[[], Any]) -> float:
+    started = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - started
+    print(
+        f"{label:>28} {elapsed * 1000:>10.2f} ms {count / elapsed:>14,.0f} evals/s"
+    )
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    totals = [round(rng.uniform(5, 5_000), 2) for _ in range(args.rows)]
+    weights = [round(rng.uniform(0.1, 40), 2) for _ in range(args.rows)]
+    shared = {"rate": 0.029, "fixed": 0.3, "min_fee": 1.0, "per_kg": 0.15}
+    columns = {"total": totals, "weight": weights, **shared}
+
+    print(f"expression: {FEE}")
+    print(f"{'mode':>28} {'time':>13} {'throughput':>23}")
+
+    calculator_service.compile_expression.cache_clear()
+    compiles = 2_000
+    timed(
+        "compile (cache miss)",
+        compiles,
+        lambda: [
+            calculator_service.compile_expression(f"{FEE} + {index}")
+            for index in range(compiles)
+        ],
+    )
+    timed(
+        "compile (cache hit)",
+        compiles,
+        lambda: [calculator_service.compile_expression(FEE) for _ in range(compiles)],
+    )
+
+    single = timed(
+        "evaluate() per row",
+        args.rows,
+        lambda: [
+            calculator_service.evaluate(
+                FEE, {"total": total, "weight": weight, **shared}
+            )
+            for total, weight in zip(totals, weights)
+        ],
+    )
+    with mock.patch.object(calculator_service, "_numpy", return_value=None):
+        python = timed(
+            "evaluate_batch() pure Python",
+            args.rows,
+            lambda: calculator_service.evaluate_batch(FEE, columns),
+        )
+    if calculator_service._numpy() is None:
+        print(f"{'evaluate_batch() NumPy':>28} {'skipped (numpy not installed)':>39}")
+        batch = python
+    else:
+        batch = timed(
+            "evaluate_batch() NumPy",
+            args.rows,
+            lambda: calculator_service.evaluate_batch(FEE, columns),
+        )
+    print(f"\nbatch speedup over per-row evaluate(): {single / batch:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Seam merging of adjacent chunks: correctness check and overlap savings.
+
+Splits generated documents of short random words with the ingestion
+splitter, merges every run of consecutive chunks back into one passage and
+verifies the merge never invents a word that is not in the source (a seam
+spliced on a coincidental shared suffix, e.g. ``"eifddd" + "dgfeahic"`` ->
+``"eifdddgfeahic"``). Also runs fixed regression cases and reports how many
+seams were recognised as splitter overlap. Exits with status 1 on failure::
+
+    python -m benchmarks.context_packing --documents 200 --chunk-size 120
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import sys
+
+from app.services.context_packing import _merge_overlap, merge_adjacent
+from app.services.ingestion import split_text
+
+
+# (left, right, expected) -- chunks that share no whole word must not be
+# spliced together, however many trailing characters they share.
+REGRESSION_CASES = (
+    ("of the", "end of the month", "of the\nend of the month"),
+    ("abc eifddd", "dgfeahic xyz", "abc eifddd\ndgfeahic xyz"),
+    (
+        "xx thequick brown fox",
+        "quick brown fox jumps",
+        "xx thequick brown fox\nquick brown fox jumps",
+    ),
+    (
+        "the quick brown fox jumps",
+        "brown fox jumps over",
+        "the quick brown fox jumps over",
+    ),
+)
+
+_WORD = re.compile(r"\S+")
+
+
+def _document(rng: random.Random, words: int) -> str:
+    # Few letters and short words make coincidental shared suffixes common.
+    return " ".join(
+        "".join(rng.choice("abcdefghi") for _ in range(rng.randint(2, 8)))
+        for _ in range(words)
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--words", type=int, default=400)
+    parser.add_argument("--chunk-size", type=int, default=120)
+    parser.add_argument("--chunk-overlap", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    failures: list[str] = []
+    for left, right, expected in REGRESSION_CASES:
+        merged = _merge_overlap(left, right, args.chunk_overlap)
+        if merged != expected:
+            failures.append(f"{left!r} + {right!r} -> {merged!r}, want {expected!r}")
+
+    rng = random.Random(args.seed)
+    seams = deduped = corrupted = 0
+    for document_id in range(args.documents):
+        text = _document(rng, args.words)
+        chunks = split_text(text, args.chunk_size, args.chunk_overlap)
+        rows = [
+            {
+                "document_id": document_id,
+                "chunk_index": index,
+                "score": 1.0,
+                "content": chunk,
+            }
+            for index, chunk in enumerate(chunks)
+        ]
+        (passage,) = merge_adjacent(rows, args.chunk_overlap)
+        seams += len(chunks) - 1
+        deduped += len(chunks) - 1 - passage.text.count("\n")
+        vocabulary = set(_WORD.findall(text))
+        invented = [
+            word for word in _WORD.findall(passage.text) if word not in vocabulary
+        ]
+        if invented:
+            corrupted += 1
+            if len(failures) < 5:
+                failures.append(f"document {document_id}: invented {invented[:3]}")
+
+    print(f"regression cases: {len(REGRESSION_CASES)}")
+    print(
+        f"documents: {args.documents}, seams: {seams}, "
+        f"overlap removed: {deduped / seams if seams else 0:.1%}, "
+        f"corrupted documents: {corrupted}"
+    )
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
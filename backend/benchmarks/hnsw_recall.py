@@ -0,0 +1,257 @@
+"""HNSW recall/latency benchmark across ``hnsw.ef_search`` values.
+
+Loads a synthetic clustered corpus into a scratch table, builds an HNSW index
+with the configured metric and build parameters, and reports recall@k against
+exact (brute-force) search plus p50/p99 query latency for each ef_search::
+
+    python -m benchmarks.hnsw_recall --rows 1000000 --dim 128 \\
+        --ef-search 10 20 40 80 160 320
+
+Ground truth is computed in NumPy by regenerating the corpus chunk by chunk,
+so memory stays bounded even for millions of vectors.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from typing import Iterator
+
+import asyncpg
+import numpy as np
+from pgvector.asyncpg import register_vector
+
+from app.config import get_settings
+from app.core.vector_store import DISTANCE_METRICS, DistanceMetric
+
+
+TABLE = "bench_hnsw_vectors"
+CHUNK_ROWS = 50_000
+
+
+def default_dsn() -> str:
+    return get_settings().database_url.replace("postgresql+asyncpg", "postgresql")
+
+
+def _dimension_scale(dim: int, decay: float) -> np.ndarray:
+    """Per-dimension scale for synthetic vectors.
+
+    ``decay > 0`` front-loads variance like Matryoshka embeddings, where the
+    leading dimensions carry most of the signal.
+    """
+
+    if decay <= 0:
+        return np.ones(dim, dtype=np.float32)
+    return ((1 + np.arange(dim) / decay) ** -0.5).astype(np.float32)
+
+
+def _centers(seed: int, clusters: int, dim: int) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(clusters, dim)).astype(np.float32)
+
+
+def _sample(
+    rng: np.random.Generator,
+    centers: np.ndarray,
+    n: int,
+    metric: DistanceMetric,
+    decay: float = 0.0,
+) -> np.ndarray:
+    labels = rng.integers(0, len(centers), size=n)
+    noise = rng.normal(scale=0.35, size=(n, centers.shape[1])).astype(np.float32)
+    vectors = (centers[labels] + noise) * _dimension_scale(centers.shape[1], decay)
+    if metric.name != "l2":
+        # Embedding models emit unit vectors; cosine and inner product agree.
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def corpus_chunks(
+    args: argparse.Namespace, metric: DistanceMetric
+) -> Iterator[tuple[int, np.ndarray]]:
+    """Yield ``(first_id, vectors)`` chunks; deterministic for a given seed."""
+
+    centers = _centers(args.seed, args.clusters, args.dim)
+    for start in range(0, args.rows, CHUNK_ROWS):
+        rng = np.random.default_rng([args.seed, start])
+        n = min(CHUNK_ROWS, args.rows - start)
+        yield start, _sample(rng, centers, n, metric, args.decay)
+
+
+def query_vectors(args: argparse.Namespace, metric: DistanceMetric) -> np.ndarray:
+    centers = _centers(args.seed, args.clusters, args.dim)
+    rng = np.random.default_rng([args.seed, -1])
+    return _sample(rng, centers, args.queries, metric, args.decay)
+
+
+def _distances(
+    queries: np.ndarray, chunk: np.ndarray, metric: DistanceMetric
+) -> np.ndarray:
+    if metric.name == "l2":
+        return (
+            (queries**2).sum(axis=1)[:, None]
+            - 2 * queries @ chunk.T
+            + (chunk**2).sum(axis=1)[None, :]
+        )
+    # Unit vectors: cosine distance and negative inner product rank identically.
+    return -(queries @ chunk.T)
+
+
+def exact_neighbours(
+    args: argparse.Namespace, metric: DistanceMetric, queries: np.ndarray
+) -> np.ndarray:
+    """Return the exact top-k ids per query, streaming over the corpus."""
+
+    best_ids = np.empty((len(queries), 0), dtype=np.int64)
+    best_dist = np.empty((len(queries), 0), dtype=np.float32)
+    for start, chunk in corpus_chunks(args, metric):
+        chunk_ids = np.broadcast_to(
+            np.arange(start, start + len(chunk)), (len(queries), len(chunk))
+        )
+        dist = np.concatenate(
+            [best_dist, _distances(queries, chunk, metric)], axis=1
+        )
+        ids = np.concatenate([best_ids, chunk_ids], axis=1)
+        keep = np.argpartition(dist, args.k - 1, axis=1)[:, : args.k]
+        best_dist = np.take_along_axis(dist, keep, axis=1)
+        best_ids = np.take_along_axis(ids, keep, axis=1)
+    return best_ids
+
+
+async def load_corpus(
+    conn: asyncpg.Connection, args: argparse.Namespace, metric: DistanceMetric
+) -> None:
+    await conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    await conn.execute(
+        f"CREATE UNLOGGED TABLE {TABLE} "
+        f"(id bigint PRIMARY KEY, embedding vector({args.dim}))"
+    )
+    started = time.perf_counter()
+    for start, chunk in corpus_chunks(args, metric):
+        await conn.copy_records_to_table(
+            TABLE,
+            records=((start + i, vector) for i, vector in enumerate(chunk)),
+            columns=["id", "embedding"],
+        )
+    elapsed = time.perf_counter() - started
+    print(f"loaded {args.rows:,} x {args.dim} vectors in {elapsed:.1f}s")
+
+
+async def build_index(
+    conn: asyncpg.Connection, args: argparse.Namespace, metric: DistanceMetric
+) -> None:
+    await conn.execute(f"SET maintenance_work_mem = '{args.maintenance_work_mem}'")
+    started = time.perf_counter()
+    await conn.execute(
+        f"CREATE INDEX ON {TABLE} USING hnsw (embedding {metric.opclass}) "
+        f"WITH (m = {args.m}, ef_construction = {args.ef_construction})"
+    )
+    size = await conn.fetchval(
+        f"SELECT pg_size_pretty(pg_indexes_size('{TABLE}'::regclass))"
+    )
+    print(
+        f"built hnsw ({metric.opclass}, m={args.m}, "
+        f"ef_construction={args.ef_construction}) in "
+        f"{time.perf_counter() - started:.1f}s, index size {size}"
+    )
+
+
+async def measure(
+    conn: asyncpg.Connection,
+    sql: str,
+    queries: np.ndarray,
+    truth: np.ndarray,
+    k: int,
+) -> tuple[float, float, float]:
+    """Return (recall@k, p50 ms, p99 ms) for ``sql`` over all queries."""
+
+    statement = await conn.prepare(sql)
+    for query in queries[:10]:
+        await statement.fetch(query, k)  # warm caches
+
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        rows = await statement.fetch(query, k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits += len({row["id"] for row in rows} & set(expected.tolist()))
+    p50, p99 = np.percentile(latencies, [50, 99])
+    return hits / (len(queries) * k), float(p50), float(p99)
+
+
+async def run(args: argparse.Namespace) -> None:
+    metric = DISTANCE_METRICS[args.metric]
+    conn = await asyncpg.connect(args.dsn)
+    try:
+        await conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        await register_vector(conn)
+        if not args.reuse:
+            await load_corpus(conn, args, metric)
+            await build_index(conn, args, metric)
+
+        queries = query_vectors(args, metric)
+        started = time.perf_counter()
+        truth = exact_neighbours(args, metric, queries)
+        elapsed = time.perf_counter() - started
+        print(f"exact neighbours for {len(queries)} queries in {elapsed:.1f}s")
+
+        sql = (
+            f"SELECT id FROM {TABLE} "
+            f"ORDER BY embedding {metric.operator} $1 LIMIT $2"
+        )
+        recall_header = f"recall@{args.k}"
+        print(f"\n{'ef_search':>10} {recall_header:>10} {'p50 ms':>9} {'p99 ms':>9}")
+        for ef_search in args.ef_search:
+            await conn.execute(f"SET hnsw.ef_search = {int(ef_search)}")
+            recall, p50, p99 = await measure(conn, sql, queries, truth, args.k)
+            print(f"{ef_search:>10} {recall:>10.4f} {p50:>9.2f} {p99:>9.2f}")
+
+        # Exact search in Postgres for a latency baseline (sequential scan).
+        await conn.execute("SET enable_indexscan = off")
+        sample = slice(0, min(20, len(queries)))
+        recall, p50, p99 = await measure(
+            conn, sql, queries[sample], truth[sample], args.k
+        )
+        print(f"{'exact':>10} {recall:>10.4f} {p50:>9.2f} {p99:>9.2f}")
+        await conn.execute("RESET enable_indexscan")
+
+        if not args.keep:
+            await conn.execute(f"DROP TABLE {TABLE}")
+    finally:
+        await conn.close()
+
+
+def main() -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", default=default_dsn())
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--clusters", type=int, default=1_000)
+    parser.add_argument("--decay", type=float, default=0.0)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument(
+        "--metric",
+        choices=sorted(DISTANCE_METRICS),
+        default=settings.rag_distance_metric,
+    )
+    parser.add_argument("--m", type=int, default=settings.rag_hnsw_m)
+    parser.add_argument(
+        "--ef-construction", type=int, default=settings.rag_hnsw_ef_construction
+    )
+    parser.add_argument(
+        "--ef-search", type=int, nargs="+", default=[10, 20, 40, 80, 160, 320]
+    )
+    parser.add_argument("--maintenance-work-mem", default="2GB")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--reuse", action="store_true", help="skip loading; reuse the existing table"
+    )
+    parser.add_argument("--keep", action="store_true", help="keep the table afterwards")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Event-loop lag while a large PDF is extracted and split.
+
+Generates a ``--pages`` page PDF with PyMuPDF, then runs
+``ingestion.extract_pdf_text`` and ``split_into_chunks`` on it while a probe
+task sleeps ``--interval-ms`` in a loop and records how late each wake-up
+is. Any CPU work that sneaks back onto the event loop shows up as lag, which
+every concurrent request would pay too. ``--baseline`` also runs the same
+work inline on the loop for comparison. Exits with status 1 when the worst
+lag exceeds ``--max-lag-ms``::
+
+    python -m benchmarks.ingest_latency --pages 500 --pool-size 4 --max-lag-ms 50
+    python -m benchmarks.ingest_latency --pool-size 0  # thread fallback
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+
+_LINE = (
+    "Returns must be initiated within thirty days of delivery; items must "
+    "include all accessories and the original packaging. "
+)
+
+
+def _configure(args: argparse.Namespace) -> None:
+    # Settings are cached on first use, so override them before app imports.
+    os.environ["INGEST_PROCESS_POOL_SIZE"] = str(args.pool_size)
+    if args.pages_per_job:
+        os.environ["INGEST_PDF_PAGES_PER_JOB"] = str(args.pages_per_job)
+
+
+def build_pdf(pages: int) -> bytes:
+    import fitz  # PyMuPDF
+
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        body = f"Page {number + 1}\n" + "\n".join(
+            f"{line}. {_LINE}" for line in range(45)
+        )
+        page.insert_textbox(page.rect + (36, 36, -36, -36), body, fontsize=7)
+    try:
+        return doc.tobytes()
+    finally:
+        doc.close()
+
+
+async def _probe(interval: float, lags: list[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def _measure(work, interval: float) -> tuple[float, list[float]]:
+    lags: list[float] = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe(interval, lags, stop))
+    await asyncio.sleep(interval)  # let the probe take its first sample
+    started = time.perf_counter()
+    try:
+        await work()
+    finally:
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe
+    return elapsed, lags
+
+
+def _report(label: str, elapsed: float, lags: list[float]) -> float:
+    ordered = sorted(lags) or [0.0]
+    worst = ordered[-1]
+    print(
+        f"{label:>10} {elapsed:>8.2f} {len(lags):>8} "
+        f"{statistics.median(ordered) * 1000:>8.1f} "
+        f"{ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000:>8.1f} "
+        f"{worst * 1000:>8.1f}"
+    )
+    return worst
+
+
+async def run(args: argparse.Namespace) -> float:
+    from app.config import get_settings
+    from app.services import ingestion
+
+    settings = get_settings()
+    raw = build_pdf(args.pages)
+    print(
+        f"{args.pages}-page PDF, {len(raw) / 1e6:.1f} MB, "
+        f"pool size {args.pool_size}\n"
+    )
+    print(
+        f"{'mode':>10} {'seconds':>8} {'samples':>8} {'p50 ms':>8} "
+        f"{'p99 ms':>8} {'max ms':>8}"
+    )
+    interval = args.interval_ms / 1000
+
+    async def offloaded() -> None:
+        text_content = await ingestion.extract_pdf_text(raw)
+        await ingestion.split_into_chunks(text_content)
+
+    # Warm the pool so worker start-up is not counted as extraction.
+    await ingestion.run_cpu_bound(ingestion.pdf_page_count, raw)
+    elapsed, lags = await _measure(offloaded, interval)
+    worst = _report("offloaded", elapsed, lags)
+
+    if args.baseline:
+
+        async def inline() -> None:
+            count = ingestion.pdf_page_count(raw)
+            text_content = ingestion.extract_pdf_pages(raw, 0, count)
+            ingestion.split_text(
+                text_content, settings.rag_chunk_size, settings.rag_chunk_overlap
+            )
+
+        _report("inline", *await _measure(inline, interval))
+
+    ingestion.shutdown_process_pool()
+    return worst
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--pages-per-job", type=int, default=0)
+    parser.add_argument("--interval-ms", type=float, default=5.0)
+    parser.add_argument("--max-lag-ms", type=float, default=50.0)
+    parser.add_argument("--baseline", action="store_true")
+    args = parser.parse_args()
+
+    _configure(args)
+    worst = asyncio.run(run(args))
+    if worst * 1000 > args.max_lag_ms:
+        print(
+            f"\nREGRESSION: event loop lagged {worst * 1000:.1f} ms "
+            f"> {args.max_lag_ms:.1f} ms during ingestion"
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Batched vs sequential RAG search benchmark.
+
+Runs the same N queries through ``rag_service.query`` one at a time and
+through a single ``rag_service.query_many`` call against the configured
+database and embedding backend, reporting wall time, per-query latency and
+embedding calls for each::
+
+    python -m benchmarks.rag_batch --queries 32 --rounds 5 --mode hybrid
+
+Query texts are sampled from indexed chunks, so index some documents first.
+The RAG caches are disabled for the run so every round does the full work;
+pass ``--backend hashing`` to take the embedding provider out of the picture
+and measure database round trips only.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+
+def _configure(args: argparse.Namespace) -> None:
+    # Settings are cached on first use, so override them before app imports.
+    os.environ["RAG_RESULT_CACHE_BYTES"] = "0"
+    os.environ["RAG_QUERY_EMBEDDING_CACHE_BYTES"] = "0"
+    if args.backend:
+        os.environ["EMBEDDING_BACKEND"] = args.backend
+
+
+async def run(args: argparse.Namespace) -> None:
+    from sqlalchemy import Integer, bindparam, text
+
+    from app.core.db import _session_factory
+    from app.services import rag_service
+    from app.services.embeddings import get_embedding_stats
+
+    async with _session_factory() as session:
+        contents = (
+            await session.execute(
+                text(
+                    "SELECT content FROM document_chunks ORDER BY random() LIMIT :n"
+                ).bindparams(bindparam("n", type_=Integer)),
+                {"n": args.queries},
+            )
+        ).scalars().all()
+    if not contents:
+        raise SystemExit("No indexed chunks; upload documents first")
+    queries = [" ".join(content.split()[: args.words]) for content in contents]
+
+    async def sequential() -> None:
+        async with _session_factory() as session:
+            for query_text in queries:
+                await rag_service.query(
+                    session, query_text, args.top_k, mode=args.mode
+                )
+
+    async def batched() -> None:
+        async with _session_factory() as session:
+            await rag_service.query_many(session, queries, args.top_k, mode=args.mode)
+
+    print(
+        f"{len(queries)} queries, top_k={args.top_k}, mode={args.mode}, "
+        f"{args.rounds} rounds\n"
+    )
+    print(f"{'strategy':>10} {'total ms':>10} {'per query':>10} {'embed calls':>12}")
+    timings: dict[str, float] = {}
+    for name, func in (("sequential", sequential), ("batched", batched)):
+        await func()  # warm up connections and models
+        calls_before = get_embedding_stats()["query"]["batches"]
+        samples = []
+        for _ in range(args.rounds):
+            started = time.perf_counter()
+            await func()
+            samples.append((time.perf_counter() - started) * 1000)
+        calls = (get_embedding_stats()["query"]["batches"] - calls_before) / args.rounds
+        timings[name] = statistics.median(samples)
+        print(
+            f"{name:>10} {timings[name]:>10.1f} "
+            f"{timings[name] / len(queries):>10.2f} {calls:>12.1f}"
+        )
+
+    print(f"\nspeedup: {timings['sequential'] / timings['batched']:.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=32)
+    parser.add_argument("--words", type=int, default=8)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument(
+        "--mode", choices=["vector", "lexical", "hybrid"], default="hybrid"
+    )
+    parser.add_argument("--backend", help="override EMBEDDING_BACKEND")
+    args = parser.parse_args()
+    _configure(args)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
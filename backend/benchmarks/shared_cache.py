@@ -0,0 +1,184 @@
+"""Query-embedding cache hit rates across worker processes, per cache tier.
+
+Starts ``--workers`` processes that each look up ``--lookups`` query
+embeddings drawn from a Zipf-like distribution over ``--keys`` distinct
+queries, embedding (and storing) on a miss, as uvicorn workers behind a
+load balancer would. Runs once per backend and reports the in-process and
+shared-tier hit rates, the resulting number of embedding calls and the
+shared-tier latency. ``redis`` uses the ``resp_server`` stand-in unless
+``--redis-url`` is given::
+
+    python -m benchmarks.shared_cache --workers 4 --backends memory sqlite redis
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from array import array
+from typing import Any
+
+from app.services.shared_cache import (
+    CacheBackend,
+    RedisBackend,
+    SqliteBackend,
+    TieredCache,
+    VectorCodec,
+)
+
+
+def _backend(name: str, target: str) -> CacheBackend | None:
+    if name == "sqlite":
+        return SqliteBackend(target, 512 * 1024 * 1024)
+    if name == "redis":
+        return RedisBackend(target, 4, 1.0)
+    return None
+
+
+def _zipf_keys(rng: random.Random, keys: int, count: int) -> list[int]:
+    weights = [1 / (rank + 1) for rank in range(keys)]
+    return rng.choices(range(keys), weights=weights, k=count)
+
+
+async def _run_worker(
+    name: str, target: str, seed: int, keys: int, lookups: int, dim: int
+) -> dict[str, Any]:
+    backend = _backend(name, target)
+    cache: TieredCache[array] = TieredCache(
+        f"bench:{os.getppid()}",
+        max_bytes=64 * 1024 * 1024,
+        sizeof=lambda vector: vector.itemsize * len(vector) + 64,
+        codec=VectorCodec(),
+        backend=backend or False,
+    )
+    rng = random.Random(seed)
+    embedded = 0
+    started = time.perf_counter()
+    for key in _zipf_keys(rng, keys, lookups):
+        if await cache.get(("model", f"query {key}")) is None:
+            embedded += 1
+            vector = array("f", (random.Random(key).random() for _ in range(dim)))
+            await cache.set(("model", f"query {key}"), vector)
+    elapsed = time.perf_counter() - started
+    result = {
+        **cache.stats.snapshot(),
+        "embedded": embedded,
+        "seconds": elapsed,
+        "backend": backend.describe() if backend is not None else None,
+    }
+    if backend is not None:
+        await backend.close()
+    return result
+
+
+def _worker(args: tuple[Any, ...]) -> dict[str, Any]:
+    return asyncio.run(_run_worker(*args))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port: int, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"resp_server did not start on port {port}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--keys", type=int, default=2_000)
+    parser.add_argument("--lookups", type=int, default=5_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument(
+        "--backends", nargs="+", default=["memory", "sqlite", "redis"]
+    )
+    parser.add_argument("--redis-url", default=None)
+    args = parser.parse_args()
+
+    sample = array("f", (random.random() for _ in range(args.dim)))
+    as_json = len(json.dumps(sample.tolist()).encode())
+    as_f32 = len(VectorCodec().encode(sample))
+    print(
+        f"{args.dim}-dim vector: {as_json:,} bytes as JSON, {as_f32:,} bytes "
+        f"as float32 ({as_json / as_f32:.1f}x smaller)\n"
+    )
+    print(
+        f"{'backend':>8} {'memory hit':>11} {'shared hit':>11} {'overall':>8} "
+        f"{'embeds':>7} {'p50 ms':>7} {'p95 ms':>7} {'lookups/s':>10}"
+    )
+
+    context = multiprocessing.get_context("spawn")
+    for name in args.backends:
+        server = None
+        if name == "sqlite":
+            target = os.path.join(tempfile.mkdtemp(), "cache.sqlite3")
+        elif name == "redis" and args.redis_url:
+            target = args.redis_url
+        elif name == "redis":
+            port = _free_port()
+            server = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "app.services.resp_server",
+                    "--port",
+                    str(port),
+                ],
+                stderr=subprocess.DEVNULL,
+            )
+            _wait_for_port(port)
+            target = f"redis://127.0.0.1:{port}/0"
+        else:
+            target = ""
+        try:
+            with context.Pool(args.workers) as pool:
+                results = pool.map(
+                    _worker,
+                    [
+                        (name, target, seed, args.keys, args.lookups, args.dim)
+                        for seed in range(args.workers)
+                    ],
+                )
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+        memory_hits = sum(result["memory_hits"] for result in results)
+        shared_hits = sum(result["shared_hits"] for result in results)
+        misses = sum(result["misses"] for result in results)
+        lookups = memory_hits + shared_hits + misses
+        shared_lookups = shared_hits + misses
+        backends = [result["backend"] for result in results if result["backend"]]
+        p50 = max((stats["latency_p50_ms"] for stats in backends), default=0.0)
+        p95 = max((stats["latency_p95_ms"] for stats in backends), default=0.0)
+        seconds = max(result["seconds"] for result in results)
+        print(
+            f"{name:>8} {memory_hits / lookups:>11.1%} "
+            f"{(shared_hits / shared_lookups if shared_lookups else 0):>11.1%} "
+            f"{(memory_hits + shared_hits) / lookups:>8.1%} "
+            f"{sum(result['embedded'] for result in results):>7,} "
+            f"{p50:>7.3f} {p95:>7.3f} {lookups / seconds:>10,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""Startup cost: ``import app.main`` time and time to first request.
+
+Imports the application in fresh interpreters (median of ``--runs``), checks
+that provider SDKs and ingestion-only modules stay out of the import graph,
+then starts uvicorn and times how long ``/api/v1/health`` takes to answer.
+Thresholds turn it into a regression gate (exit status 1)::
+
+    python -m benchmarks.startup --max-import-seconds 1.5 --max-ttfr-seconds 4
+    python -m benchmarks.startup --skip-server --top 15
+
+Time to first request needs a database migrated with
+``python -m app.manage migrate`` (the lifespan verifies the schema).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+
+BACKEND = Path(__file__).resolve().parents[1]
+
+# Must only be imported on first use, never by ``import app.main``.
+LAZY_MODULES = (
+    "langchain.agents",
+    "langchain_openai",
+    "langchain_google_genai",
+    "langfuse",
+    "fitz",
+    "langchain_text_splitters",
+    "sentence_transformers",
+)
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - started
+lazy = json.loads(sys.argv[1])
+print(json.dumps({
+    "seconds": elapsed,
+    "loaded": [name for name in lazy if name in sys.modules],
+}))
+"""
+
+
+def _probe_import() -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-c", _PROBE, json.dumps(LAZY_MODULES)],
+        cwd=BACKEND,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _top_imports(count: int) -> list[tuple[int, str]]:
+    """The ``count`` slowest modules by cumulative ``-X importtime``."""
+
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = (part.strip() for part in line[12:].split("|"))
+        rows.append((int(cumulative), module))
+    return sorted(rows, reverse=True)[:count]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _time_to_first_request(timeout: float) -> float:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/api/v1/health"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=BACKEND,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {server.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.02)
+        raise RuntimeError(f"no response from {url} within {timeout:.0f}s")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=0, help="list slowest imports")
+    parser.add_argument("--skip-server", action="store_true")
+    parser.add_argument("--server-timeout", type=float, default=60.0)
+    parser.add_argument("--max-import-seconds", type=float, default=None)
+    parser.add_argument("--max-ttfr-seconds", type=float, default=None)
+    args = parser.parse_args()
+
+    failures: list[str] = []
+
+    probes = [_probe_import() for _ in range(args.runs)]
+    import_seconds = statistics.median(probe["seconds"] for probe in probes)
+    print(f"import app.main: {import_seconds * 1000:.0f} ms (median of {args.runs})")
+    loaded = sorted({name for probe in probes for name in probe["loaded"]})
+    if loaded:
+        failures.append(f"eagerly imported: {', '.join(loaded)}")
+    if args.max_import_seconds is not None and import_seconds > args.max_import_seconds:
+        failures.append(
+            f"import took {import_seconds:.2f}s > {args.max_import_seconds:.2f}s"
+        )
+
+    if args.top:
+        print(f"\n{'cumulative':>12}  module")
+        for micros, module in _top_imports(args.top):
+            print(f"{micros / 1000:>9.1f} ms  {module}")
+
+    if not args.skip_server:
+        ttfr = _time_to_first_request(args.server_timeout)
+        print(f"\ntime to first request: {ttfr * 1000:.0f} ms")
+        if args.max_ttfr_seconds is not None and ttfr > args.max_ttfr_seconds:
+            failures.append(
+                f"first request took {ttfr:.2f}s > {args.max_ttfr_seconds:.2f}s"
+            )
+
+    if failures:
+        print("\nREGRESSION: " + "; ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Token and byte cost of tool-output encodings.
+
+Builds representative ``sql_fetch`` results (orders joined to customers,
+with timestamps and decimals) and ``rag_lookup`` passages, encodes them in
+every ``tool_output`` format and reports the size of the serialized tool
+message against the row-dict baseline::
+
+    python -m benchmarks.tool_output --rows 200 --passages 8
+
+Tokens are counted with tiktoken (``--encoding``) when it is installed and
+estimated at ~4 characters per token otherwise.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Callable
+
+from app.services.tool_output import OUTPUT_FORMATS, encode_records
+
+
+_FIRST = ["Maria", "David", "Aisha", "Liam", "Sofia", "Noah", "Chen", "Amara"]
+_LAST = ["Rodriguez", "Kim", "Patel", "Smith", "Rossi", "Okafor", "Li", "Novak"]
+_WORDS = (
+    "returns must be initiated within thirty days of delivery and items must "
+    "include all accessories original packaging restocking fee applies to "
+    "opened electronics refunds are issued to the original payment method"
+).split()
+
+
+def sql_rows(count: int, rng: random.Random) -> list[dict[str, Any]]:
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for index in range(count):
+        first, last = rng.choice(_FIRST), rng.choice(_LAST)
+        rows.append(
+            {
+                "order_id": 10_000 + index,
+                "customer_id": rng.randint(1, 500),
+                "name": f"{first} {last}",
+                "email": f"{first}.{last}@example.com".lower(),
+                "order_date": start + timedelta(minutes=rng.randint(0, 500_000)),
+                "status_tracking_id": f"SHP{rng.randint(10_000, 99_999)}",
+                "total": Decimal(rng.randint(500, 500_000)) / 100,
+            }
+        )
+    return rows
+
+
+def rag_passages(count: int, rng: random.Random) -> list[dict[str, Any]]:
+    return [
+        {
+            "document_id": rng.randint(1, 50),
+            "chunks": f"{index}-{index + 1}",
+            "score": round(rng.random(), 4),
+            "text": " ".join(rng.choices(_WORDS, k=90)),
+        }
+        for index in range(count)
+    ]
+
+
+def baseline(rows: list[dict[str, Any]], key: str) -> dict[str, Any]:
+    # What the tools returned before: row dicts, with values stringified by
+    # the message serializer.
+    return {key: rows}
+
+
+def serialize(payload: dict[str, Any]) -> str:
+    # Mirrors how LangChain turns a dict tool result into message content.
+    return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def token_counter(encoding: str) -> tuple[str, Callable[[str], int]]:
+    try:
+        import tiktoken
+    except ImportError:
+        return "estimate", lambda text: len(text) // 4 + 1
+    encoder = tiktoken.get_encoding(encoding)
+    return encoding, lambda text: len(encoder.encode(text))
+
+
+def report(
+    label: str,
+    rows: list[dict[str, Any]],
+    key: str,
+    count_tokens: Callable[[str], int],
+) -> None:
+    base = serialize(baseline(rows, key))
+    base_bytes, base_tokens = len(base.encode()), count_tokens(base)
+    print(f"\n{label} ({len(rows)} rows)")
+    print(f"{'format':>10} {'bytes':>9} {'tokens':>8} {'saved':>7}")
+    print(f"{'baseline':>10} {base_bytes:>9} {base_tokens:>8} {'-':>7}")
+    for output_format in OUTPUT_FORMATS:
+        message = serialize(encode_records(rows, output_format, key=key))
+        tokens = count_tokens(message)
+        saved = 1 - tokens / base_tokens if base_tokens else 0.0
+        print(
+            f"{output_format:>10} {len(message.encode()):>9} {tokens:>8} "
+            f"{saved:>7.1%}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--passages", type=int, default=8)
+    parser.add_argument("--encoding", default="o200k_base")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    counter_name, count_tokens = token_counter(args.encoding)
+    print(f"token counter: {counter_name}")
+    report("sql_fetch", sql_rows(args.rows, rng), "rows", count_tokens)
+    report("rag_lookup", rag_passages(args.passages, rng), "passages", count_tokens)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Compare HNSW index representations: size, build time, recall and latency.
+
+Builds one index per ``rag_vector_index`` option (full-precision ``vector``,
+``halfvec``, ``binary`` quantization and ``truncated`` dimensions) over the
+same synthetic corpus and measures the two-stage query ``rag_service`` runs:
+an ANN scan over the compact index followed by exact re-ranking::
+
+    python -m benchmarks.vector_storage --rows 250000 --dim 1536 \\
+        --rerank-factor 4 --truncate-dimension 512
+
+The corpus front-loads variance into the leading dimensions (``--decay``) so
+that truncation behaves like it does for Matryoshka-trained embeddings.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+import asyncpg
+from pgvector.asyncpg import register_vector
+
+from app.config import get_settings
+from app.core.vector_store import (
+    DISTANCE_METRICS,
+    VECTOR_INDEX_TYPES,
+    VectorIndexSpec,
+    build_index_spec,
+)
+
+from .hnsw_recall import (
+    TABLE,
+    default_dsn,
+    exact_neighbours,
+    load_corpus,
+    measure,
+    query_vectors,
+)
+
+
+INDEX_NAME = f"{TABLE}_hnsw"
+
+
+def search_sql(spec: VectorIndexSpec, operator: str, ann_limit: int) -> str:
+    """Return the benchmark query for ``spec`` (``$1`` query, ``$2`` k)."""
+
+    if not spec.reranked:
+        return f"SELECT id FROM {TABLE} ORDER BY embedding {operator} $1 LIMIT $2"
+    return f"""
+        SELECT r.id
+        FROM {TABLE} r
+        WHERE r.id IN (
+            SELECT c.id FROM {TABLE} c
+            ORDER BY {spec.column("c.embedding")} {spec.operator} {spec.query("$1")}
+            LIMIT {ann_limit}
+        )
+        ORDER BY r.embedding {operator} $1
+        LIMIT $2
+    """
+
+
+async def build(
+    conn: asyncpg.Connection, spec: VectorIndexSpec, args: argparse.Namespace
+) -> tuple[float, int]:
+    """Build the index for ``spec``; return (seconds, size in bytes)."""
+
+    await conn.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+    column = spec.column("embedding")
+    if spec.reranked:
+        column = f"({column})"
+    started = time.perf_counter()
+    await conn.execute(
+        f"CREATE INDEX {INDEX_NAME} ON {TABLE} USING hnsw ({column} {spec.opclass}) "
+        f"WITH (m = {args.m}, ef_construction = {args.ef_construction})"
+    )
+    elapsed = time.perf_counter() - started
+    size = await conn.fetchval(f"SELECT pg_relation_size('{INDEX_NAME}'::regclass)")
+    return elapsed, size
+
+
+async def run(args: argparse.Namespace) -> None:
+    metric = DISTANCE_METRICS[args.metric]
+    conn = await asyncpg.connect(args.dsn)
+    try:
+        await conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        await register_vector(conn)
+        await conn.execute(f"SET maintenance_work_mem = '{args.maintenance_work_mem}'")
+        if not args.reuse:
+            await load_corpus(conn, args, metric)
+        heap = await conn.fetchval(
+            f"SELECT pg_size_pretty(pg_table_size('{TABLE}'::regclass))"
+        )
+        print(f"table size {heap} (full-precision vectors kept for re-ranking)")
+
+        queries = query_vectors(args, metric)
+        truth = exact_neighbours(args, metric, queries)
+
+        ann_limit = args.k * args.rerank_factor
+        await conn.execute(f"SET hnsw.ef_search = {max(args.ef_search, ann_limit)}")
+        print(
+            f"\n{'index':>10} {'build s':>9} {'size MB':>9} "
+            f"{'recall@' + str(args.k):>10} {'p50 ms':>9} {'p99 ms':>9}"
+        )
+        for index_type in args.index_types:
+            spec = build_index_spec(
+                index_type, metric, args.dim, args.truncate_dimension
+            )
+            elapsed, size = await build(conn, spec, args)
+            sql = search_sql(spec, metric.operator, ann_limit)
+            recall, p50, p99 = await measure(conn, sql, queries, truth, args.k)
+            print(
+                f"{index_type:>10} {elapsed:>9.1f} {size / 2**20:>9.1f} "
+                f"{recall:>10.4f} {p50:>9.2f} {p99:>9.2f}"
+            )
+
+        await conn.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+        if not args.keep:
+            await conn.execute(f"DROP TABLE {TABLE}")
+    finally:
+        await conn.close()
+
+
+def main() -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", default=default_dsn())
+    parser.add_argument("--rows", type=int, default=250_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=1_000)
+    parser.add_argument("--decay", type=float, default=64.0)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument(
+        "--metric",
+        choices=sorted(DISTANCE_METRICS),
+        default=settings.rag_distance_metric,
+    )
+    parser.add_argument(
+        "--index-types",
+        nargs="+",
+        choices=VECTOR_INDEX_TYPES,
+        default=list(VECTOR_INDEX_TYPES),
+    )
+    parser.add_argument(
+        "--truncate-dimension", type=int, default=settings.rag_index_truncate_dimension
+    )
+    parser.add_argument("--rerank-factor", type=int, default=settings.rag_rerank_factor)
+    parser.add_argument("--m", type=int, default=settings.rag_hnsw_m)
+    parser.add_argument(
+        "--ef-construction", type=int, default=settings.rag_hnsw_ef_construction
+    )
+    parser.add_argument("--ef-search", type=int, default=settings.rag_hnsw_ef_search)
+    parser.add_argument("--maintenance-work-mem", default="2GB")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--reuse", action="store_true", help="skip loading; reuse the existing table"
+    )
+    parser.add_argument("--keep", action="store_true", help="keep the table afterwards")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
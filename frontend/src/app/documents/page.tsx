@@ -2,14 +2,17 @@
 
 import { useState, type FormEvent, type DragEvent } from "react";
 import { useMutation } from "@tanstack/react-query";
-import { uploadRagDocument } from "@/lib/api";
+import { getIngestionJob, uploadRagDocument } from "@/lib/api";
 import { Upload, FileText, CheckCircle2, XCircle, Loader2 } from "lucide-react";
 
+const JOB_POLL_INTERVAL_MS = 1500;
+
 export default function DocumentsPage() {
   const [file, setFile] = useState<File | null>(null);
   const [uploadStatus, setUploadStatus] = useState<string | null>(null);
   const [ragError, setRagError] = useState<string | null>(null);
   const [isDragging, setIsDragging] = useState(false);
+  const [jobProgress, setJobProgress] = useState<string | null>(null);
 
   const uploadMutation = useMutation({
     mutationFn: (f: File) => uploadRagDocument(f),
@@ -45,20 +48,45 @@ export default function DocumentsPage() {
 
   const handleUpload = async (event: FormEvent<HTMLFormElement>) => {
     event.preventDefault();
-    if (!file || uploadMutation.isPending) return;
+    if (!file || uploadMutation.isPending || jobProgress) return;
 
     setUploadStatus(null);
     setRagError(null);
 
     try {
-      const result = await uploadMutation.mutateAsync(file);
-      setUploadStatus(
-        `Uploaded document #${result.document_id} (${result.status})`
-      );
+      const { job_id } = await uploadMutation.mutateAsync(file);
+      setJobProgress(`Queued as job #${job_id}`);
+
+      // Indexing runs in the background; poll until the job settles.
+      for (;;) {
+        await new Promise((resolve) =>
+          setTimeout(resolve, JOB_POLL_INTERVAL_MS)
+        );
+        const job = await getIngestionJob(job_id);
+        const { progress } = job;
+        if (job.status === "succeeded") {
+          setUploadStatus(
+            `Indexed ${progress.documents_done} document(s), ` +
+              `${progress.chunks_written} chunks (job #${job_id})`
+          );
+          break;
+        }
+        if (job.status === "failed") {
+          throw new Error(job.error ?? "Indexing failed");
+        }
+        setJobProgress(
+          `Job #${job_id} ${job.status}: ` +
+            `${progress.documents_done}/${progress.documents_total} documents, ` +
+            `${progress.pages_done}/${progress.pages_total} pages, ` +
+            `${progress.chunks_embedded}/${progress.chunks_total} chunks embedded`
+        );
+      }
     } catch (error) {
       const message =
         error instanceof Error ? error.message : "Failed to upload document";
       setRagError(message);
+    } finally {
+      setJobProgress(null);
     }
   };
 
@@ -93,7 +121,7 @@ export default function DocumentsPage() {
             <input
               type="file"
               id="file-upload"
-              accept=".pdf,.txt,application/pdf,text/plain"
+              accept=".pdf,.txt,.md,.zip,.tar,.tar.gz,.tgz,application/pdf,text/plain,application/zip"
               onChange={handleFileChange}
               className="hidden"
             />
@@ -117,7 +145,8 @@ export default function DocumentsPage() {
                     : "Click to upload or drag and drop"}
                 </p>
                 <p className="text-xs text-slate-500">
-                  Supports PDF and TXT files
+                  Supports PDF, TXT and Markdown files, or zip/tar archives
+                  of them
                 </p>
               </div>
             </label>
@@ -167,7 +196,7 @@ export default function DocumentsPage() {
               {uploadMutation.isPending ? (
                 <>
                   <Loader2 className="h-4 w-4 animate-spin" />
-                  <span>Indexing document...</span>
+                  <span>Uploading...</span>
                 </>
               ) : (
                 <>
@@ -180,6 +209,13 @@ export default function DocumentsPage() {
         </form>
 
         {/* Status messages */}
+        {jobProgress && (
+          <div className="flex items-start gap-3 rounded-xl border border-sky-500/30 bg-sky-500/10 p-4">
+            <Loader2 className="h-5 w-5 shrink-0 animate-spin text-sky-400" />
+            <p className="text-xs text-sky-300/80">{jobProgress}</p>
+          </div>
+        )}
+
         {uploadStatus && (
           <div className="flex items-start gap-3 rounded-xl border border-emerald-500/30 bg-emerald-500/10 p-4">
             <CheckCircle2 className="h-5 w-5 shrink-0 text-emerald-400" />
@@ -222,7 +258,8 @@ export default function DocumentsPage() {
             <li className="flex items-start gap-2">
               <span className="mt-0.5 text-sky-400">•</span>
               <span>
-                Supported formats: PDF (text-based) and plain text files
+                Supported formats: PDF (text-based), plain text and Markdown
+                files, or zip/tar archives of them
               </span>
             </li>
           </ul>
@@ -32,6 +32,17 @@ export interface AgentStreamStep {
   messages: AgentStreamStepMessage[];
 }
 
+export interface AgentRunSummary {
+  model_turns: number;
+  tool_calls: Record<string, number>;
+  total_tokens: number;
+  seconds: number;
+  duplicate_calls_avoided: number;
+  tool_calls_blocked: number;
+  exhausted: string | null;
+  limits: Record<string, unknown>;
+}
+
 export type AgentStreamEvent =
   | {
       type: "agent_step";
@@ -40,6 +51,16 @@ export type AgentStreamEvent =
   | {
       type: "final_answer";
       content: string;
+    }
+  | {
+      type: "budget_exhausted";
+      reason: "model_turns" | "tokens" | "wall_clock" | "error_loop";
+      detail: string;
+      summary: AgentRunSummary;
+    }
+  | {
+      type: "run_summary";
+      summary: AgentRunSummary;
     };
 
 async function handleJsonResponse<T>(
@@ -143,9 +164,26 @@ export interface RagSearchResult {
   score: number;
 }
 
+export type IngestionJob = {
+  job_id: number;
+  status: "queued" | "running" | "succeeded" | "failed";
+  filename: string;
+  progress: {
+    documents_total: number;
+    documents_done: number;
+    pages_total: number;
+    pages_done: number;
+    chunks_total: number;
+    chunks_embedded: number;
+    chunks_written: number;
+  };
+  results: Array<Record<string, unknown>>;
+  error: string | null;
+};
+
 export async function uploadRagDocument(file: File): Promise<{
   status: string;
-  document_id: number;
+  job_id: number;
 }> {
   const formData = new FormData();
   formData.append("file", file);
@@ -158,6 +196,11 @@ export async function uploadRagDocument(file: File): Promise<{
   return handleJsonResponse(res, "Failed to upload document");
 }
 
+export async function getIngestionJob(jobId: number): Promise<IngestionJob> {
+  const res = await fetch(`${API_BASE_URL}/rag/jobs/${jobId}`);
+  return handleJsonResponse(res, "Failed to load ingestion job");
+}
+
 export async function searchRagDocuments(params: {
   query: string;
   top_k?: number;